@@ -4,23 +4,87 @@ from pathlib import Path
 from typing import Final
 
 import streamlit as st
+from streamlit_autorefresh import st_autorefresh
 
 from src.comparison_webapp import (
     SummarizedScientificArticleInfo,
     get_summarized_articles,
     more_info,
+    request_summary_form,
     write_article_multisection,
     write_article_section,
+    write_summary_request,
 )
+from src.job_queue_client import (
+    JOB_QUEUE_PATH,
+    JobQueue,
+    JobStatus,
+    request_summarization,
+)
+from src.results_archive import RESULTS_ARCHIVE_PATH
+from src.search_index import SEARCH_INDEX_PATH, build_search_index, search
 
 # --- Configure --- #
 
 SUMMARIZATION_PIPELINE_OUTDIR: Final[Path] = Path("pipeline-results")
+REFRESH_INTERVAL_MS: Final[int] = 2000
 
 # ---- Setup ---- #
 
 
-summ_articles = get_summarized_articles(SUMMARIZATION_PIPELINE_OUTDIR)
+# Results can be shipped as an archive (`./summarize.py export-results`); summaries
+# computed on request are still written to the results directory.
+SUMMARIZATION_PIPELINE_OUTDIR.mkdir(exist_ok=True)
+summ_articles = get_summarized_articles(
+    SUMMARIZATION_PIPELINE_OUTDIR, archive=RESULTS_ARCHIVE_PATH
+)
+
+
+@st.cache(allow_output_mutation=True, show_spinner=False)
+def get_job_queue(path: Path) -> JobQueue:
+    """Open the job queue once and share the connection between reruns and sessions.
+
+    Args:
+        path (Path): Path to the queue's database file.
+
+    Returns:
+        JobQueue: The job queue.
+    """
+    return JobQueue(path)
+
+
+job_queue = get_job_queue(JOB_QUEUE_PATH)
+
+
+def _mtime(path: Path) -> float:
+    return path.stat().st_mtime if path.exists() else 0.0
+
+
+@st.cache(show_spinner=False)
+def update_search_index(results_mtime: float, archive_mtime: float) -> int:
+    """Update the search index when the results have changed.
+
+    Result files are written by moving them into place, so adding, replacing, or
+    removing one changes the modification time of the results directory. Reruns of
+    the app only check the index again when that (or the archive's) changes.
+
+    Args:
+        results_mtime (float): Modification time of the results directory.
+        archive_mtime (float): Modification time of the results archive.
+
+    Returns:
+        int: Number of result files that were (re-)indexed.
+    """
+    return build_search_index(
+        SUMMARIZATION_PIPELINE_OUTDIR,
+        index_path=SEARCH_INDEX_PATH,
+        archive=RESULTS_ARCHIVE_PATH,
+    )
+
+
+update_search_index(
+    _mtime(SUMMARIZATION_PIPELINE_OUTDIR), archive_mtime=_mtime(RESULTS_ARCHIVE_PATH)
+)
 
 
 # ---- Streamlit app ---- #
@@ -30,6 +94,34 @@ st.title("Comparing scientific article summaries")
 with st.expander("More info"):
     st.markdown(more_info())
 
+with st.expander("Search articles and summaries"):
+    query = st.text_input("Search query (e.g. KRAS G12D)")
+    if len(query.strip()) > 0:
+        for hit in search(SEARCH_INDEX_PATH, query=query):
+            location = hit.section
+            if len(hit.subsection) > 0:
+                location += f" / {hit.subsection}"
+            st.markdown(f"**{hit.title}** ({hit.method}, {hit.config_str}) {location}")
+            st.markdown("> " + hit.snippet)
+
+# Summaries are computed by a separate worker process (`./summarize.py worker
+# --no-exit-when-empty`); the app only adds requests to the queue and polls it.
+if "summary_requests" not in st.session_state:
+    st.session_state["summary_requests"] = []
+
+with st.expander("Summarize a new article or configuration"):
+    if (request := request_summary_form()) is not None:
+        url, config, time_budget = request
+        job_id = request_summarization(
+            job_queue, url=url, config=config, time_budget=time_budget
+        )
+        if job_id not in st.session_state["summary_requests"]:
+            st.session_state["summary_requests"].append(job_id)
+    requested_jobs = [job_queue.get(i) for i in st.session_state["summary_requests"]]
+    for job in reversed(requested_jobs):
+        write_summary_request(job)
+    auto_refresh = st.checkbox("Refresh automatically", value=True)
+
 article_infos = list(summ_articles.keys())
 
 available_article_titles = list(set([a.title for a in article_infos]))
@@ -75,3 +167,10 @@ for col_idx, col in enumerate(st.columns(2)):
             write_article_multisection(_article.summary.Results)
         else:
             st.write("Unexpected article section...")
+
+unfinished = [
+    j for j in requested_jobs if j.status not in (JobStatus.DONE, JobStatus.FAILED)
+]
+if auto_refresh and len(unfinished) > 0:
+    # The browser reruns the app after the interval; the script is not kept waiting.
+    st_autorefresh(interval=REFRESH_INTERVAL_MS, key="job_refresh")
@@ -0,0 +1,332 @@
+"""Compact representation of an article's text for the summarization hot path.
+
+All of an article's paragraphs are stored in a single UTF-8 buffer with arrays of
+paragraph offsets and word counts. Chunks are views into the buffer: chunking only does
+integer arithmetic and hashing a chunk reads the buffer directly, so no intermediate
+strings are built. The pydantic models are only needed to read and write articles.
+"""
+
+from array import array
+from hashlib import sha1
+from typing import Final, Optional
+
+from src.classes_and_types import ScientificArticleText, TextChunk
+
+# Runs of paragraphs (by their hashes) that formed chunks of a previous version of an
+# article, for each (sub)section.
+chunk_anchors = dict[tuple[str, Optional[str]], set[tuple[str, ...]]]
+
+# Sections of an article in reading order and whether each has subsections.
+ARTICLE_SECTIONS: Final[tuple[tuple[str, bool], ...]] = (
+    ("Abstract", False),
+    ("Introduction", False),
+    ("Methods", True),
+    ("Results", True),
+    ("Discussion", False),
+)
+
+SUMMARIZED_SECTIONS: Final[tuple[str, ...]] = ("Introduction", "Results", "Discussion")
+
+
+class TextChunkView:
+    """A chunk of an article: a view of a span of the article's text buffer.
+
+    Behaves like `TextChunk` but the text is only decoded when it is accessed.
+    """
+
+    __slots__ = (
+        "section",
+        "subsection",
+        "_article",
+        "start",
+        "end",
+        "first_paragraph",
+        "end_paragraph",
+    )
+
+    def __init__(
+        self,
+        section: str,
+        subsection: Optional[str],
+        article: "ArticleBuffer",
+        start: int,
+        end: int,
+        first_paragraph: int,
+        end_paragraph: int,
+    ) -> None:
+        """Create a view of a chunk of an article's text.
+
+        Args:
+            section (str): Section of the article.
+            subsection (Optional[str]): Subsection of the article (if any).
+            article (ArticleBuffer): The article's text.
+            start (int): Byte offset of the start of the chunk.
+            end (int): Byte offset of the end of the chunk.
+            first_paragraph (int): Index of the chunk's first paragraph.
+            end_paragraph (int): Index after the chunk's last paragraph.
+        """
+        self.section = section
+        self.subsection = subsection
+        self._article = article
+        self.start = start
+        self.end = end
+        self.first_paragraph = first_paragraph
+        self.end_paragraph = end_paragraph
+
+    @property
+    def text(self) -> str:
+        """Text of the chunk."""
+        return str(self._article.buffer[self.start : self.end], "utf-8")
+
+    @property
+    def paragraph_hashes(self) -> list[str]:
+        """Hashes of the chunk's paragraphs."""
+        return [
+            self._article.paragraph_hash(i)
+            for i in range(self.first_paragraph, self.end_paragraph)
+        ]
+
+    def text_hash(self) -> str:
+        """Hash the text of the chunk (without decoding it).
+
+        Returns:
+            str: Hex digest of the chunk's text (the same as `TextChunk.text_hash()`).
+        """
+        return sha1(self._article.buffer[self.start : self.end]).hexdigest()
+
+    def to_text_chunk(self) -> TextChunk:
+        """Copy the chunk into a `TextChunk` (e.g. to serialize it).
+
+        Returns:
+            TextChunk: The chunk.
+        """
+        return TextChunk(
+            section=self.section,
+            subsection=self.subsection,
+            text=self.text,
+            paragraph_hashes=self.paragraph_hashes,
+        )
+
+    def __repr__(self) -> str:
+        """Get a string representation of the chunk view."""
+        return (
+            f"TextChunkView(section={self.section!r}, subsection={self.subsection!r}, "
+            f"start={self.start}, end={self.end})"
+        )
+
+
+class ArticleBuffer:
+    """An article's text in one buffer with paragraph and (sub)section offsets.
+
+    Each paragraph is stored preceded by a single space so that a run of consecutive
+    paragraphs of a (sub)section is a contiguous span of the buffer whose text is the
+    same as joining the paragraphs with spaces.
+    """
+
+    __slots__ = ("_buffer", "_starts", "_ends", "_words", "_segments")
+
+    def __init__(self, text: ScientificArticleText) -> None:
+        """Pack the text of an article into a buffer.
+
+        Args:
+            text (ScientificArticleText): Text of the article.
+        """
+        parts: list[bytes] = []
+        self._starts = array("q")
+        self._ends = array("q")
+        self._words = array("q")
+        # (section, subsection, index of first paragraph, index after last paragraph)
+        self._segments: list[tuple[str, Optional[str], int, int]] = []
+        offset = 0
+        for section, has_subsections in ARTICLE_SECTIONS:
+            content = getattr(text, section)
+            segments = content.items() if has_subsections else [(None, content)]
+            for subsection, paragraphs in segments:
+                first = len(self._starts)
+                for paragraph in paragraphs:
+                    encoded = paragraph.encode()
+                    parts += [b" ", encoded]
+                    self._starts.append(offset + 1)
+                    offset += 1 + len(encoded)
+                    self._ends.append(offset)
+                    self._words.append(paragraph.count(" ") + 1)
+                self._segments.append((section, subsection, first, len(self._starts)))
+        self._buffer = memoryview(b"".join(parts))
+
+    @property
+    def buffer(self) -> memoryview:
+        """The text buffer."""
+        return self._buffer
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the text buffer and offset arrays in bytes."""
+        arrays = (self._starts, self._ends, self._words)
+        return self._buffer.nbytes + sum(a.itemsize * len(a) for a in arrays)
+
+    def __len__(self) -> int:
+        """Number of paragraphs."""
+        return len(self._starts)
+
+    def paragraph(self, i: int) -> str:
+        """Get the text of a paragraph.
+
+        Args:
+            i (int): Index of the paragraph (in reading order).
+
+        Returns:
+            str: Text of the paragraph.
+        """
+        return str(self._buffer[self._starts[i] : self._ends[i]], "utf-8")
+
+    def paragraph_hash(self, i: int) -> str:
+        """Hash the text of a paragraph.
+
+        Args:
+            i (int): Index of the paragraph (in reading order).
+
+        Returns:
+            str: Hex digest of the paragraph's text.
+        """
+        return sha1(self._buffer[self._starts[i] : self._ends[i]]).hexdigest()
+
+    def to_text(self) -> ScientificArticleText:
+        """Unpack the buffer into the article's text.
+
+        Returns:
+            ScientificArticleText: Text of the article.
+        """
+        sections: dict[str, dict[Optional[str], list[str]]] = {}
+        for section, subsection, first, end in self._segments:
+            paragraphs = [self.paragraph(i) for i in range(first, end)]
+            sections.setdefault(section, {})[subsection] = paragraphs
+        return ScientificArticleText(
+            **{
+                section: (
+                    sections[section] if has_subsections else sections[section][None]
+                )
+                for section, has_subsections in ARTICLE_SECTIONS
+            }
+        )
+
+    def _chunk(
+        self, section: str, subsection: Optional[str], start: int, first: int, end: int
+    ) -> TextChunkView:
+        stop = self._ends[end - 1] if end > first else start
+        return TextChunkView(section, subsection, self, start, stop, first, end)
+
+    def _greedy_chunks(
+        self,
+        section: str,
+        subsection: Optional[str],
+        first: int,
+        end: int,
+        max_len: int,
+        leading_space: bool,
+    ) -> list[TextChunkView]:
+        # Paragraphs are added to a chunk while it has fewer than `max_len` words. The
+        # first chunk of a (sub)section includes the space before its first paragraph.
+        chunks: list[TextChunkView] = []
+        if leading_space:
+            start, chunk_first, n_words = self._starts[first] - 1, first, 1
+            paragraphs = range(first, end)
+        else:
+            start, chunk_first, n_words = self._starts[first], first, self._words[first]
+            paragraphs = range(first + 1, end)
+        for i in paragraphs:
+            if max_len < 0 or n_words + self._words[i] < max_len:
+                n_words += self._words[i]
+                continue
+            chunks.append(self._chunk(section, subsection, start, chunk_first, i))
+            start, chunk_first, n_words = self._starts[i], i, self._words[i]
+        last = self._chunk(section, subsection, start, chunk_first, end)
+        if last.end > last.start:
+            chunks.append(last)
+        return chunks
+
+    def _fits(self, first: int, end: int, max_len: int) -> bool:
+        n_words = 1 + sum(self._words[i] for i in range(first, end))
+        return max_len < 0 or end - first == 1 or n_words < max_len
+
+    def _anchored_chunks(
+        self,
+        section: str,
+        subsection: Optional[str],
+        first: int,
+        end: int,
+        max_len: int,
+        anchors: set[tuple[str, ...]],
+    ) -> list[TextChunkView]:
+        # Keep each run of paragraphs that is an anchor as a chunk and chunk the
+        # paragraphs between the anchors greedily.
+        by_first: dict[str, list[tuple[str, ...]]] = {}
+        for anchor in sorted(anchors, key=len, reverse=True):
+            if len(anchor) > 0:
+                by_first.setdefault(anchor[0], []).append(anchor)
+        hashes = [self.paragraph_hash(i) for i in range(first, end)]
+        chunks: list[TextChunkView] = []
+        run_first = i = first
+        while i < end:
+            match = next(
+                (
+                    len(a)
+                    for a in by_first.get(hashes[i - first], [])
+                    if tuple(hashes[i - first : i - first + len(a)]) == a
+                    and self._fits(i, i + len(a), max_len)
+                ),
+                0,
+            )
+            if match == 0:
+                i += 1
+                continue
+            if i > run_first:
+                chunks += self._greedy_chunks(
+                    section, subsection, run_first, i, max_len, run_first == first
+                )
+            start = self._starts[i] - 1 if i == first else self._starts[i]
+            chunks.append(self._chunk(section, subsection, start, i, i + match))
+            run_first = i = i + match
+        if end > run_first:
+            chunks += self._greedy_chunks(
+                section, subsection, run_first, end, max_len, run_first == first
+            )
+        return chunks
+
+    def chunks(
+        self,
+        max_len: int,
+        sections: tuple[str, ...] = SUMMARIZED_SECTIONS,
+        anchors: Optional[chunk_anchors] = None,
+    ) -> list[TextChunkView]:
+        """Split (sub)sections into chunks of consecutive paragraphs.
+
+        Paragraphs are added to a chunk while it has fewer than `max_len` words. With
+        `anchors` (the chunks of a previous version of the article), runs of paragraphs
+        that were a chunk before are kept as a chunk, so a changed paragraph only
+        changes the chunk it is in and not the boundaries of the chunks after it.
+
+        Args:
+            max_len (int): Maximum number of words per chunk (no maximum if negative).
+            sections (tuple[str, ...], optional): Sections to chunk. Defaults to the
+            summarized sections.
+            anchors (Optional[chunk_anchors], optional): Paragraph hashes of the chunks
+            of a previous version. Defaults to None.
+
+        Returns:
+            list[TextChunkView]: Chunks in reading order.
+        """
+        chunks: list[TextChunkView] = []
+        for section in sections:
+            for seg_section, subsection, first, end in self._segments:
+                if seg_section != section or first == end:
+                    continue
+                seg_anchors = (anchors or {}).get((section, subsection))
+                if seg_anchors:
+                    chunks += self._anchored_chunks(
+                        section, subsection, first, end, max_len, seg_anchors
+                    )
+                else:
+                    chunks += self._greedy_chunks(
+                        section, subsection, first, end, max_len, leading_space=True
+                    )
+        return chunks
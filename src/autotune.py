@@ -0,0 +1,442 @@
+"""Tune the summarization pipeline's throughput settings for a host.
+
+A short benchmark summarizes a sample of the saved articles with BART under different
+settings (worker processes, PyTorch threads, batch size, chunk length, and beams) and
+keeps the fastest settings whose summaries stay close to those of the default settings.
+The result is saved as a profile for the host's hardware, which the pipeline loads
+automatically.
+"""
+
+import hashlib
+import os
+import platform
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Final, Optional
+
+from pydantic import BaseModel
+
+from src.bart_summarization import (
+    BART_DECODING_PROFILES,
+    BartThroughputSettings,
+    decoding_profile_name,
+    get_summarizer,
+    get_throughput_settings,
+    set_throughput_settings,
+    start_worker_pool,
+    stop_worker_pool,
+)
+from src.classes_and_types import (
+    ScientificArticle,
+    ScientificArticleText,
+    SummarizationConfiguration,
+    SummarizationMethod,
+)
+from src.evaluation import rouge_n
+from src.summarize_utils import (
+    SUMMARIZATION_METHOD_MAX_LENGTHS,
+    abstractive_config,
+    chunk_article,
+    summarize_chunks,
+    with_max_chunk_length,
+)
+from src.text_utils import word_count
+
+HOST_PROFILES_DIR: Final[Path] = Path("cache") / "host-profiles"
+
+# A trial must be at least this much faster than the best so far to replace it, so
+# that timing noise does not decide between settings that are equally fast.
+MIN_SPEEDUP: Final[float] = 1.05
+
+CHUNK_WORDS_CANDIDATES: Final[list[int]] = [650, 500, 350]
+BATCH_SIZE_CANDIDATES: Final[list[int]] = [1, 2, 4]
+
+
+class HostProfile(BaseModel):
+    """Throughput settings tuned for a type of host."""
+
+    host: str  # Hardware signature (see `host_signature()`).
+    bart_workers: int
+    max_chunk_words: int
+    max_beams: Optional[int] = None  # Cap on the decoding profile's beams.
+    bart: BartThroughputSettings
+    words_per_second: float
+    baseline_words_per_second: float
+    quality: float  # Similarity to the summaries with the default settings.
+
+
+class AutotuneTrial(BaseModel):
+    """Settings tried while tuning and how they performed."""
+
+    bart_workers: int
+    max_chunk_words: int
+    max_beams: Optional[int] = None
+    bart: BartThroughputSettings
+    words_per_second: float = 0.0
+    quality: float = 0.0
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", "r") as file:
+            for line in file:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or "unknown"
+
+
+def _total_memory_gb() -> int:
+    try:
+        with open("/proc/meminfo", "r") as file:
+            for line in file:
+                if line.startswith("MemTotal:"):
+                    return round(int(line.split()[1]) / 1024**2)
+    except OSError:
+        pass
+    return 0
+
+
+def host_signature() -> str:
+    """Describe the hardware of this host.
+
+    Hosts of the same machine type have the same signature and so share a profile.
+
+    Returns:
+        str: Hardware signature.
+    """
+    return (
+        f"{platform.machine()}, {_cpu_model()}, {os.cpu_count()} CPUs, "
+        f"{_total_memory_gb()} GB"
+    )
+
+
+def host_profile_path(profiles_dir: Path = HOST_PROFILES_DIR) -> Path:
+    """Get the path of this host's profile.
+
+    Args:
+        profiles_dir (Path, optional): Directory of host profiles. Defaults to
+        HOST_PROFILES_DIR.
+
+    Returns:
+        Path: Path to the profile (which may not exist).
+    """
+    key = hashlib.sha1(host_signature().encode()).hexdigest()[:16]
+    return profiles_dir / f"{key}.json"
+
+
+def read_host_profile(path: Optional[Path] = None) -> Optional[HostProfile]:
+    """Read the profile for this host.
+
+    Args:
+        path (Optional[Path], optional): Path to the profile. Defaults to None (this
+        host's profile in HOST_PROFILES_DIR).
+
+    Returns:
+        Optional[HostProfile]: The host profile or None if the host was not tuned.
+    """
+    if path is None:
+        path = host_profile_path()
+    if not path.exists():
+        return None
+    return HostProfile.parse_file(path)
+
+
+def write_host_profile(profile: HostProfile, path: Optional[Path] = None) -> Path:
+    """Write a host profile.
+
+    Args:
+        profile (HostProfile): Host profile.
+        path (Optional[Path], optional): Path to the profile. Defaults to None (this
+        host's profile in HOST_PROFILES_DIR).
+
+    Returns:
+        Path: Path the profile was written to.
+    """
+    if path is None:
+        path = host_profile_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as file:
+        file.write(profile.json())
+    return path
+
+
+def apply_host_profile(profile: HostProfile) -> None:
+    """Use a host profile's throughput settings for summarizing in this process.
+
+    The number of BART workers is left to the caller, and the chunk length and beam
+    cap change the summaries so they are set in the configurations (see
+    `tuned_configuration`).
+
+    Args:
+        profile (HostProfile): Host profile.
+    """
+    set_throughput_settings(profile.bart)
+    return None
+
+
+def _with_max_beams(
+    config: SummarizationConfiguration, max_beams: int
+) -> SummarizationConfiguration:
+    # The beam cap is a BART parameter (also for hybrid summarization, which passes
+    # its other parameters on to BART). The configuration is validated so that the cap
+    # is stored as it is when the configuration is read back (e.g. in file names).
+    kwargs = {**(config.config_kwargs or {}), "max_beams": max_beams}
+    return SummarizationConfiguration.parse_obj(
+        {**config.dict(), "config_kwargs": kwargs}
+    )
+
+
+def tuned_configuration(
+    config: SummarizationConfiguration, profile: HostProfile
+) -> SummarizationConfiguration:
+    """Use a host profile's chunk length and beam cap for a configuration.
+
+    Only configurations that summarize with BART are changed, and a chunk length or
+    beam cap set by the configuration itself is kept.
+
+    Args:
+        config (SummarizationConfiguration): Summarization configuration.
+        profile (HostProfile): Host profile.
+
+    Returns:
+        SummarizationConfiguration: Configuration with the tuned chunk length and beam
+        cap.
+    """
+    if abstractive_config(config).method is not SummarizationMethod.BART:
+        return config
+    if config.max_chunk_words is None:
+        config = with_max_chunk_length(
+            config, SummarizationMethod.BART, profile.max_chunk_words
+        )
+    has_max_beams = "max_beams" in (config.config_kwargs or {})
+    if profile.max_beams is not None and not has_max_beams:
+        config = _with_max_beams(config, profile.max_beams)
+    return config
+
+
+def sample_articles(
+    articles: list[ScientificArticle], n_words: int
+) -> list[ScientificArticle]:
+    """Take a sample of text from each article to benchmark with.
+
+    Each sample is the start of the article's discussion (or introduction) so that it
+    is long enough to be split into several chunks.
+
+    Args:
+        articles (list[ScientificArticle]): Articles.
+        n_words (int): Total number of words to sample.
+
+    Returns:
+        list[ScientificArticle]: Articles with only the sampled text (as introduction).
+    """
+    words_per_article = n_words // max(len(articles), 1)
+    samples: list[ScientificArticle] = []
+    for article in articles:
+        paragraphs: list[str] = []
+        n_sampled = 0
+        for paragraph in article.text.Discussion or article.text.Introduction:
+            if n_sampled >= words_per_article:
+                break
+            paragraphs.append(paragraph)
+            n_sampled += word_count(paragraph)
+        text = ScientificArticleText(
+            Abstract=[], Introduction=paragraphs, Methods={}, Results={}, Discussion=[]
+        )
+        samples.append(
+            ScientificArticle(title=article.title, url=article.url, text=text)
+        )
+    return samples
+
+
+def _summarize_sample(
+    samples: list[ScientificArticle], config: SummarizationConfiguration
+) -> tuple[list[str], int]:
+    # Summarizes each sample and returns the summaries (the chunks' summaries joined)
+    # and the number of words summarized.
+    summaries: list[str] = []
+    n_words = 0
+    for sample in samples:
+        chunks = chunk_article(sample, config=config)
+        summaries.append(" ".join(summarize_chunks(chunks, config=config)))
+        n_words += sum(word_count(c.text) for c in chunks)
+    return summaries, n_words
+
+
+def run_trial(
+    trial: AutotuneTrial,
+    samples: list[ScientificArticle],
+    config: SummarizationConfiguration,
+    references: list[str],
+) -> AutotuneTrial:
+    """Benchmark a set of settings.
+
+    Args:
+        trial (AutotuneTrial): Settings to try.
+        samples (list[ScientificArticle]): Sample of articles to summarize.
+        config (SummarizationConfiguration): BART configuration to summarize with.
+        references (list[str]): Summaries of the samples with the default settings.
+
+    Returns:
+        AutotuneTrial: The settings with their speed and quality.
+    """
+    set_throughput_settings(trial.bart)
+    config = with_max_chunk_length(
+        config, SummarizationMethod.BART, trial.max_chunk_words
+    )
+    if trial.max_beams is not None:
+        config = _with_max_beams(config, trial.max_beams)
+    if trial.bart_workers > 0:
+        start_worker_pool(trial.bart_workers)
+    try:
+        start = perf_counter()
+        summaries, n_words = _summarize_sample(samples, config=config)
+        seconds = perf_counter() - start
+    finally:
+        stop_worker_pool()
+    similarities = [rouge_n(s, r, n=1) for s, r in zip(summaries, references)]
+    quality = sum(similarities) / max(len(similarities), 1)
+    return trial.copy(
+        update={"words_per_second": n_words / seconds, "quality": quality}
+    )
+
+
+def _worker_candidates(max_workers: int) -> list[int]:
+    candidates, n = [0], 2
+    while n <= max_workers:
+        candidates.append(n)
+        n *= 2
+    return candidates
+
+
+def _thread_candidates(n_workers: int) -> list[Optional[int]]:
+    max_threads = max((os.cpu_count() or 1) // max(n_workers, 1), 1)
+    candidates: list[Optional[int]] = [None]
+    n = 1
+    while n <= max_threads:
+        candidates.append(n)
+        n *= 2
+    return candidates
+
+
+def autotune(
+    articles: list[ScientificArticle],
+    config: SummarizationConfiguration,
+    n_words: int = 3000,
+    tolerance: float = 0.1,
+    max_workers: Optional[int] = None,
+    log: Callable[[str], None] = print,
+) -> HostProfile:
+    """Find the fastest throughput settings for this host.
+
+    The settings are tuned one at a time (worker processes, PyTorch threads, batch
+    size, chunk length, and then beams), each time keeping the fastest value whose
+    summaries have a similarity of at least `1 - tolerance` to the summaries with the
+    default settings.
+
+    Args:
+        articles (list[ScientificArticle]): Articles to sample text from.
+        config (SummarizationConfiguration): BART configuration to summarize with.
+        n_words (int, optional): Number of words to benchmark with. Defaults to 3000.
+        tolerance (float, optional): Largest acceptable drop in similarity to the
+        summaries with the default settings. Defaults to 0.1.
+        max_workers (Optional[int], optional): Maximum number of worker processes.
+        Defaults to None (the number of CPUs).
+        log (Callable[[str], None], optional): Reports the result of each trial.
+        Defaults to print.
+
+    Raises:
+        ValueError: Raised if the configuration is not for BART summarization.
+
+    Returns:
+        HostProfile: Tuned settings for this host.
+    """
+    if config.method is not SummarizationMethod.BART:
+        raise ValueError("Only BART summarization can be tuned.")
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    samples = sample_articles(articles, n_words=n_words)
+    default_settings = get_throughput_settings()
+    default_chunk_words = SUMMARIZATION_METHOD_MAX_LENGTHS[SummarizationMethod.BART]
+    baseline = AutotuneTrial(
+        bart_workers=0,
+        max_chunk_words=default_chunk_words,
+        bart=BartThroughputSettings(),
+    )
+
+    def _format(trial: AutotuneTrial) -> str:
+        return (
+            f"workers={trial.bart_workers} chunk_words={trial.max_chunk_words} "
+            f"threads={trial.bart.torch_threads} batch={trial.bart.batch_size} "
+            f"max_beams={trial.max_beams}: {trial.words_per_second:.1f} "
+            f"words/s, similarity {trial.quality:.3f}"
+        )
+
+    try:
+        # Load the model and summarize the sample once (untimed) for the references.
+        get_summarizer()
+        set_throughput_settings(baseline.bart)
+        references, _ = _summarize_sample(samples, config=config)
+        best = run_trial(baseline, samples, config=config, references=references)
+        baseline = best
+        log("baseline " + _format(best))
+
+        def _tune(candidates: list[AutotuneTrial]) -> None:
+            nonlocal best
+            for candidate in candidates:
+                trial = run_trial(
+                    candidate, samples, config=config, references=references
+                )
+                log(_format(trial))
+                if (
+                    trial.quality >= 1 - tolerance
+                    and trial.words_per_second > MIN_SPEEDUP * best.words_per_second
+                ):
+                    best = trial
+            return None
+
+        _tune(
+            [
+                best.copy(update={"bart_workers": n})
+                for n in _worker_candidates(max_workers)
+                if n != best.bart_workers
+            ]
+        )
+        _tune(
+            [
+                best.copy(update={"bart": best.bart.copy(update={"torch_threads": n})})
+                for n in _thread_candidates(best.bart_workers)
+                if n != best.bart.torch_threads
+            ]
+        )
+        _tune(
+            [
+                best.copy(update={"bart": best.bart.copy(update={"batch_size": n})})
+                for n in BATCH_SIZE_CANDIDATES
+                if n != best.bart.batch_size
+            ]
+        )
+        _tune(
+            [
+                best.copy(update={"max_chunk_words": n})
+                for n in CHUNK_WORDS_CANDIDATES
+                if n != best.max_chunk_words
+            ]
+        )
+        profile_name = decoding_profile_name(config.config_kwargs or {})
+        max_beams = BART_DECODING_PROFILES[profile_name].num_beams
+        _tune([best.copy(update={"max_beams": n}) for n in range(max_beams - 1, 0, -1)])
+    finally:
+        set_throughput_settings(default_settings)
+
+    return HostProfile(
+        host=host_signature(),
+        bart_workers=best.bart_workers,
+        max_chunk_words=best.max_chunk_words,
+        max_beams=best.max_beams,
+        bart=best.bart,
+        words_per_second=best.words_per_second,
+        baseline_words_per_second=baseline.words_per_second,
+        quality=best.quality,
+    )
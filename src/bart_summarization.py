@@ -1,12 +1,81 @@
 """Use the Bart transformer from Huggingface for text summarization."""
 
-from typing import Any
+import json
+import multiprocessing
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import repeat
+from math import ceil
+from multiprocessing.context import BaseContext
+from pathlib import Path
+from typing import Any, Final, Literal, Optional
 
-from pydantic import BaseModel, PositiveFloat
-from transformers import pipeline
+import torch
+from pydantic import BaseModel, PositiveFloat, PositiveInt
+from transformers import (
+    AutoConfig,
+    AutoModelForSeq2SeqLM,
+    AutoTokenizer,
+    Pipeline,
+    pipeline,
+)
 
+from src.memory_budget import (
+    ModelMemoryProfile,
+    measure_peak_memory,
+    memory_guard_active,
+    memory_in_use,
+    under_memory_pressure,
+)
 from src.text_utils import word_count
 
+BART_MODEL_NAME: Final[str] = "facebook/bart-large-cnn"
+
+# Path to weights exported with `export_shared_weights()`. If set, every process maps
+# the same file instead of loading its own copy of the model.
+BART_WEIGHTS_ENV_VAR: Final[str] = "BART_WEIGHTS_PATH"
+
+DecodingProfileName = Literal["fast", "balanced", "quality"]
+
+
+class BartDecodingProfile(BaseModel):
+    """Parameters for generating a summary with BART."""
+
+    num_beams: PositiveInt
+    early_stopping: bool
+    length_penalty: float
+    no_repeat_ngram_size: int
+    max_tokens: Optional[PositiveInt] = None  # Hard cap on tokens per chunk.
+
+
+# "quality" is the default generation configuration of bart-large-cnn.
+BART_DECODING_PROFILES: Final[dict[str, BartDecodingProfile]] = {
+    "fast": BartDecodingProfile(
+        num_beams=1,
+        early_stopping=False,
+        length_penalty=1.0,
+        no_repeat_ngram_size=3,
+        max_tokens=128,
+    ),
+    "balanced": BartDecodingProfile(
+        num_beams=2,
+        early_stopping=True,
+        length_penalty=1.5,
+        no_repeat_ngram_size=3,
+        max_tokens=256,
+    ),
+    "quality": BartDecodingProfile(
+        num_beams=4,
+        early_stopping=True,
+        length_penalty=2.0,
+        no_repeat_ngram_size=3,
+    ),
+}
+
 
 class BartSummarizationConfiguration(BaseModel):
     """Configuration parameters for summarization with BART."""
@@ -14,6 +83,117 @@ class BartSummarizationConfiguration(BaseModel):
     max_ratio: PositiveFloat = 0.3
     min_ratio: PositiveFloat = 0.1
     do_sample: bool = False
+    decoding_profile: DecodingProfileName = "quality"
+    # Seconds generation may take; it stops early (with a cut-off summary) at the limit.
+    max_time: Optional[PositiveFloat] = None
+    # Cap on the decoding profile's beams (e.g. tuned for the host by `autotune`).
+    max_beams: Optional[PositiveInt] = None
+
+
+class SharedTensorInfo(BaseModel):
+    """Location of a tensor in an exported weights file."""
+
+    name: str
+    dtype: str
+    shape: list[int]
+    offset: int  # In number of elements of `dtype`.
+
+
+def _weights_data_path(index_path: Path, dtype: str) -> Path:
+    return index_path.with_name(f"{index_path.stem}.{dtype}.bin")
+
+
+def _named_tensors(model: torch.nn.Module) -> list[tuple[str, torch.Tensor]]:
+    # Parameters that are tied (e.g. the shared token embeddings) are listed once.
+    return [*model.named_parameters(), *model.named_buffers()]
+
+
+def export_shared_weights(index_path: Path) -> None:
+    """Export the BART weights to flat files that can be memory-mapped.
+
+    The weights are written as one flat binary file per data type next to a JSON index
+    of where each tensor is.
+
+    Args:
+        index_path (Path): Path of the JSON index (e.g. "cache/bart-large-cnn.json").
+    """
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    model = AutoModelForSeq2SeqLM.from_pretrained(BART_MODEL_NAME)
+    infos: list[SharedTensorInfo] = []
+    offsets: dict[str, int] = {}
+    files: dict[str, Any] = {}
+    try:
+        for name, tensor in _named_tensors(model):
+            dtype = str(tensor.dtype).replace("torch.", "")
+            if dtype not in files:
+                files[dtype] = open(_weights_data_path(index_path, dtype), "wb")
+                offsets[dtype] = 0
+            array = tensor.detach().contiguous().numpy()
+            files[dtype].write(array.tobytes())
+            infos.append(
+                SharedTensorInfo(
+                    name=name,
+                    dtype=dtype,
+                    shape=list(tensor.shape),
+                    offset=offsets[dtype],
+                )
+            )
+            offsets[dtype] += tensor.numel()
+    finally:
+        for file in files.values():
+            file.close()
+    with open(index_path, "w") as file:
+        json.dump(
+            {"model": BART_MODEL_NAME, "tensors": [i.dict() for i in infos]}, file
+        )
+    return None
+
+
+_STORAGE_TYPES: Final[dict[str, Any]] = {
+    "float32": torch.FloatStorage,
+    "float16": torch.HalfStorage,
+    "int64": torch.LongStorage,
+}
+
+
+def _load_shared_weights_model(index_path: Path) -> torch.nn.Module:
+    with open(index_path, "r") as file:
+        index = json.load(file)
+    infos = [SharedTensorInfo(**i) for i in index["tensors"]]
+    sizes: dict[str, int] = {}
+    for info in infos:
+        numel = int(torch.Size(info.shape).numel())
+        sizes[info.dtype] = max(sizes.get(info.dtype, 0), info.offset + numel)
+    # Private read-only mappings of the same file share their pages between processes.
+    flat: dict[str, torch.Tensor] = {}
+    for dtype, size in sizes.items():
+        storage = _STORAGE_TYPES[dtype].from_file(
+            str(_weights_data_path(index_path, dtype)), False, size
+        )
+        flat[dtype] = torch.tensor([], dtype=getattr(torch, dtype)).set_(storage)
+    model = AutoModelForSeq2SeqLM.from_config(
+        AutoConfig.from_pretrained(index["model"])
+    )
+    tensors = dict(_named_tensors(model))
+    for info in infos:
+        numel = int(torch.Size(info.shape).numel())
+        view = flat[info.dtype][info.offset : info.offset + numel].view(info.shape)
+        tensors[info.name].data = view
+    return model.eval()
+
+
+@lru_cache(maxsize=1)
+def get_summarizer() -> Pipeline:
+    """Get the BART summarization pipeline, loading it once per process.
+
+    Returns:
+        Pipeline: HuggingFace summarization pipeline.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(BART_MODEL_NAME)
+    if (weights_path := os.getenv(BART_WEIGHTS_ENV_VAR)) is not None:
+        model = _load_shared_weights_model(Path(weights_path))
+        return pipeline("summarization", model=model, tokenizer=tokenizer)
+    return pipeline("summarization", model=BART_MODEL_NAME, tokenizer=tokenizer)
 
 
 def _extract_summary(bart_res: Any) -> str:
@@ -21,6 +201,97 @@ def _extract_summary(bart_res: Any) -> str:
     return bart_res[0]["summary_text"].strip()
 
 
+def decoding_profile_name(config_kwargs: dict[str, Any]) -> str:
+    """Get the name of the decoding profile a configuration uses.
+
+    Args:
+        config_kwargs (dict[str, Any]): Configuration parameters.
+
+    Returns:
+        str: Name of the decoding profile.
+    """
+    return BartSummarizationConfiguration(**config_kwargs).decoding_profile
+
+
+def beam_cap(config_kwargs: dict[str, Any]) -> Optional[int]:
+    """Get the cap on the decoding profile's beams a configuration uses.
+
+    Args:
+        config_kwargs (dict[str, Any]): Configuration parameters.
+
+    Returns:
+        Optional[int]: Maximum number of beams (None if the profile's are used).
+    """
+    return BartSummarizationConfiguration(**config_kwargs).max_beams
+
+
+class BartThroughputSettings(BaseModel):
+    """Settings that change how fast BART summarizes (tuned per host by `autotune`)."""
+
+    torch_threads: Optional[PositiveInt] = None  # Per process (None: PyTorch default).
+    batch_size: PositiveInt = 1  # Number of texts generated together.
+
+
+_DEFAULT_TORCH_THREADS: Final[int] = torch.get_num_threads()
+
+_THROUGHPUT_SETTINGS = BartThroughputSettings()
+
+
+def set_throughput_settings(settings: BartThroughputSettings) -> None:
+    """Change the throughput settings for summarizing in this process.
+
+    Worker pools started afterwards use the same settings.
+
+    Args:
+        settings (BartThroughputSettings): Throughput settings.
+    """
+    global _THROUGHPUT_SETTINGS
+    _THROUGHPUT_SETTINGS = settings
+    torch.set_num_threads(settings.torch_threads or _DEFAULT_TORCH_THREADS)
+    return None
+
+
+def get_throughput_settings() -> BartThroughputSettings:
+    """Get the throughput settings for summarizing in this process.
+
+    Returns:
+        BartThroughputSettings: Throughput settings.
+    """
+    return _THROUGHPUT_SETTINGS
+
+
+# Summary lengths are set from the text's length rounded up to a multiple of this many
+# words, so that texts of similar length have the same generation settings and can be
+# generated together in a batch.
+_LENGTH_STEP_WORDS: Final[int] = 50
+
+
+def _generation_kwargs(
+    n_words: int, config: BartSummarizationConfiguration
+) -> dict[str, Any]:
+    profile = BART_DECODING_PROFILES[config.decoding_profile]
+    n_words = ceil(n_words / _LENGTH_STEP_WORDS) * _LENGTH_STEP_WORDS
+    max_length = max(int(n_words * config.max_ratio), 40)
+    if profile.max_tokens is not None:
+        max_length = min(max_length, profile.max_tokens)
+    min_length = min(max(int(n_words * config.min_ratio), 15), max_length)
+    num_beams = profile.num_beams
+    if config.max_beams is not None:
+        num_beams = min(num_beams, config.max_beams)
+    kwargs: dict[str, Any] = {
+        "max_length": max_length,
+        "min_length": min_length,
+        "do_sample": config.do_sample,
+        "num_beams": num_beams,
+        "early_stopping": profile.early_stopping,
+        "length_penalty": profile.length_penalty,
+        "no_repeat_ngram_size": profile.no_repeat_ngram_size,
+    }
+    if config.max_time is not None:
+        kwargs["max_time"] = config.max_time
+    return kwargs
+
+
 def summarize(text: str, config_kwargs: dict[str, Any]) -> str:
     """Summarize text with BART (from HuggingFace).
 
@@ -34,13 +305,285 @@ def summarize(text: str, config_kwargs: dict[str, Any]) -> str:
     Returns:
         str: Summary text.
     """
-    summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
+    summarizer = get_summarizer()
     config = BartSummarizationConfiguration(**config_kwargs)
-    n_words = word_count(text)
-    res = summarizer(
-        text,
-        max_length=max(int(n_words * config.max_ratio), 40),
-        min_length=max(int(n_words * config.min_ratio), 15),
-        do_sample=config.do_sample,
-    )
+    kwargs = _generation_kwargs(word_count(text), config)
+    res = summarizer(text, truncation=True, **kwargs)
     return _extract_summary(res)
+
+
+def _summarize_together(texts: list[str], config_kwargs: dict[str, Any]) -> list[str]:
+    # Generate the summaries of several texts in one batch. The texts must have the
+    # same generation settings (see `_make_batches()`) so that each is summarized as
+    # it would be on its own.
+    if len(texts) == 1:
+        return [summarize(texts[0], config_kwargs)]
+    summarizer = get_summarizer()
+    config = BartSummarizationConfiguration(**config_kwargs)
+    kwargs = _generation_kwargs(word_count(texts[0]), config)
+    inputs = summarizer.tokenizer(
+        texts, padding=True, truncation=True, return_tensors="pt"
+    )
+    with torch.no_grad():
+        output_ids = summarizer.model.generate(**inputs, **kwargs)
+    summaries = summarizer.tokenizer.batch_decode(
+        output_ids, skip_special_tokens=True, clean_up_tokenization_spaces=True
+    )
+    return [s.strip() for s in summaries]
+
+
+# Texts shorter than this are not split further when summarizing runs out of memory.
+MIN_SPLIT_WORDS: Final[int] = 50
+
+# Text used to measure the memory cost of summarizing.
+_PROBE_SENTENCE: Final[str] = (
+    "The tumour cells were treated with the inhibitor and their growth was measured "
+    "over several days."
+)
+
+
+def _is_out_of_memory(err: BaseException) -> bool:
+    # PyTorch reports failed CPU allocations as a `RuntimeError`.
+    if isinstance(err, MemoryError):
+        return True
+    return isinstance(err, RuntimeError) and "memory" in str(err).lower()
+
+
+def _summarize_or_split(text: str, config_kwargs: dict[str, Any]) -> str:
+    # If the text is too big to summarize in the available memory, summarize each half
+    # (split at a sentence boundary) separately instead.
+    try:
+        return summarize(text, config_kwargs)
+    except (MemoryError, RuntimeError) as err:
+        if not _is_out_of_memory(err) or word_count(text) < 2 * MIN_SPLIT_WORDS:
+            raise
+    cut = text.find(". ", len(text) // 2)
+    cut = cut + 1 if cut >= 0 else len(text) // 2
+    halves = [text[:cut].strip(), text[cut:].strip()]
+    return " ".join(_summarize_or_split(h, config_kwargs) for h in halves)
+
+
+def _summarize_together_or_split(
+    texts: list[str], config_kwargs: dict[str, Any]
+) -> list[str]:
+    # If a batch runs out of memory, summarize each half of the batch separately.
+    if len(texts) == 1:
+        return [_summarize_or_split(texts[0], config_kwargs)]
+    try:
+        return _summarize_together(texts, config_kwargs)
+    except (MemoryError, RuntimeError) as err:
+        if not _is_out_of_memory(err):
+            raise
+    half = len(texts) // 2
+    return [
+        *_summarize_together_or_split(texts[:half], config_kwargs),
+        *_summarize_together_or_split(texts[half:], config_kwargs),
+    ]
+
+
+def _make_batches(
+    texts: list[str], batch_size: int, config_kwargs: dict[str, Any]
+) -> list[list[int]]:
+    # Only texts with the same generation settings (which depend on their length,
+    # rounded up to `_LENGTH_STEP_WORDS`) are batched together, shortest first to
+    # waste less time on padding.
+    config = BartSummarizationConfiguration(**config_kwargs)
+    groups: dict[str, list[int]] = defaultdict(list)
+    for i in sorted(range(len(texts)), key=lambda i: word_count(texts[i])):
+        kwargs = _generation_kwargs(word_count(texts[i]), config)
+        groups[json.dumps(kwargs, sort_keys=True)].append(i)
+    return [
+        group[i : i + batch_size]
+        for group in groups.values()
+        for i in range(0, len(group), batch_size)
+    ]
+
+
+def measure_memory(config_kwargs: dict[str, Any]) -> ModelMemoryProfile:
+    """Measure the memory cost of summarizing with BART in this process.
+
+    Args:
+        config_kwargs (dict[str, Any]): Configuration parameters (the decoding profile
+        affects the memory needed).
+
+    Returns:
+        ModelMemoryProfile: Size of the weights and peak activation memory per word.
+    """
+    summarizer = get_summarizer()
+    model_bytes = sum(
+        t.numel() * t.element_size() for _, t in _named_tensors(summarizer.model)
+    )
+    probe = " ".join([_PROBE_SENTENCE] * 20)
+    before = memory_in_use([os.getpid()])
+    peak = measure_peak_memory(lambda: summarize(probe, config_kwargs))
+    return ModelMemoryProfile(
+        model_bytes=model_bytes,
+        bytes_per_word=max(peak - before, 0) / word_count(probe),
+    )
+
+
+_WORKER_POOL: Optional[ProcessPoolExecutor] = None
+_WORKER_POOL_SIZE = 0
+
+
+def _init_worker(n_threads: int, settings: BartThroughputSettings) -> None:
+    set_throughput_settings(settings)
+    torch.set_num_threads(n_threads)
+    get_summarizer()  # Already loaded in the parent unless the pool was spawned.
+    return None
+
+
+def _can_fork_workers() -> bool:
+    # Forking a process that has loaded torch is only safe on Linux: on macOS the
+    # system frameworks torch uses (e.g. Accelerate) crash in forked children.
+    return sys.platform.startswith("linux")
+
+
+def start_worker_pool(n_workers: int) -> ProcessPoolExecutor:
+    """Start a pool of processes that summarize with BART.
+
+    The model is loaded before the workers are started. On Linux, where a process that
+    has loaded torch can be forked safely, the workers inherit the loaded model's memory
+    instead of loading their own copy. Otherwise each worker loads the model itself,
+    which is only shared between them if the weights are memory-mapped (see
+    `BART_WEIGHTS_ENV_VAR`).
+
+    Args:
+        n_workers (int): Number of worker processes.
+
+    Returns:
+        ProcessPoolExecutor: The worker pool.
+    """
+    global _WORKER_POOL, _WORKER_POOL_SIZE
+    stop_worker_pool()
+    # The tokenizers library's thread pool does not survive being forked.
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    context: BaseContext
+    if _can_fork_workers():
+        get_summarizer()
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context("spawn")
+    n_threads = _THROUGHPUT_SETTINGS.torch_threads
+    if n_threads is None:
+        n_threads = max((os.cpu_count() or 1) // n_workers, 1)
+    _WORKER_POOL = ProcessPoolExecutor(
+        n_workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(n_threads, _THROUGHPUT_SETTINGS),
+    )
+    _WORKER_POOL_SIZE = n_workers
+    # Start all of the workers now (they are otherwise started on demand).
+    for _ in _WORKER_POOL.map(_worker_ready, range(n_workers)):
+        pass
+    return _WORKER_POOL
+
+
+def _worker_ready(_: int) -> int:
+    return os.getpid()
+
+
+def stop_worker_pool() -> None:
+    """Stop the pool of BART worker processes (if one is running)."""
+    global _WORKER_POOL, _WORKER_POOL_SIZE
+    if _WORKER_POOL is not None:
+        _WORKER_POOL.shutdown(wait=True)
+        _WORKER_POOL = None
+        _WORKER_POOL_SIZE = 0
+    return None
+
+
+def _restart_worker_pool() -> ProcessPoolExecutor:
+    # A worker died (e.g. the kernel killed it for running out of memory), which
+    # breaks the pool: start a new one of the same size.
+    return start_worker_pool(_WORKER_POOL_SIZE)
+
+
+def worker_pids() -> list[int]:
+    """Get the process IDs of the BART workers.
+
+    Returns:
+        list[int]: Process IDs (empty if there is no worker pool).
+    """
+    if _WORKER_POOL is None:
+        return []
+    return list(_WORKER_POOL._processes)
+
+
+def summarize_batch(texts: list[str], config_kwargs: dict[str, Any]) -> list[str]:
+    """Summarize several texts with BART, on the worker pool if one is running.
+
+    Texts with the same generation settings are generated together in batches of the
+    throughput settings' batch size, so each summary is the same as from `summarize()`.
+    A text that runs out of memory is summarized in two halves instead. While a memory
+    guard is running, texts are summarized one at a time and fewer at once under memory
+    pressure.
+
+    Args:
+        texts (list[str]): Texts to summarize.
+        config_kwargs (dict[str, Any]): Configuration parameters.
+
+    Returns:
+        list[str]: Summaries in the same order as the texts.
+    """
+    if _WORKER_POOL is not None:
+        try:
+            return _summarize_batch_on_pool(_WORKER_POOL, texts, config_kwargs)
+        except BrokenProcessPool:
+            # Try again with a new pool, one text at a time to use less memory.
+            pool = _restart_worker_pool()
+            return _summarize_batch_throttled(pool, texts, config_kwargs, limit=1)
+    batches = _make_batches(
+        texts, batch_size=_THROUGHPUT_SETTINGS.batch_size, config_kwargs=config_kwargs
+    )
+    batch_texts = [[texts[i] for i in batch] for batch in batches]
+    results = [_summarize_together_or_split(b, config_kwargs) for b in batch_texts]
+    summaries: dict[int, str] = {}
+    for batch, batch_summaries in zip(batches, results):
+        summaries.update(zip(batch, batch_summaries))
+    return [summaries[i] for i in range(len(texts))]
+
+
+def _summarize_batch_on_pool(
+    pool: ProcessPoolExecutor, texts: list[str], config_kwargs: dict[str, Any]
+) -> list[str]:
+    if memory_guard_active():
+        return _summarize_batch_throttled(pool, texts, config_kwargs)
+    batches = _make_batches(
+        texts, batch_size=_THROUGHPUT_SETTINGS.batch_size, config_kwargs=config_kwargs
+    )
+    batch_texts = [[texts[i] for i in batch] for batch in batches]
+    results = pool.map(_summarize_together_or_split, batch_texts, repeat(config_kwargs))
+    summaries: dict[int, str] = {}
+    for batch, batch_summaries in zip(batches, results):
+        summaries.update(zip(batch, batch_summaries))
+    return [summaries[i] for i in range(len(texts))]
+
+
+def _summarize_batch_throttled(
+    pool: ProcessPoolExecutor,
+    texts: list[str],
+    config_kwargs: dict[str, Any],
+    limit: Optional[int] = None,
+) -> list[str]:
+    # Fewer texts are summarized at once while memory is running short (halving the
+    # number each time), and more again once it is not, up to `limit` at once.
+    n_workers = max(len(worker_pids()), 1)
+    if limit is not None:
+        n_workers = min(n_workers, limit)
+    max_in_flight = n_workers
+    pending: dict[int, Future] = {}
+    summaries: dict[int, str] = {}
+    for i, text in enumerate(texts):
+        while len(pending) >= max_in_flight:
+            oldest = min(pending)
+            summaries[oldest] = pending.pop(oldest).result()
+            if under_memory_pressure():
+                max_in_flight = max(max_in_flight // 2, 1)
+            elif max_in_flight < n_workers:
+                max_in_flight += 1
+        pending[i] = pool.submit(_summarize_or_split, text, config_kwargs)
+    for i, future in pending.items():
+        summaries[i] = future.result()
+    return [summaries[i] for i in range(len(texts))]
@@ -0,0 +1,93 @@
+"""Summarize a batch of articles in one process, streaming the results."""
+
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO
+
+from pydantic import BaseModel
+
+from src.bulk_ingest import ArchiveMember, IngestError, parse_archive_member
+from src.classes_and_types import (
+    ScientificArticle,
+    SummarizationConfiguration,
+    SummarizedScientificArticle,
+)
+from src.parse_scientific_article import get_and_parse_article
+from src.summarize_utils import summarize_article
+
+
+class BatchResult(BaseModel):
+    """Result of summarizing one item of a batch: a summary or an error."""
+
+    input: str
+    article: Optional[SummarizedScientificArticle] = None
+    error: Optional[str] = None
+
+
+def read_batch_items(file: TextIO) -> Iterator[str]:
+    """Read the items of a batch (one URL or file path per line).
+
+    Blank lines and lines starting with "#" are skipped.
+
+    Args:
+        file (TextIO): Input file (e.g. stdin).
+
+    Yields:
+        Iterator[str]: URLs and file paths.
+    """
+    for line in file:
+        if (line := line.strip()) != "" and not line.startswith("#"):
+            yield line
+    return
+
+
+def load_batch_item(item: str) -> ScientificArticle:
+    """Load the article for an item of a batch.
+
+    Args:
+        item (str): URL of the article's webpage or the path to a saved webpage, JATS
+        XML file, or parsed article (JSON).
+
+    Returns:
+        ScientificArticle: Parsed article.
+    """
+    if item.startswith(("http://", "https://")):
+        return get_and_parse_article(item)
+    path = Path(item)
+    if path.suffix.lower() == ".json":
+        return ScientificArticle.parse_file(path)
+    res = parse_archive_member(ArchiveMember(name=item, content=path.read_bytes()))
+    if isinstance(res, IngestError):
+        raise ValueError(res.error)
+    return res
+
+
+def summarize_batch_items(
+    items: Iterable[str],
+    config: SummarizationConfiguration,
+    time_budget: Optional[float] = None,
+) -> Iterator[BatchResult]:
+    """Summarize each item of a batch in turn.
+
+    The summarization backends are loaded once (on the first item) and reused for the
+    rest of the batch. A failure is reported as the item's result and does not stop
+    the batch.
+
+    Args:
+        items (Iterable[str]): URLs and file paths.
+        config (SummarizationConfiguration): Summarization configuration.
+        time_budget (Optional[float], optional): Seconds each article's summarization
+        may take (see `summarize_article()`). Defaults to None.
+
+    Yields:
+        Iterator[BatchResult]: Result for each item as soon as it is finished.
+    """
+    for item in items:
+        try:
+            article = summarize_article(
+                load_batch_item(item), config=config, time_budget=time_budget
+            )
+        except Exception as err:
+            yield BatchResult(input=item, error=repr(err))
+            continue
+        yield BatchResult(input=item, article=article)
+    return
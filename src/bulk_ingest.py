@@ -0,0 +1,304 @@
+"""Stream articles out of bulk archives of JATS XML and saved HTML."""
+
+import re
+import tarfile
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path, PurePosixPath
+from typing import IO, Final, Iterator, Optional, Union
+from xml.etree import ElementTree
+
+from pydantic import BaseModel
+
+from src.classes_and_types import (
+    ScientificArticle,
+    ScientificArticleText,
+    multisection_text,
+    section_text,
+)
+from src.parse_scientific_article import parse_article_html
+
+JATS_SUFFIXES: Final[set[str]] = {".xml", ".nxml"}
+HTML_SUFFIXES: Final[set[str]] = {".html", ".htm"}
+
+# Figures and tables (with their captions and footnotes) are left out of the text, as
+# they are by the HTML parser.
+_JATS_SKIPPED_TAGS: Final[set[str]] = {"fig", "table-wrap", "table-wrap-foot"}
+
+
+class ArchiveMember(BaseModel):
+    """Raw contents of a single file read out of an archive."""
+
+    name: str
+    content: bytes
+
+
+class IngestError(BaseModel):
+    """An archive member that could not be parsed into an article."""
+
+    name: str
+    error: str
+
+
+def _member_suffix(name: str) -> str:
+    return PurePosixPath(name).suffix.lower()
+
+
+def _is_article_member(name: str) -> bool:
+    return _member_suffix(name) in JATS_SUFFIXES | HTML_SUFFIXES
+
+
+def _iter_archive_files(archive: Path) -> Iterator[tuple[str, IO[bytes]]]:
+    # Yields the name and an open file of each article in the archive. A file can only
+    # be read until the next one is requested.
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                if info.is_dir() or not _is_article_member(info.filename):
+                    continue
+                with zip_file.open(info) as file:
+                    yield info.filename, file
+        return
+
+    with tarfile.open(archive, mode="r|*") as tar_file:
+        for tar_info in tar_file:
+            if not tar_info.isfile() or not _is_article_member(tar_info.name):
+                continue
+            member_file = tar_file.extractfile(tar_info)
+            if member_file is None:
+                continue
+            yield tar_info.name, member_file
+    return
+
+
+def iter_archive_members(archive: Path) -> Iterator[ArchiveMember]:
+    """Stream the article files out of a tar or zip archive without extracting it.
+
+    Tar archives (optionally compressed) are read sequentially, so only one member is
+    held in memory at a time.
+
+    Args:
+        archive (Path): Path to the archive.
+
+    Yields:
+        Iterator[ArchiveMember]: Article files in the archive.
+    """
+    for name, file in _iter_archive_files(archive):
+        yield ArchiveMember(name=name, content=file.read())
+    return
+
+
+def _local_tag(element: ElementTree.Element) -> str:
+    return element.tag.rsplit("}", 1)[-1] if isinstance(element.tag, str) else ""
+
+
+def _jats_text(element: ElementTree.Element) -> str:
+    # Like `itertext()` but without citation call-outs (as in the HTML parser).
+    text = element.text or ""
+    for child in element:
+        is_citation = _local_tag(child) == "xref" and child.get("ref-type") == "bibr"
+        if not is_citation and _local_tag(child) not in _JATS_SKIPPED_TAGS:
+            text += _jats_text(child)
+        text += child.tail or ""
+    return text
+
+
+def _jats_paragraph_text(element: ElementTree.Element) -> str:
+    text = re.sub(r"\s+", " ", _jats_text(element)).strip()
+    # Remove the punctuation left behind by removed citations, e.g. "cancer [, ]".
+    text = re.sub(r"\s*[\[(][\s,–-]*[\])]", "", text)
+    return re.sub(r"\s+([.,;:])", r"\1", text)
+
+
+def _jats_section_title(sec: ElementTree.Element) -> str:
+    for child in sec:
+        if _local_tag(child) == "title":
+            return _jats_paragraph_text(child)
+    return ""
+
+
+def _jats_paragraphs(sec: ElementTree.Element) -> section_text:
+    return [_jats_paragraph_text(c) for c in sec if _local_tag(c) == "p"]
+
+
+def _jats_multisection(sec: ElementTree.Element) -> multisection_text:
+    text: multisection_text = {}
+    if len(paragraphs := _jats_paragraphs(sec)) > 0:
+        text[_jats_section_title(sec)] = paragraphs
+    for sub_sec in (c for c in sec if _local_tag(c) == "sec"):
+        sub_paragraphs = _jats_paragraphs(sub_sec)
+        for sub_sub_sec in (c for c in sub_sec if _local_tag(c) == "sec"):
+            sub_paragraphs += _jats_paragraphs(sub_sub_sec)
+        if len(sub_paragraphs) > 0:
+            text[_jats_section_title(sub_sec)] = sub_paragraphs
+    return text
+
+
+def _iter_jats_paragraphs(
+    element: ElementTree.Element,
+) -> Iterator[ElementTree.Element]:
+    # Paragraphs anywhere in the element except in figures and tables.
+    for child in element:
+        if (tag := _local_tag(child)) == "p":
+            yield child
+        elif tag not in _JATS_SKIPPED_TAGS:
+            yield from _iter_jats_paragraphs(child)
+    return
+
+
+def _jats_flat_section(sec: ElementTree.Element) -> section_text:
+    return [_jats_paragraph_text(p) for p in _iter_jats_paragraphs(sec)]
+
+
+def _jats_section_name(title: str) -> Optional[str]:
+    title = title.lower()
+    if "result" in title:
+        return "Results"
+    if "method" in title or "material" in title:
+        return "Methods"
+    if "discussion" in title or "conclusion" in title:
+        return "Discussion"
+    if "introduction" in title or "background" in title:
+        return "Introduction"
+    return None
+
+
+def parse_jats(content: Union[bytes, IO[bytes]], name: str) -> ScientificArticle:
+    """Parse a JATS XML article.
+
+    The document is parsed incrementally (while it is read, if it is given as a file)
+    and each top-level body section is discarded as soon as it has been read.
+    Paragraphs directly in the body (outside of any section) are read as the
+    introduction. Figures and tables are left out.
+
+    Args:
+        content (Union[bytes, IO[bytes]]): JATS XML document or a file to read it
+        from.
+        name (str): Name of the file (used as the URL if the article has no DOI).
+
+    Returns:
+        ScientificArticle: Parsed article.
+    """
+    title: Optional[str] = None
+    doi: Optional[str] = None
+    sections: dict[str, Union[section_text, multisection_text]] = {
+        "Abstract": [],
+        "Introduction": [],
+        "Methods": {},
+        "Results": {},
+        "Discussion": [],
+    }
+    source = BytesIO(content) if isinstance(content, bytes) else content
+    stack: list[str] = []
+    for event, element in ElementTree.iterparse(source, events=("start", "end")):
+        tag = _local_tag(element)
+        if event == "start":
+            stack.append(tag)
+            continue
+        stack.pop()
+        parent = stack[-1] if len(stack) > 0 else ""
+        if tag == "article-title" and parent == "title-group" and title is None:
+            title = _jats_paragraph_text(element)
+        elif tag == "article-id" and element.get("pub-id-type") == "doi":
+            doi = (element.text or "").strip()
+        elif tag == "abstract" and len(sections["Abstract"]) == 0:
+            sections["Abstract"] = _jats_flat_section(element)
+        elif tag == "sec" and parent == "body":
+            section_name = _jats_section_name(_jats_section_title(element))
+            if section_name in {"Methods", "Results"}:
+                multisection = sections[section_name]
+                assert isinstance(multisection, dict)
+                multisection.update(_jats_multisection(element))
+            elif section_name is not None:
+                flat_section = sections[section_name]
+                assert isinstance(flat_section, list)
+                flat_section += _jats_flat_section(element)
+            element.clear()
+        elif tag == "p" and parent == "body":
+            # Paragraphs before the first section (outside of any section) are the
+            # introduction.
+            introduction = sections["Introduction"]
+            assert isinstance(introduction, list)
+            introduction.append(_jats_paragraph_text(element))
+            element.clear()
+        elif tag == "back":
+            element.clear()
+
+    if title is None:
+        raise ValueError("No article title found.")
+    url = f"https://doi.org/{doi}" if doi else name
+    return ScientificArticle(
+        title=title, url=url, text=ScientificArticleText(**sections)
+    )
+
+
+def parse_archive_member(
+    member: ArchiveMember,
+) -> Union[ScientificArticle, IngestError]:
+    """Parse an article file read out of an archive.
+
+    Args:
+        member (ArchiveMember): Archive member.
+
+    Returns:
+        Union[ScientificArticle, IngestError]: The parsed article or a description of
+        why it could not be parsed.
+    """
+    try:
+        if _member_suffix(member.name) in JATS_SUFFIXES:
+            return parse_jats(member.content, name=member.name)
+        return parse_article_html(member.content, url=member.name)
+    except Exception as err:
+        return IngestError(name=member.name, error=repr(err))
+
+
+def _parse_archive_file(
+    name: str, file: IO[bytes]
+) -> Union[ScientificArticle, IngestError]:
+    # Like `parse_archive_member()`, but JATS XML is parsed while it is read.
+    try:
+        if _member_suffix(name) in JATS_SUFFIXES:
+            return parse_jats(file, name=name)
+        return parse_article_html(file.read(), url=name)
+    except Exception as err:
+        return IngestError(name=name, error=repr(err))
+
+
+def ingest_archive(
+    archive: Path, processes: int = 1, max_pending: Optional[int] = None
+) -> Iterator[Union[ScientificArticle, IngestError]]:
+    """Stream parsed articles out of an archive, parsing on a pool of processes.
+
+    At most `max_pending` members are read ahead of the parsed articles that have been
+    consumed, so memory stays bounded regardless of the size of the archive.
+
+    Args:
+        archive (Path): Path to the tar or zip archive.
+        processes (int, optional): Number of parsing processes. Defaults to 1.
+        max_pending (Optional[int], optional): Maximum number of members being parsed
+        at once. Defaults to four per process.
+
+    Yields:
+        Iterator[Union[ScientificArticle, IngestError]]: Parsed articles (or errors) in
+        archive order.
+    """
+    if processes <= 1:
+        for name, file in _iter_archive_files(archive):
+            yield _parse_archive_file(name, file)
+        return
+
+    # Members are read in full to be sent to the parsing processes.
+    members = iter_archive_members(archive)
+
+    if max_pending is None:
+        max_pending = 4 * processes
+    pending: list[Future] = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for member in members:
+            pending.append(executor.submit(parse_archive_member, member))
+            if len(pending) >= max_pending:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+    return
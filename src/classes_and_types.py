@@ -1,6 +1,7 @@
 """Classes and types used throughout the project."""
 
 from enum import Enum
+from hashlib import sha1
 from typing import Optional, Union
 
 from pydantic import BaseModel
@@ -17,6 +18,7 @@ class SummarizationMethod(Enum):
     TEXTRANK = "TEXTRANK"
     BART = "BART"
     GPT3 = "GPT3"
+    HYBRID = "HYBRID"
 
 
 class SummarizationConfiguration(BaseModel):
@@ -24,6 +26,26 @@ class SummarizationConfiguration(BaseModel):
 
     method: SummarizationMethod
     config_kwargs: Optional[dict[str, Union[float, str, bool]]] = None
+    # Maximum number of words per chunk (defaults to the method's maximum).
+    max_chunk_words: Optional[int] = None
+
+
+def format_config(config: SummarizationConfiguration) -> str:
+    """Format a configuration as a human-readable string.
+
+    Args:
+        config (SummarizationConfiguration): Summarization configuration.
+
+    Returns:
+        str: Human-readable string.
+    """
+    if (kwargs := config.config_kwargs) is None:
+        config_str = "Default configuration"
+    else:
+        config_str = ", ".join(f"{k}: {v}" for k, v in kwargs.items())
+    if config.max_chunk_words is not None:
+        config_str += f" (chunks of up to {config.max_chunk_words} words)"
+    return config_str
 
 
 class ScientificArticleText(BaseModel):
@@ -68,11 +90,57 @@ class ScientificArticle(BaseModel):
         return str(self)
 
 
+class TextChunk(BaseModel):
+    """A piece of an article's section that is summarized in one call."""
+
+    section: str
+    subsection: Optional[str] = None
+    text: str
+    paragraph_hashes: list[str] = []
+
+    def text_hash(self) -> str:
+        """Hash the text of the chunk.
+
+        Returns:
+            str: Hex digest of the chunk's text.
+        """
+        return sha1(self.text.encode()).hexdigest()
+
+
+class SummarizedTextChunk(BaseModel):
+    """The summary of a chunk, identified by the hash of the chunk's text."""
+
+    section: str
+    subsection: Optional[str] = None
+    text_hash: str
+    summary: str
+    fallback: bool = False  # Summarized with TextRank because of a time budget.
+    # Hashes of the chunk's paragraphs (to chunk a revised article the same way).
+    paragraph_hashes: list[str] = []
+
+
 class SummarizedScientificArticle(ScientificArticle):
     """The results of summarizing an article."""
 
     config: SummarizationConfiguration
     summary: ScientificArticleText
+    chunks: list[SummarizedTextChunk] = []
+    decoding_profile: Optional[str] = None
+    # Cap on BART's beams from the configuration (None: the decoding profile's).
+    max_beams: Optional[int] = None
+
+    def fallback_sections(self) -> list[tuple[str, Optional[str]]]:
+        """Get the (sub)sections summarized with TextRank because of a time budget.
+
+        Returns:
+            list[tuple[str, Optional[str]]]: Section and subsection names.
+        """
+        sections: list[tuple[str, Optional[str]]] = []
+        for chunk in self.chunks:
+            key = (chunk.section, chunk.subsection)
+            if chunk.fallback and key not in sections:
+                sections.append(key)
+        return sections
 
     def __str__(self) -> str:
         """Get a string representation of the scientific article summary."""
@@ -2,16 +2,22 @@
 
 import json
 from pathlib import Path
+from typing import Iterable, Iterator, Mapping, Optional, Union
 
 import streamlit as st
 from pydantic import BaseModel
 
 from src.classes_and_types import (
+    ScientificArticleText,
     SummarizationConfiguration,
+    SummarizationMethod,
     SummarizedScientificArticle,
+    format_config,
     multisection_text,
     section_text,
 )
+from src.job_queue_client import JobInfo, JobStatus
+from src.results_archive import ArchiveEntry, ResultsArchive
 
 
 class SummarizedScientificArticleInfo(BaseModel):
@@ -30,20 +36,6 @@ class SummarizedScientificArticleInfo(BaseModel):
         return hash(self.title + self.method + self.config_str)
 
 
-def format_config(config: SummarizationConfiguration) -> str:
-    """Format a configuration as a human-readable string.
-
-    Args:
-        config (SummarizationConfiguration): Summarization configuration.
-
-    Returns:
-        str: Human-readable string.
-    """
-    if (kwargs := config.config_kwargs) is None:
-        return "Default configuration"
-    return ", ".join(f"{k}: {v}" for k, v in kwargs.items())
-
-
 def make_summary_info(
     article: SummarizedScientificArticle,
 ) -> SummarizedScientificArticleInfo:
@@ -55,10 +47,14 @@ def make_summary_info(
     Returns:
         SummarizedScientificArticleInfo: An info object.
     """
+    return _summary_info(title=article.title, config=article.config)
+
+
+def _summary_info(
+    title: str, config: SummarizationConfiguration
+) -> SummarizedScientificArticleInfo:
     return SummarizedScientificArticleInfo(
-        title=article.title,
-        method=article.config.method.value,
-        config_str=format_config(article.config),
+        title=title, method=config.method.value, config_str=format_config(config)
     )
 
 
@@ -76,21 +72,78 @@ def read_summarization(fpath: Path) -> SummarizedScientificArticle:
     return article
 
 
+class SummarizedArticles(
+    Mapping[SummarizedScientificArticleInfo, SummarizedScientificArticle]
+):
+    """Summarized articles keyed by their identifiable information.
+
+    Summaries in a results archive are only read (from the memory-mapped archive) when
+    they are looked up.
+    """
+
+    def __init__(
+        self,
+        summaries: Iterable[SummarizedScientificArticle],
+        archive: Optional[ResultsArchive] = None,
+    ) -> None:
+        """Collect summarized articles.
+
+        Args:
+            summaries (Iterable[SummarizedScientificArticle]): Summaries already read
+            in; these take precedence over summaries in the archive.
+            archive (Optional[ResultsArchive], optional): Results archive. Defaults to
+            None.
+        """
+        self._summaries = {make_summary_info(a): a for a in summaries}
+        self._archive = archive
+        self._archived: dict[SummarizedScientificArticleInfo, ArchiveEntry] = {}
+        if archive is not None:
+            for entry in archive.index.entries:
+                info = _summary_info(title=entry.title, config=entry.config)
+                if info not in self._summaries:
+                    self._archived[info] = entry
+
+    def __getitem__(
+        self, info: SummarizedScientificArticleInfo
+    ) -> SummarizedScientificArticle:
+        """Get a summarized article."""
+        if info in self._summaries:
+            return self._summaries[info]
+        entry = self._archived[info]
+        assert self._archive is not None
+        return self._archive.read(entry)
+
+    def __iter__(self) -> Iterator[SummarizedScientificArticleInfo]:
+        """Iterate over the information of the summarized articles."""
+        yield from self._summaries
+        yield from self._archived
+
+    def __len__(self) -> int:
+        """Count the summarized articles."""
+        return len(self._summaries) + len(self._archived)
+
+
 def get_summarized_articles(
-    dir: Path,
-) -> dict[SummarizedScientificArticleInfo, SummarizedScientificArticle]:
+    dir: Path, archive: Optional[Path] = None
+) -> SummarizedArticles:
     """Read in the summarized article objects and format as a dictionary.
 
     Args:
-        dir (Path): Directory holding the pickled summarized article objects.
+        dir (Path): Directory holding the summarized article objects (JSON).
+        archive (Optional[Path], optional): Results archive (see `export-results`)
+        to also read summaries from. Defaults to None.
 
     Returns:
-        dict[SummarizedScientificArticleInfo, SummarizedScientificArticle]: Dictionary
-        mapping summarization information to the full summary object.
+        SummarizedArticles: Mapping of summarization information to the full summary
+        object.
     """
-    files = [f for f in dir.iterdir() if f.suffix == ".json"]
-    summaries = [read_summarization(f) for f in files]
-    return {make_summary_info(a): a for a in summaries}
+    summaries: list[SummarizedScientificArticle] = []
+    if dir.exists():
+        files = [f for f in dir.iterdir() if f.suffix == ".json"]
+        summaries = [read_summarization(f) for f in files]
+    if archive is not None and archive.exists():
+        return SummarizedArticles(summaries, archive=ResultsArchive(archive))
+    return SummarizedArticles(summaries)
 
 
 def write_article_section(text: section_text) -> None:
@@ -118,6 +171,103 @@ def write_article_multisection(text: multisection_text) -> None:
     return None
 
 
+def parse_config_kwargs(text: str) -> dict[str, Union[float, str, bool]]:
+    """Parse configuration parameters written as "key=value" pairs.
+
+    Args:
+        text (str): Comma-separated "key=value" pairs (e.g. "ratio=0.1").
+
+    Returns:
+        dict[str, Union[float, str, bool]]: Configuration parameters.
+    """
+    kwargs: dict[str, Union[float, str, bool]] = {}
+    for pair in text.split(","):
+        if "=" not in pair:
+            continue
+        key, value = (x.strip() for x in pair.split("=", 1))
+        if value.lower() in {"true", "false"}:
+            kwargs[key] = value.lower() == "true"
+            continue
+        try:
+            kwargs[key] = float(value)
+        except ValueError:
+            kwargs[key] = value
+    return kwargs
+
+
+summary_request = tuple[str, SummarizationConfiguration, Optional[float]]
+
+
+def request_summary_form() -> Optional[summary_request]:
+    """Write a form to request a new summary to streamlit.
+
+    Returns:
+        Optional[summary_request]: The requested article URL, configuration, and time
+        budget (seconds) if the form was submitted.
+    """
+    with st.form("request_summary"):
+        url = st.text_input("Article URL")
+        method = st.selectbox(
+            "Summarization method", options=[m.value for m in SummarizationMethod]
+        )
+        config_text = st.text_input(
+            "Configuration (e.g. 'ratio=0.1' or 'min_ratio=0.1, max_ratio=0.3')"
+        )
+        time_budget = st.number_input(
+            "Time budget in seconds (0 for none); sections that BART or GPT-3 cannot "
+            "summarize in time are summarized with TextRank",
+            min_value=0,
+            value=0,
+        )
+        submitted = st.form_submit_button("Summarize")
+    if not submitted or len(url.strip()) == 0:
+        return None
+    config = SummarizationConfiguration(
+        method=SummarizationMethod(method),
+        config_kwargs=parse_config_kwargs(config_text),
+    )
+    return url.strip(), config, (float(time_budget) if time_budget > 0 else None)
+
+
+def _write_summary_text(summary: ScientificArticleText) -> None:
+    for section in ["Introduction", "Results", "Discussion"]:
+        text = getattr(summary, section)
+        if len(text) == 0:
+            continue
+        st.markdown(f"#### {section}")
+        if isinstance(text, dict):
+            write_article_multisection(text)
+        else:
+            write_article_section(text)
+    return None
+
+
+def write_summary_request(job: JobInfo) -> None:
+    """Write the state of a requested summary to streamlit.
+
+    Args:
+        job (JobInfo): The job producing the summary.
+    """
+    config = SummarizationConfiguration(**job.payload["config"])
+    st.markdown(
+        f"**{job.payload['url']}** ({config.method.value}: {format_config(config)})"
+    )
+    if job.status is JobStatus.FAILED:
+        st.error(f"Summarization failed: {job.error}")
+    elif job.status is JobStatus.DONE:
+        summarized_article = read_summarization(Path(job.result))
+        if len(fallback := summarized_article.fallback_sections()) > 0:
+            names = ", ".join(s if ss is None else f"{s} / {ss}" for s, ss in fallback)
+            st.warning(f"Summarized with TextRank to meet the time budget: {names}")
+        _write_summary_text(summarized_article.summary)
+    elif job.progress is None:
+        st.write("Waiting for a worker...")
+    else:
+        st.progress(job.progress["done"] / job.progress["total"])
+        _write_summary_text(ScientificArticleText(**job.progress["summary"]))
+    return None
+
+
 def more_info() -> str:
     """Get the more information string.
 
@@ -0,0 +1,50 @@
+"""Scoring summaries."""
+
+import re
+from collections import Counter
+
+from src.classes_and_types import ScientificArticleText
+
+
+def _ngrams(text: str, n: int) -> Counter:
+    words = re.findall(r"\w+", text.lower())
+    return Counter(tuple(words[i : i + n]) for i in range(len(words) - n + 1))
+
+
+def rouge_n(candidate: str, reference: str, n: int = 1) -> float:
+    """Compute the ROUGE-N F1 score of a candidate text against a reference.
+
+    Args:
+        candidate (str): Candidate (e.g. summary) text.
+        reference (str): Reference text.
+        n (int, optional): Size of the n-grams. Defaults to 1.
+
+    Returns:
+        float: F1 score of the n-gram overlap.
+    """
+    candidate_ngrams, reference_ngrams = _ngrams(candidate, n), _ngrams(reference, n)
+    overlap = sum((candidate_ngrams & reference_ngrams).values())
+    if overlap == 0:
+        return 0.0
+    precision = overlap / sum(candidate_ngrams.values())
+    recall = overlap / sum(reference_ngrams.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def flatten_text(text: ScientificArticleText) -> str:
+    """Join all of the paragraphs of an article's text.
+
+    Args:
+        text (ScientificArticleText): Article text.
+
+    Returns:
+        str: All of the text.
+    """
+    paragraphs: list[str] = []
+    for section in text.dict().values():
+        if isinstance(section, dict):
+            for sub_paragraphs in section.values():
+                paragraphs += sub_paragraphs
+        else:
+            paragraphs += section
+    return "\n".join(paragraphs)
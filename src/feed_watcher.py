@@ -0,0 +1,267 @@
+"""Watch RSS/Atom feeds or URL-list files for new articles to summarize."""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Final, Optional
+from xml.etree import ElementTree
+
+import requests
+from pydantic import BaseModel
+
+from src.classes_and_types import ScientificArticle
+from src.parse_scientific_article import get_and_parse_article
+
+FEED_STATE_PATH: Final[Path] = Path("cache") / "feed-watcher-state.json"
+
+# An article that fails is retried after RETRY_DELAY seconds, then after twice as long
+# each time, and given up on after MAX_ATTEMPTS attempts.
+MAX_ATTEMPTS: Final[int] = 5
+RETRY_DELAY: Final[float] = 900.0
+
+
+class SourceState(BaseModel):
+    """What is known about a source from the last time it was checked."""
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    mtime: Optional[float] = None
+
+
+class RetryState(BaseModel):
+    """Failed attempts at processing an article."""
+
+    attempts: int = 0
+    next_attempt: float = 0.0  # Time (seconds since the epoch) of the next attempt.
+
+
+class FeedWatcherState(BaseModel):
+    """Persistent state of the feed watcher."""
+
+    seen: set[str] = set()
+    pending: list[str] = []  # Found but not yet processed successfully.
+    retries: dict[str, RetryState] = {}  # Pending articles that have failed.
+    failed: set[str] = set()  # Given up on after too many failed attempts.
+    sources: dict[str, SourceState] = {}
+
+
+def read_state(path: Path = FEED_STATE_PATH) -> FeedWatcherState:
+    """Read the feed watcher's state.
+
+    Args:
+        path (Path, optional): State file. Defaults to FEED_STATE_PATH.
+
+    Returns:
+        FeedWatcherState: State of the feed watcher (empty if there is no file).
+    """
+    if not path.exists():
+        return FeedWatcherState()
+    return FeedWatcherState.parse_file(path)
+
+
+def write_state(state: FeedWatcherState, path: Path = FEED_STATE_PATH) -> None:
+    """Write the feed watcher's state.
+
+    Args:
+        state (FeedWatcherState): State of the feed watcher.
+        path (Path, optional): State file. Defaults to FEED_STATE_PATH.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w") as file:
+        file.write(state.json())
+    os.replace(tmp_path, path)
+    return None
+
+
+def _local_tag(element: ElementTree.Element) -> str:
+    return element.tag.rsplit("}", 1)[-1] if isinstance(element.tag, str) else ""
+
+
+def parse_feed(content: bytes) -> list[str]:
+    """Get the article links from an RSS (1.0 or 2.0) or Atom feed.
+
+    Args:
+        content (bytes): Feed document.
+
+    Returns:
+        list[str]: Article URLs in the order they appear in the feed.
+    """
+    urls: list[str] = []
+    for element in ElementTree.fromstring(content).iter():
+        if _local_tag(element) not in {"item", "entry"}:
+            continue
+        for child in element:
+            if _local_tag(child) != "link":
+                continue
+            if child.get("rel", "alternate") != "alternate":
+                continue
+            if (url := (child.get("href") or child.text or "").strip()) != "":
+                urls.append(url)
+                break
+    return urls
+
+
+def parse_url_list(content: bytes) -> list[str]:
+    """Get the URLs from a plain-text list (one per line, "#" starts a comment).
+
+    Args:
+        content (bytes): URL list.
+
+    Returns:
+        list[str]: URLs.
+    """
+    urls: list[str] = []
+    for line in content.decode().splitlines():
+        if (line := line.split("#", 1)[0].strip()) != "":
+            urls.append(line)
+    return urls
+
+
+def _parse_source(content: bytes) -> list[str]:
+    if content.lstrip().startswith(b"<"):
+        return parse_feed(content)
+    return parse_url_list(content)
+
+
+def _fetch_source(source: str, state: SourceState) -> Optional[bytes]:
+    # Returns None if the source has not changed since it was last read.
+    if not source.startswith(("http://", "https://")):
+        path = Path(source.removeprefix("file://"))
+        mtime = path.stat().st_mtime
+        if state.mtime == mtime:
+            return None
+        state.mtime = mtime
+        return path.read_bytes()
+
+    headers: dict[str, str] = {}
+    if state.etag is not None:
+        headers["If-None-Match"] = state.etag
+    if state.last_modified is not None:
+        headers["If-Modified-Since"] = state.last_modified
+    res = requests.get(source, headers=headers, timeout=60)
+    if res.status_code == 304:
+        return None
+    res.raise_for_status()
+    state.etag = res.headers.get("ETag")
+    state.last_modified = res.headers.get("Last-Modified")
+    return res.content
+
+
+def _record_failure(
+    state: FeedWatcherState, url: str, max_attempts: int, retry_delay: float
+) -> None:
+    retry = state.retries.setdefault(url, RetryState())
+    retry.attempts += 1
+    if retry.attempts >= max_attempts:
+        print(f"giving up on '{url}' after {retry.attempts} failed attempts")
+        state.pending.remove(url)
+        del state.retries[url]
+        state.failed.add(url)
+        return None
+    retry.next_attempt = time.time() + retry_delay * 2 ** (retry.attempts - 1)
+    return None
+
+
+def check_sources(
+    sources: list[str],
+    state: FeedWatcherState,
+    process: Callable[[ScientificArticle], None],
+    max_fetches: int = 4,
+    max_attempts: int = MAX_ATTEMPTS,
+    retry_delay: float = RETRY_DELAY,
+) -> int:
+    """Process the articles in the sources that have not been seen before.
+
+    New articles are downloaded and parsed concurrently (at most `max_fetches` at
+    once) and then processed one at a time. An article is only marked as seen once it
+    has been processed; failures stay pending and are retried with exponential backoff
+    until they have failed `max_attempts` times.
+
+    Args:
+        sources (list[str]): Feed or URL-list URLs or file paths.
+        state (FeedWatcherState): State of the feed watcher (updated in place).
+        process (Callable[[ScientificArticle], None]): Function to run on each new
+        article (e.g. summarize and write the results).
+        max_fetches (int, optional): Maximum number of concurrent downloads. Defaults
+        to 4.
+        max_attempts (int, optional): Number of failed attempts after which an
+        article is given up on. Defaults to MAX_ATTEMPTS.
+        retry_delay (float, optional): Seconds before the first retry of a failed
+        article (doubled for each further retry). Defaults to RETRY_DELAY.
+
+    Returns:
+        int: Number of new articles processed.
+    """
+    for source in sources:
+        source_state = state.sources.setdefault(source, SourceState())
+        try:
+            content = _fetch_source(source, source_state)
+        except (OSError, requests.RequestException) as err:
+            print(f"failed to read '{source}': {err!r}")
+            continue
+        if content is None:
+            continue
+        for url in _parse_source(content):
+            known = url in state.seen or url in state.failed
+            if not known and url not in state.pending:
+                state.pending.append(url)
+    now = time.time()
+    due = [
+        url
+        for url in state.pending
+        if url not in state.retries or state.retries[url].next_attempt <= now
+    ]
+    if len(due) == 0:
+        return 0
+
+    n_processed = 0
+    with ThreadPoolExecutor(max_workers=max_fetches) as executor:
+        futures = [(url, executor.submit(get_and_parse_article, url)) for url in due]
+        for url, future in futures:
+            try:
+                process(future.result())
+            except Exception as err:
+                print(f"failed to process '{url}': {err!r}")
+                _record_failure(state, url, max_attempts, retry_delay)
+                continue
+            state.pending.remove(url)
+            state.retries.pop(url, None)
+            state.seen.add(url)
+            n_processed += 1
+    return n_processed
+
+
+def watch(
+    sources: list[str],
+    process: Callable[[ScientificArticle], None],
+    interval: float = 900.0,
+    state_path: Path = FEED_STATE_PATH,
+    max_fetches: int = 4,
+    once: bool = False,
+) -> None:
+    """Poll sources for new articles and process them.
+
+    Between checks the watcher only sleeps, and unchanged sources are detected with
+    conditional requests (or file modification times), so idling is nearly free.
+
+    Args:
+        sources (list[str]): Feed or URL-list URLs or file paths.
+        process (Callable[[ScientificArticle], None]): Function to run on each new
+        article.
+        interval (float, optional): Seconds between checks. Defaults to 900.0.
+        state_path (Path, optional): State file. Defaults to FEED_STATE_PATH.
+        max_fetches (int, optional): Maximum number of concurrent downloads. Defaults
+        to 4.
+        once (bool, optional): Check the sources once and return. Defaults to False.
+    """
+    state = read_state(state_path)
+    while True:
+        n_new = check_sources(sources, state, process=process, max_fetches=max_fetches)
+        write_state(state, state_path)
+        if n_new > 0:
+            print(f"processed {n_new} new article(s)")
+        if once:
+            return None
+        time.sleep(interval)
@@ -1,15 +1,30 @@
 """Summarization using GTP-3."""
 
 import os
-from typing import Any, Literal, Optional
+import re
+from functools import lru_cache
+from math import ceil
+from typing import Any, Final, Literal, Optional
 
 import openai
-from pydantic import BaseModel, PositiveFloat
+from pydantic import BaseModel, PositiveFloat, PositiveInt
+from transformers import GPT2TokenizerFast
+from transformers import __version__ as transformers_version
 
-from src.text_utils import word_count
+from src.preprocessing import preprocessed
 
 OpenaiGpt3Engine = Literal["davinci", "curie", "babbage", "ada"]
 
+# Maximum number of tokens (prompt + completion) per request for each engine.
+GPT3_CONTEXT_LENGTHS: Final[dict[str, int]] = {
+    "davinci": 2049,
+    "curie": 2049,
+    "babbage": 2049,
+    "ada": 2049,
+}
+
+MIN_SUMMARY_TOKENS: Final[int] = 16
+
 
 class Gpt3SummarizationConfiguration(BaseModel):
     """GPT-3 configuration parameters."""
@@ -20,6 +35,19 @@ class Gpt3SummarizationConfiguration(BaseModel):
     top_p: Optional[PositiveFloat] = None
     frequency_penalty: float = 0.1
     presence_penalty: float = 0.1
+    # Summarize several sections per request (changes the prompts, so it is opt-in).
+    pack_sections: bool = False
+    max_sections_per_request: PositiveInt = 8
+    # Seconds to wait for a response; `TimeoutError` is raised after that.
+    request_timeout: Optional[PositiveFloat] = None
+
+
+class Gpt3Request(BaseModel):
+    """A planned request to GPT-3 covering one or more input texts."""
+
+    indices: list[int]
+    prompt: str
+    max_tokens: int
 
 
 def _openai_api_key() -> None:
@@ -29,17 +57,217 @@ def _openai_api_key() -> None:
     return None
 
 
+@lru_cache(maxsize=1)
+def _get_tokenizer() -> GPT2TokenizerFast:
+    # GPT-3 uses the same byte-pair encoding as GPT-2.
+    return GPT2TokenizerFast.from_pretrained("gpt2")
+
+
+def count_tokens(text: str) -> int:
+    """Count the number of GPT-3 tokens in some text.
+
+    Args:
+        text (str): Input text.
+
+    Returns:
+        int: Number of tokens.
+    """
+    return preprocessed(
+        "gpt2-token-counts",
+        f"gpt2-{transformers_version}",
+        text=text,
+        compute=lambda t: len(_get_tokenizer().encode(t)),
+    )
+
+
+# Fixed parts of the prompts around the texts to summarize.
+_PROMPT_PREFIX: Final[str] = 'Summarize the following scientific article:\n"""\n'
+_PROMPT_SUFFIX: Final[str] = '\n"""\nSummary:\n"""\n'
+_PACKED_PROMPT_PREFIX: Final[str] = (
+    "Summarize each of the following sections of a scientific article "
+    'separately. End each summary with "###".\n\n'
+)
+_PACKED_SECTION_PREFIX: Final[str] = 'Section {number}:\n"""\n'
+_PACKED_SECTION_SUFFIX: Final[str] = '\n"""\n\n'
+_PACKED_PROMPT_SUFFIX: Final[str] = "Summary 1:"
+
+# What the model writes between packed summaries: the end marker of one summary and
+# the heading of the next.
+_PACKED_SUMMARY_SEPARATOR: Final[str] = " ###\n\nSummary {number}:"
+
+
+@lru_cache(maxsize=None)
+def _template_tokens(template: str) -> int:
+    # Tokens in a fixed part of a prompt or completion (counted once per process).
+    return len(_get_tokenizer().encode(template))
+
+
 def _text_to_gpt3_prompt(text: str) -> str:
-    prefix = 'Summarize the following scientific article:\n"""\n'
-    suffix = '\n"""\nSummary:\n"""\n'
-    prompt = prefix + text + suffix
+    return _PROMPT_PREFIX + text + _PROMPT_SUFFIX
+
+
+def _texts_to_packed_gpt3_prompt(texts: list[str]) -> str:
+    prompt = _PACKED_PROMPT_PREFIX
+    for i, text in enumerate(texts):
+        section_prefix = _PACKED_SECTION_PREFIX.format(number=i + 1)
+        prompt += section_prefix + text + _PACKED_SECTION_SUFFIX
+    prompt += _PACKED_PROMPT_SUFFIX
     return prompt
 
 
+def _prompt_tokens(indices: list[int], n_tokens: list[int]) -> int:
+    # The prompt's length is the sum of its texts' and its template's lengths (the
+    # texts are separated from the template by newlines, which tokens do not span).
+    if len(indices) == 1:
+        n_template = _template_tokens(_PROMPT_PREFIX) + _template_tokens(_PROMPT_SUFFIX)
+        return n_template + n_tokens[indices[0]]
+    n = _template_tokens(_PACKED_PROMPT_PREFIX)
+    n += _template_tokens(_PACKED_PROMPT_SUFFIX)
+    for j, i in enumerate(indices):
+        n += _template_tokens(_PACKED_SECTION_PREFIX.format(number=j + 1))
+        n += n_tokens[i] + _template_tokens(_PACKED_SECTION_SUFFIX)
+    return n
+
+
+def _summary_tokens(
+    indices: list[int], n_tokens: list[int], config: Gpt3SummarizationConfiguration
+) -> int:
+    budgets = [
+        max(ceil(n_tokens[i] * config.max_ratio), MIN_SUMMARY_TOKENS) for i in indices
+    ]
+    if len(indices) == 1:
+        return budgets[0]
+    # Packed summaries are separated by an end marker and the next one's heading.
+    return sum(
+        budget + _template_tokens(_PACKED_SUMMARY_SEPARATOR.format(number=j + 2))
+        for j, budget in enumerate(budgets)
+    )
+
+
+def _make_request(
+    indices: list[int],
+    texts: list[str],
+    n_tokens: list[int],
+    config: Gpt3SummarizationConfiguration,
+) -> Gpt3Request:
+    if len(indices) == 1:
+        prompt = _text_to_gpt3_prompt(texts[indices[0]])
+    else:
+        prompt = _texts_to_packed_gpt3_prompt([texts[i] for i in indices])
+    max_tokens = _summary_tokens(indices, n_tokens, config)
+    # A single text that is too long still gets its own request, but the completion
+    # can only use what is left of the context.
+    n_prompt = _prompt_tokens(indices, n_tokens)
+    context_length = GPT3_CONTEXT_LENGTHS[config.engine]
+    if n_prompt + max_tokens > context_length:
+        max_tokens = max(context_length - n_prompt, MIN_SUMMARY_TOKENS)
+    return Gpt3Request(indices=indices, prompt=prompt, max_tokens=max_tokens)
+
+
+def _plan_requests(
+    texts: list[str], n_tokens: list[int], config: Gpt3SummarizationConfiguration
+) -> list[Gpt3Request]:
+    context_length = GPT3_CONTEXT_LENGTHS[config.engine]
+    max_per_request = config.max_sections_per_request if config.pack_sections else 1
+    groups: list[list[int]] = []
+    for i in range(len(texts)):
+        if len(groups) > 0 and len(groups[-1]) < max_per_request:
+            candidate = groups[-1] + [i]
+            n_candidate = _prompt_tokens(candidate, n_tokens) + _summary_tokens(
+                candidate, n_tokens, config
+            )
+            if n_candidate <= context_length:
+                groups[-1] = candidate
+                continue
+        groups.append([i])
+    return [_make_request(g, texts, n_tokens, config) for g in groups]
+
+
+def plan_requests(
+    texts: list[str], config: Gpt3SummarizationConfiguration
+) -> list[Gpt3Request]:
+    """Pack texts into as few GPT-3 requests as fit in the engine's context.
+
+    Texts are packed greedily in order. A request is closed once adding the next text
+    would push the prompt plus the requested summary tokens over the engine's context
+    length. The tokens of each text are counted once; a prompt's length is the sum of
+    its texts' and its template's lengths.
+
+    Args:
+        texts (list[str]): Texts to summarize.
+        config (Gpt3SummarizationConfiguration): GPT-3 configuration.
+
+    Returns:
+        list[Gpt3Request]: Planned requests.
+    """
+    return _plan_requests(texts, [count_tokens(t) for t in texts], config)
+
+
 def _extract_gpt3_result(gpt3_response: dict) -> str:
     return gpt3_response["choices"][0]["text"]
 
 
+def _split_packed_result(text: str, n: int) -> dict[int, str]:
+    parts = re.split(r"^\s*Summary (\d+):", "Summary 1:" + text, flags=re.MULTILINE)
+    summaries: dict[int, str] = {}
+    for number, summary in zip(parts[1::2], parts[2::2]):
+        idx = int(number) - 1
+        summary = summary.split("###")[0].strip()
+        if 0 <= idx < n and len(summary) > 0:
+            summaries[idx] = summary
+    return summaries
+
+
+def _call_gpt3(request: Gpt3Request, config: Gpt3SummarizationConfiguration) -> str:
+    try:
+        res = openai.Completion.create(
+            prompt=request.prompt,
+            model=config.engine,
+            temperature=config.temperature,
+            max_tokens=request.max_tokens,
+            top_p=config.top_p,
+            frequency_penalty=config.frequency_penalty,
+            presence_penalty=config.presence_penalty,
+            stop=['"""'] if len(request.indices) == 1 else ["\nSection "],
+            request_timeout=config.request_timeout,
+        )
+    except openai.error.Timeout as err:
+        raise TimeoutError(
+            f"GPT-3 did not respond in {config.request_timeout}s."
+        ) from err
+    return _extract_gpt3_result(res)
+
+
+def summarize_batch(texts: list[str], config_kwargs: dict[str, Any]) -> list[str]:
+    """Summarize several texts using GPT-3, packing them into as few requests as fit.
+
+    Args:
+        texts (list[str]): Input texts.
+        config_kwargs (dict[str, Any]): GPT-3 configuration parameters.
+
+    Returns:
+        list[str]: Summarized texts in the same order as the inputs.
+    """
+    _openai_api_key()
+    config = Gpt3SummarizationConfiguration(**config_kwargs)
+    n_tokens = [count_tokens(t) for t in texts]
+    summaries: dict[int, str] = {}
+    for request in _plan_requests(texts, n_tokens, config):
+        result = _call_gpt3(request, config)
+        if len(request.indices) == 1:
+            summaries[request.indices[0]] = result
+            continue
+        packed = _split_packed_result(result, n=len(request.indices))
+        for j, idx in enumerate(request.indices):
+            if j in packed:
+                summaries[idx] = packed[j]
+            else:
+                # The model did not return this section: ask for it on its own.
+                single = _make_request([idx], texts, n_tokens, config)
+                summaries[idx] = _call_gpt3(single, config)
+    return [summaries[i] for i in range(len(texts))]
+
+
 def summarize(text: str, config_kwargs: dict[str, Any]) -> str:
     """Summarize text using GPT-3.
 
@@ -50,18 +278,4 @@ def summarize(text: str, config_kwargs: dict[str, Any]) -> str:
     Returns:
         str: Summarized test.
     """
-    _openai_api_key()
-    config = Gpt3SummarizationConfiguration(**config_kwargs)
-    prompt = _text_to_gpt3_prompt(text)
-    res = openai.Completion.create(
-        prompt=prompt,
-        engine=config.engine,
-        temperature=config.temperature,
-        max_tokens=int(word_count(text) * config.max_ratio),
-        top_p=config.top_p,
-        frequency_penalty=config.frequency_penalty,
-        presence_penalty=config.presence_penalty,
-        stop=['"""'],
-    )
-    text_sum = _extract_gpt3_result(res)
-    return text_sum
+    return summarize_batch([text], config_kwargs)[0]
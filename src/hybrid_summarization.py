@@ -0,0 +1,98 @@
+"""Hybrid summarization: an extractive prefilter before an abstractive model."""
+
+from enum import Enum
+from typing import Any, Literal
+
+from pydantic import BaseModel, PositiveFloat
+
+from src.classes_and_types import ScientificArticleText, section_text
+from src.pagerank_summarization import summarize as pagerank_summarize
+
+
+class AbstractiveMethod(Enum):
+    """Summarization methods that can follow the extractive prefilter."""
+
+    BART = "BART"
+    GPT3 = "GPT3"
+
+
+class HybridSummarizationConfiguration(BaseModel):
+    """Hybrid summarization configuration parameters.
+
+    Any other parameters are passed on to the abstractive summarization method.
+    """
+
+    abstractive_method: Literal["BART", "GPT3"] = "BART"
+    extractive_ratio: PositiveFloat = 0.3
+
+    class Config:
+        """Model configuration."""
+
+        extra = "allow"
+
+    def abstractive_kwargs(self) -> dict[str, Any]:
+        """Get the configuration parameters for the abstractive method.
+
+        Returns:
+            dict[str, Any]: Configuration parameters.
+        """
+        return {k: v for k, v in self.dict().items() if k not in self.__fields__}
+
+
+def extract_sentences(paragraphs: section_text, ratio: float) -> section_text:
+    """Reduce a section to its most central sentences with TextRank.
+
+    The sentences are kept in their original order and grouped by the paragraph they
+    are from. A section that is too short for TextRank to extract anything from is
+    returned unchanged.
+
+    Args:
+        paragraphs (section_text): Paragraphs of the section.
+        ratio (float): Fraction of the text to keep.
+
+    Returns:
+        section_text: The extracted sentences of each paragraph (paragraphs without
+        any extracted sentences are dropped).
+    """
+    if len(paragraphs) == 0:
+        return paragraphs
+    extract = pagerank_summarize("\n".join(paragraphs), {"ratio": ratio})
+    if len(extract.strip()) == 0:
+        return paragraphs
+    # Find each extracted sentence (one per line, in order) in the paragraphs. A
+    # sentence that spans two paragraphs is split over two lines.
+    kept: list[list[str]] = [[] for _ in paragraphs]
+    p, pos = 0, 0
+    for line in extract.splitlines():
+        if len(line.strip()) == 0:
+            continue
+        for q in range(p, len(paragraphs)):
+            found = paragraphs[q].find(line, pos if q == p else 0)
+            if found >= 0:
+                p, pos = q, found + len(line)
+                break
+        kept[p].append(line)
+    return [" ".join(sentences) for sentences in kept if len(sentences) > 0]
+
+
+def prefilter_article_text(
+    text: ScientificArticleText, ratio: float
+) -> ScientificArticleText:
+    """Reduce each summarized section of an article with TextRank.
+
+    Args:
+        text (ScientificArticleText): Text of the article.
+        ratio (float): Fraction of each section's text to keep.
+
+    Returns:
+        ScientificArticleText: Reduced text of the article.
+    """
+    return ScientificArticleText(
+        Abstract=text.Abstract,
+        Introduction=extract_sentences(text.Introduction, ratio=ratio),
+        Methods=text.Methods,
+        Results={
+            t: extract_sentences(ps, ratio=ratio) for t, ps in text.Results.items()
+        },
+        Discussion=extract_sentences(text.Discussion, ratio=ratio),
+    )
@@ -0,0 +1,212 @@
+"""A job queue on a shared filesystem for spreading the pipeline over machines.
+
+The queue is a single SQLite database that every worker opens directly, so no broker
+service is needed. Workers claim jobs with a time-limited lease and keep extending it
+with heartbeats while they work. A job whose lease expires (e.g. the worker's machine
+died) goes back to being claimable until it runs out of attempts.
+"""
+
+import json
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Final, Iterable, Optional
+
+from src.classes_and_types import (
+    ScientificArticle,
+    SummarizationConfiguration,
+    SummarizationMethod,
+    SummarizedScientificArticle,
+)
+from src.job_queue_client import (
+    Job,
+    JobKind,
+    JobQueue,
+    JobStatus,
+    summarization_key,
+)
+from src.parse_scientific_article import get_and_parse_article
+from src.preprocessing import article_content_hash
+from src.summarize_utils import (
+    TextChunk,
+    assemble_summarized_article,
+    chunk_article,
+    summarize_article,
+    summarize_chunks,
+)
+from src.write_summary import make_summary_file_name, write_summary_json
+
+# Methods whose articles are split into one job per chunk.
+CHUNKED_METHODS: Final[set[SummarizationMethod]] = {SummarizationMethod.BART}
+
+
+def enqueue_summarizations(
+    queue: JobQueue,
+    jobs: Iterable[tuple[ScientificArticle, SummarizationConfiguration]],
+    outdir: Path,
+    force: bool = False,
+) -> int:
+    """Add a job for each article and configuration without results yet.
+
+    Jobs are claimed in the order they are added. Pairs that are already queued or
+    being summarized (e.g. by an earlier `enqueue` or a request from the app) are not
+    added again.
+
+    Args:
+        queue (JobQueue): Job queue.
+        jobs (Iterable[tuple[ScientificArticle, SummarizationConfiguration]]): Pairs of
+        articles and the configurations to summarize them with.
+        outdir (Path): Shared output directory.
+        force (bool, optional): Add jobs even if the results exist. Defaults to False.
+
+    Returns:
+        int: Number of article-configuration pairs added.
+    """
+    n_added = 0
+    for article, config in jobs:
+        json_path = outdir / make_summary_file_name(article, config, suffix=".json")
+        if not force and json_path.exists():
+            continue
+        payload = {"url": article.url, "config": json.loads(config.json())}
+        key = summarization_key(payload)
+        if config.method not in CHUNKED_METHODS:
+            if queue.add_unless_active(JobKind.SUMMARIZE, payload, key=key) is None:
+                continue
+        else:
+            # The article's summary is assembled from the queued chunks, which are
+            # only valid for this version of its text.
+            assemble_payload = {**payload, "text_hash": article_content_hash(article)}
+            parent_id = queue.add_unless_active(
+                JobKind.ASSEMBLE, assemble_payload, key=key, status=JobStatus.WAITING
+            )
+            if parent_id is None:
+                continue
+            for chunk in chunk_article(article, config):
+                queue.add(
+                    JobKind.CHUNK,
+                    {
+                        "chunk": chunk.to_text_chunk().dict(),
+                        "config": payload["config"],
+                    },
+                    parent_id=parent_id,
+                )
+        n_added += 1
+    return n_added
+
+
+def _run_job(queue: JobQueue, job: Job, outdir: Path) -> Any:
+    config = SummarizationConfiguration(**job.payload["config"])
+    if job.kind is JobKind.CHUNK:
+        return summarize_chunks([TextChunk(**job.payload["chunk"])], config)[0]
+
+    article = get_and_parse_article(job.payload["url"])
+    if job.kind is JobKind.SUMMARIZE:
+
+        def _report_progress(
+            partial: SummarizedScientificArticle, n_done: int, n_total: int
+        ) -> None:
+            summary = partial.summary.dict()
+            progress = {"done": n_done, "total": n_total, "summary": summary}
+            queue.set_progress(job.id, progress)
+
+        summarized_article = summarize_article(
+            article,
+            config=config,
+            progress=_report_progress,
+            time_budget=job.payload.get("time_budget"),
+        )
+    elif job.kind is JobKind.ASSEMBLE:
+        if article_content_hash(article) != job.payload["text_hash"]:
+            raise ValueError("The article has changed since its chunks were queued.")
+        # The summaries are paired with the chunks the child jobs summarized rather
+        # than with a new chunking of the article.
+        children = queue.children(job.id)
+        summarized_article = assemble_summarized_article(
+            article,
+            config,
+            chunks=[TextChunk(**child.payload["chunk"]) for child in children],
+            summaries=[child.result for child in children],
+        )
+    else:
+        raise NotImplementedError(job.kind.value)
+    json_path = outdir / make_summary_file_name(article, config, suffix=".json")
+    write_summary_json(summarized_article, json_path)
+    return str(json_path)
+
+
+def _keep_lease(
+    queue: JobQueue, job: Job, worker_id: str, stop: threading.Event
+) -> None:
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.heartbeat(job.id, worker_id):
+            return None
+    return None
+
+
+def make_worker_id() -> str:
+    """Make a unique identifier for a worker process.
+
+    Returns:
+        str: Worker ID.
+    """
+    return f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+
+
+def run_worker(
+    queue: JobQueue,
+    outdir: Path,
+    worker_id: Optional[str] = None,
+    poll_interval: float = 10.0,
+    exit_when_empty: bool = True,
+    max_jobs: Optional[int] = None,
+) -> int:
+    """Claim and run jobs from the queue until there are none left.
+
+    Args:
+        queue (JobQueue): Job queue.
+        outdir (Path): Shared output directory.
+        worker_id (Optional[str], optional): Worker identifier. Defaults to a new
+        unique ID.
+        poll_interval (float, optional): Seconds to wait when no job is available.
+        Defaults to 10.0.
+        exit_when_empty (bool, optional): Stop once no job is pending or running.
+        Defaults to True.
+        max_jobs (Optional[int], optional): Stop after this many jobs. Defaults to
+        None.
+
+    Returns:
+        int: Number of jobs completed by this worker.
+    """
+    if worker_id is None:
+        worker_id = make_worker_id()
+    n_done = 0
+    while max_jobs is None or n_done < max_jobs:
+        if (job := queue.claim(worker_id)) is None:
+            counts = queue.counts()
+            unfinished = sum(
+                counts.get(s.value, 0)
+                for s in (JobStatus.PENDING, JobStatus.RUNNING, JobStatus.WAITING)
+            )
+            if exit_when_empty and unfinished == 0:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=_keep_lease, args=(queue, job, worker_id, stop), daemon=True
+        )
+        heartbeat.start()
+        try:
+            result = _run_job(queue, job, outdir=outdir)
+        except Exception as err:
+            queue.fail(job, worker_id, error=repr(err))
+        else:
+            queue.complete(job, worker_id, result=result)
+            n_done += 1
+        finally:
+            stop.set()
+            heartbeat.join()
+    return n_done
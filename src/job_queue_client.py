@@ -0,0 +1,483 @@
+"""Client of the job queue: the queue's database and requesting summaries.
+
+This module does not import the summarization methods (or their models) so that the
+web application can add requests to the queue and poll their state cheaply. Workers
+are in `src.job_queue`.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Any, Final, Optional
+
+from pydantic import BaseModel
+
+from src.classes_and_types import SummarizationConfiguration
+
+JOB_QUEUE_PATH: Final[Path] = Path("pipeline-results") / "job-queue.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    parent_id INTEGER,
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_parent ON jobs (parent_id);
+"""
+
+# Columns added after the first version of the schema.
+_ADDED_COLUMNS: Final[dict[str, str]] = {
+    "key": "TEXT",  # Identical requests share a key and are only run once.
+    "progress": "TEXT",
+}
+
+_FAIL_ORPHANED_PARENTS = """
+UPDATE jobs SET status = 'FAILED', error = 'a child job failed'
+WHERE status = 'WAITING' AND id IN (
+    SELECT parent_id FROM jobs WHERE status = 'FAILED' AND parent_id IS NOT NULL
+)
+"""
+
+
+class JobKind(Enum):
+    """Types of jobs in the queue."""
+
+    SUMMARIZE = "SUMMARIZE"  # Summarize a whole article with one configuration.
+    CHUNK = "CHUNK"  # Summarize a single chunk of an article.
+    ASSEMBLE = "ASSEMBLE"  # Combine the chunk summaries of an article.
+
+
+class JobStatus(Enum):
+    """Status of a job in the queue."""
+
+    WAITING = "WAITING"  # Waiting on child jobs.
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+# Jobs that are not finished yet.
+ACTIVE_STATUSES: Final[tuple[JobStatus, ...]] = (
+    JobStatus.WAITING,
+    JobStatus.PENDING,
+    JobStatus.RUNNING,
+)
+
+
+class JobInfo(BaseModel):
+    """The state of a job."""
+
+    id: int
+    status: JobStatus
+    payload: dict[str, Any]
+    progress: Optional[dict[str, Any]] = None
+    result: Any = None
+    error: Optional[str] = None
+
+
+class Job(BaseModel):
+    """A claimed job."""
+
+    id: int
+    kind: JobKind
+    payload: dict[str, Any]
+    parent_id: Optional[int] = None
+
+
+def _job_info(row: tuple) -> JobInfo:
+    # Columns: id, status, payload, progress, result, error.
+    return JobInfo(
+        id=row[0],
+        status=JobStatus(row[1]),
+        payload=json.loads(row[2]),
+        progress=json.loads(row[3]) if row[3] is not None else None,
+        result=json.loads(row[4]) if row[4] is not None else None,
+        error=row[5],
+    )
+
+
+class JobQueue:
+    """A lease-based job queue backed by a SQLite database on a shared filesystem."""
+
+    def __init__(
+        self, path: Path, lease_seconds: float = 300.0, max_attempts: int = 3
+    ) -> None:
+        """Open (and create, if needed) a job queue.
+
+        Args:
+            path (Path): Path to the queue's database file.
+            lease_seconds (float, optional): How long a claim lasts without a
+            heartbeat. Defaults to 300.0.
+            max_attempts (int, optional): Number of times a job is tried before it is
+            marked as failed. Defaults to 3.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Write-ahead logging relies on shared memory which does not work over NFS.
+        self._con = sqlite3.connect(
+            path, timeout=60.0, isolation_level=None, check_same_thread=False
+        )
+        self._con.execute("PRAGMA journal_mode=DELETE")
+        self._con.executescript(_SCHEMA)
+        columns = {r[1] for r in self._con.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._con.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self._con.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key)")
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Close the connection to the queue."""
+        self._con.close()
+        return None
+
+    def _transaction(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._con.execute(sql, params)
+                self._con.execute("COMMIT")
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+            return cur
+
+    def _add(
+        self,
+        kind: JobKind,
+        payload: dict[str, Any],
+        status: JobStatus,
+        parent_id: Optional[int],
+        key: Optional[str],
+        existing_statuses: tuple[JobStatus, ...],
+    ) -> tuple[int, bool]:
+        # Returns the ID of the job and whether it was added (or already existed).
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                row = None
+                if key is not None:
+                    marks = ", ".join("?" for _ in existing_statuses)
+                    row = self._con.execute(
+                        f"SELECT id FROM jobs WHERE key = ? AND status IN ({marks}) "
+                        "ORDER BY id DESC LIMIT 1",
+                        (key, *(s.value for s in existing_statuses)),
+                    ).fetchone()
+                if row is not None:
+                    job_id, added = row[0], False
+                else:
+                    cur = self._con.execute(
+                        "INSERT INTO jobs (kind, payload, status, parent_id, key) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (kind.value, json.dumps(payload), status.value, parent_id, key),
+                    )
+                    assert cur.lastrowid is not None
+                    job_id, added = cur.lastrowid, True
+                self._con.execute("COMMIT")
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+        return job_id, added
+
+    def add(
+        self,
+        kind: JobKind,
+        payload: dict[str, Any],
+        status: JobStatus = JobStatus.PENDING,
+        parent_id: Optional[int] = None,
+        key: Optional[str] = None,
+    ) -> int:
+        """Add a job to the queue.
+
+        Args:
+            kind (JobKind): Type of job.
+            payload (dict[str, Any]): JSON-serializable job description.
+            status (JobStatus, optional): Initial status. Defaults to PENDING.
+            parent_id (Optional[int], optional): Job that waits on this one. Defaults
+            to None.
+            key (Optional[str], optional): Identifies identical requests. If a job with
+            the same key is already queued, running, or done, no new job is added.
+            Defaults to None.
+
+        Returns:
+            int: ID of the new job (or of the existing job with the same key).
+        """
+        existing = (*ACTIVE_STATUSES, JobStatus.DONE)
+        job_id, _ = self._add(kind, payload, status, parent_id, key, existing)
+        return job_id
+
+    def add_unless_active(
+        self,
+        kind: JobKind,
+        payload: dict[str, Any],
+        key: str,
+        status: JobStatus = JobStatus.PENDING,
+    ) -> Optional[int]:
+        """Add a job unless an identical job is still waiting, pending, or running.
+
+        Args:
+            kind (JobKind): Type of job.
+            payload (dict[str, Any]): JSON-serializable job description.
+            key (str): Identifies identical requests.
+            status (JobStatus, optional): Initial status. Defaults to PENDING.
+
+        Returns:
+            Optional[int]: ID of the new job or None if an identical job is active.
+        """
+        job_id, added = self._add(kind, payload, status, None, key, ACTIVE_STATUSES)
+        return job_id if added else None
+
+    def get(self, job_id: int) -> JobInfo:
+        """Get the state of a job.
+
+        Args:
+            job_id (int): Job ID.
+
+        Returns:
+            JobInfo: The job's status, progress, and result.
+        """
+        with self._lock:
+            row = self._con.execute(
+                "SELECT id, status, payload, progress, result, error "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"No job with ID {job_id}.")
+        return _job_info(row)
+
+    def set_progress(self, job_id: int, progress: dict[str, Any]) -> None:
+        """Record the progress of a running job.
+
+        Args:
+            job_id (int): Job ID.
+            progress (dict[str, Any]): JSON-serializable progress information.
+        """
+        self._transaction(
+            "UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id)
+        )
+        return None
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """Claim the next available job.
+
+        Pending jobs and running jobs whose lease has expired are available.
+
+        Args:
+            worker_id (str): Unique identifier of the worker.
+
+        Returns:
+            Optional[Job]: The claimed job or None if there is nothing to do.
+        """
+        now = time.time()
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose lease expired too many times are given up on.
+                self._con.execute(
+                    "UPDATE jobs SET status = ?, error = 'lease expired' "
+                    "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                    (
+                        JobStatus.FAILED.value,
+                        JobStatus.RUNNING.value,
+                        now,
+                        self.max_attempts,
+                    ),
+                )
+                self._con.execute(_FAIL_ORPHANED_PARENTS)
+                row = self._con.execute(
+                    "SELECT id, kind, payload, parent_id FROM jobs "
+                    "WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (JobStatus.PENDING.value, JobStatus.RUNNING.value, now),
+                ).fetchone()
+                if row is not None:
+                    self._con.execute(
+                        "UPDATE jobs SET status = ?, lease_owner = ?, "
+                        "lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                        (
+                            JobStatus.RUNNING.value,
+                            worker_id,
+                            now + self.lease_seconds,
+                            row[0],
+                        ),
+                    )
+                self._con.execute("COMMIT")
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return Job(
+            id=row[0],
+            kind=JobKind(row[1]),
+            payload=json.loads(row[2]),
+            parent_id=row[3],
+        )
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """Extend the lease on a job.
+
+        Args:
+            job_id (int): Job ID.
+            worker_id (str): Worker holding the lease.
+
+        Returns:
+            bool: Whether the worker still holds the lease.
+        """
+        cur = self._transaction(
+            "UPDATE jobs SET lease_expires = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = ?",
+            (
+                time.time() + self.lease_seconds,
+                job_id,
+                worker_id,
+                JobStatus.RUNNING.value,
+            ),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, job: Job, worker_id: str, result: Any = None) -> None:
+        """Mark a job as done.
+
+        If the job was the last unfinished child of a waiting job, the parent becomes
+        available to claim.
+
+        Args:
+            job (Job): The finished job.
+            worker_id (str): Worker holding the lease.
+            result (Any, optional): JSON-serializable result. Defaults to None.
+        """
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                self._con.execute(
+                    "UPDATE jobs SET status = ?, result = ?, lease_expires = NULL "
+                    "WHERE id = ? AND lease_owner = ?",
+                    (JobStatus.DONE.value, json.dumps(result), job.id, worker_id),
+                )
+                if job.parent_id is not None:
+                    self._con.execute(
+                        "UPDATE jobs SET status = ? WHERE id = ? AND status = ? AND "
+                        "NOT EXISTS (SELECT 1 FROM jobs WHERE parent_id = ? "
+                        "AND status != ?)",
+                        (
+                            JobStatus.PENDING.value,
+                            job.parent_id,
+                            JobStatus.WAITING.value,
+                            job.parent_id,
+                            JobStatus.DONE.value,
+                        ),
+                    )
+                self._con.execute("COMMIT")
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+        return None
+
+    def fail(self, job: Job, worker_id: str, error: str) -> None:
+        """Release a job that raised an error so that it can be retried.
+
+        Args:
+            job (Job): The failed job.
+            worker_id (str): Worker holding the lease.
+            error (str): Description of the error.
+        """
+        self._transaction(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "error = ?, lease_owner = NULL, lease_expires = NULL "
+            "WHERE id = ? AND lease_owner = ?",
+            (
+                self.max_attempts,
+                JobStatus.FAILED.value,
+                JobStatus.PENDING.value,
+                error,
+                job.id,
+                worker_id,
+            ),
+        )
+        return None
+
+    def children(self, job_id: int) -> list[JobInfo]:
+        """Get the child jobs of a job in the order they were added.
+
+        Args:
+            job_id (int): Parent job ID.
+
+        Returns:
+            list[JobInfo]: The child jobs' payloads and results.
+        """
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT id, status, payload, progress, result, error "
+                "FROM jobs WHERE parent_id = ? ORDER BY id",
+                (job_id,),
+            ).fetchall()
+        return [_job_info(r) for r in rows]
+
+    def counts(self) -> dict[str, int]:
+        """Count the jobs in each status.
+
+        Returns:
+            dict[str, int]: Number of jobs per status.
+        """
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {status: n for status, n in rows}
+
+
+def summarization_key(payload: dict[str, Any]) -> str:
+    """Make the key of a job producing a summary.
+
+    Jobs producing the summary of an article with a configuration (and time budget)
+    share a key, whichever kind of job produces it.
+
+    Args:
+        payload (dict[str, Any]): Description of the summary (URL, configuration, and
+        time budget).
+
+    Returns:
+        str: Key of the job.
+    """
+    return json.dumps(payload, sort_keys=True)
+
+
+def request_summarization(
+    queue: JobQueue,
+    url: str,
+    config: SummarizationConfiguration,
+    time_budget: Optional[float] = None,
+) -> int:
+    """Request a summary of an article.
+
+    Requests for the same article, configuration, and time budget share a single job.
+
+    Args:
+        queue (JobQueue): Job queue.
+        url (str): URL of the article.
+        config (SummarizationConfiguration): Summarization configuration.
+        time_budget (Optional[float], optional): Seconds the summarization may take
+        once started (see `summarize_article()`). Defaults to None.
+
+    Returns:
+        int: ID of the job that will produce the summary.
+    """
+    payload: dict[str, Any] = {"url": url, "config": json.loads(config.json())}
+    if time_budget is not None:
+        payload["time_budget"] = time_budget
+    return queue.add(JobKind.SUMMARIZE, payload, key=summarization_key(payload))
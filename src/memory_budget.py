@@ -0,0 +1,302 @@
+"""Keep the summarization pipeline's memory use within a budget."""
+
+import os
+import re
+import threading
+from typing import Callable, Final, Optional
+
+from pydantic import BaseModel
+
+from src.memory_report import process_memory
+
+MEMORY_SIZE_UNITS: Final[dict[str, int]] = {
+    "": 1,
+    "K": 1024,
+    "M": 1024**2,
+    "G": 1024**3,
+    "T": 1024**4,
+}
+
+# Memory use above this fraction of the budget counts as memory pressure.
+PRESSURE_FRACTION: Final[float] = 0.9
+
+# Margin for the measured per-word activation cost (it is not quite linear).
+ACTIVATION_SAFETY_FACTOR: Final[float] = 1.5
+
+# Private memory of a worker process on top of its activations (interpreter, etc.).
+WORKER_OVERHEAD_BYTES: Final[int] = 300 * 1024**2
+
+MIN_CHUNK_WORDS: Final[int] = 100
+
+
+def parse_memory_size(size: str) -> int:
+    """Parse a memory size such as "8G" or "512M".
+
+    Args:
+        size (str): Memory size (bytes, or with a K/M/G/T suffix).
+
+    Raises:
+        ValueError: Raised if the size cannot be parsed.
+
+    Returns:
+        int: Number of bytes.
+    """
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?)i?B?\s*", size.upper())
+    if match is None:
+        raise ValueError(f"Invalid memory size: '{size}'")
+    return int(float(match.group(1)) * MEMORY_SIZE_UNITS[match.group(2)])
+
+
+def format_memory_size(n_bytes: int) -> str:
+    """Format a number of bytes.
+
+    Args:
+        n_bytes (int): Number of bytes.
+
+    Returns:
+        str: Human-readable size.
+    """
+    return f"{n_bytes / 1024**3:.2f} GB"
+
+
+def memory_in_use(pids: list[int]) -> int:
+    """Measure the memory used by some processes.
+
+    Proportional set sizes are used so memory shared between the processes (e.g. the
+    model's weights) is only counted once.
+
+    Args:
+        pids (list[int]): Process IDs.
+
+    Returns:
+        int: Bytes in use (0 if memory use cannot be measured on this platform).
+    """
+    return sum(m.pss for pid in pids if (m := process_memory(pid)) is not None)
+
+
+def system_available_memory() -> Optional[int]:
+    """Get the memory available to start new work without swapping.
+
+    Returns:
+        Optional[int]: Available bytes ("MemAvailable") or None if unknown.
+    """
+    try:
+        with open("/proc/meminfo", "r") as file:
+            for line in file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class MemoryMonitor:
+    """Samples the memory use of the pipeline's processes in a background thread."""
+
+    def __init__(
+        self, pids: Callable[[], list[int]], budget: int, interval: float = 0.2
+    ) -> None:
+        """Create a memory monitor.
+
+        Args:
+            pids (Callable[[], list[int]]): Gets the IDs of the processes to monitor.
+            budget (int): Memory budget in bytes.
+            interval (float, optional): Seconds between samples. Defaults to 0.2.
+        """
+        self.pids = pids
+        self.budget = budget
+        self.interval = interval
+        self.current = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> int:
+        """Measure the current memory use.
+
+        Returns:
+            int: Bytes in use.
+        """
+        self.current = memory_in_use(self.pids())
+        self.peak = max(self.peak, self.current)
+        return self.current
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+        return None
+
+    def start(self) -> None:
+        """Start sampling."""
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return None
+
+    def stop(self) -> int:
+        """Stop sampling.
+
+        Returns:
+            int: Peak memory use in bytes.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sample()
+        return self.peak
+
+    def under_pressure(self) -> bool:
+        """Check if memory is running short.
+
+        Returns:
+            bool: True if memory use is near the budget or the system is nearly out of
+            available memory.
+        """
+        if self.current > PRESSURE_FRACTION * self.budget:
+            return True
+        # Other jobs on the machine can leave less memory than the budget allows for.
+        available = system_available_memory()
+        return (
+            available is not None and available < (1 - PRESSURE_FRACTION) * self.budget
+        )
+
+
+_MEMORY_MONITOR: Optional[MemoryMonitor] = None
+
+
+def start_memory_guard(budget: int, pids: Callable[[], list[int]]) -> MemoryMonitor:
+    """Start monitoring memory use against a budget.
+
+    While the guard is running, work that can be throttled (e.g. BART summarization on
+    a worker pool) backs off when `under_memory_pressure()`.
+
+    Args:
+        budget (int): Memory budget in bytes.
+        pids (Callable[[], list[int]]): Gets the IDs of the processes to monitor.
+
+    Returns:
+        MemoryMonitor: The running memory monitor.
+    """
+    global _MEMORY_MONITOR
+    stop_memory_guard()
+    _MEMORY_MONITOR = MemoryMonitor(pids=pids, budget=budget)
+    _MEMORY_MONITOR.start()
+    return _MEMORY_MONITOR
+
+
+def stop_memory_guard() -> Optional[int]:
+    """Stop monitoring memory use.
+
+    Returns:
+        Optional[int]: Peak memory use in bytes (None if the guard was not running).
+    """
+    global _MEMORY_MONITOR
+    if _MEMORY_MONITOR is None:
+        return None
+    peak = _MEMORY_MONITOR.stop()
+    _MEMORY_MONITOR = None
+    return peak
+
+
+def memory_guard_active() -> bool:
+    """Check if memory use is being kept within a budget.
+
+    Returns:
+        bool: True if the memory guard is running.
+    """
+    return _MEMORY_MONITOR is not None
+
+
+def under_memory_pressure() -> bool:
+    """Check if memory is running short (always False without a memory guard).
+
+    Returns:
+        bool: True if work should be throttled.
+    """
+    return _MEMORY_MONITOR is not None and _MEMORY_MONITOR.under_pressure()
+
+
+class ModelMemoryProfile(BaseModel):
+    """Measured memory cost of a summarization model."""
+
+    model_bytes: int  # Weights (shared by all workers).
+    bytes_per_word: float  # Peak activation memory per word of input text.
+
+
+def measure_peak_memory(fxn: Callable[[], object], interval: float = 0.01) -> int:
+    """Measure the peak memory use of this process while running a function.
+
+    Args:
+        fxn (Callable[[], object]): Function to run.
+        interval (float, optional): Seconds between samples. Defaults to 0.01.
+
+    Returns:
+        int: Peak bytes in use.
+    """
+    monitor = MemoryMonitor(pids=lambda: [os.getpid()], budget=0, interval=interval)
+    monitor.start()
+    try:
+        fxn()
+    finally:
+        peak = monitor.stop()
+    return peak
+
+
+class MemoryPlan(BaseModel):
+    """Execution parameters chosen to fit a memory budget."""
+
+    n_workers: int
+    max_chunk_words: int
+    predicted_peak: int
+
+
+def plan_memory(
+    budget: int,
+    baseline: int,
+    profile: ModelMemoryProfile,
+    chunk_words: int,
+    max_workers: int,
+) -> MemoryPlan:
+    """Choose the number of workers and chunk length that fit a memory budget.
+
+    The chunk length is only reduced if a single chunk does not fit.
+
+    Args:
+        budget (int): Memory budget in bytes.
+        baseline (int): Memory already in use (without the model).
+        profile (ModelMemoryProfile): Measured memory cost of the model.
+        chunk_words (int): Default number of words per chunk.
+        max_workers (int): Maximum number of worker processes.
+
+    Raises:
+        ValueError: Raised if not even the smallest chunk fits the budget.
+
+    Returns:
+        MemoryPlan: Execution parameters.
+    """
+    free = budget - baseline - profile.model_bytes
+
+    def _per_sequence(n_words: int) -> float:
+        return profile.bytes_per_word * n_words * ACTIVATION_SAFETY_FACTOR
+
+    while _per_sequence(chunk_words) > free and chunk_words > MIN_CHUNK_WORDS:
+        chunk_words = max(chunk_words // 2, MIN_CHUNK_WORDS)
+    if _per_sequence(chunk_words) > free:
+        needed = baseline + profile.model_bytes + _per_sequence(chunk_words)
+        raise ValueError(
+            f"A memory budget of {format_memory_size(budget)} is too small "
+            f"(at least {format_memory_size(int(needed))} is needed)."
+        )
+    per_worker = _per_sequence(chunk_words) + WORKER_OVERHEAD_BYTES
+    n_workers = max(min(int(free // per_worker), max_workers), 1)
+    if n_workers == 1:
+        # A single worker is no faster than summarizing in the main process.
+        n_workers, per_worker = 0, _per_sequence(chunk_words)
+    predicted_peak = baseline + profile.model_bytes + max(n_workers, 1) * per_worker
+    return MemoryPlan(
+        n_workers=n_workers,
+        max_chunk_words=chunk_words,
+        predicted_peak=int(predicted_peak),
+    )
@@ -0,0 +1,81 @@
+"""Report how much of each process's memory is shared with other processes."""
+
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ProcessMemory(BaseModel):
+    """Memory use of a process (in bytes)."""
+
+    pid: int
+    rss: int  # Resident set size.
+    pss: int  # Proportional set size: shared pages divided among their users.
+    shared: int
+    private: int
+
+
+def _read_smaps_rollup(pid: int) -> Optional[dict[str, int]]:
+    path = Path("/proc") / str(pid) / "smaps_rollup"
+    if not path.exists():
+        return None
+    values: dict[str, int] = {}
+    with open(path, "r") as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return values
+
+
+def process_memory(pid: int) -> Optional[ProcessMemory]:
+    """Measure the memory use of a process.
+
+    Only available on Linux (it reads "/proc/<pid>/smaps_rollup").
+
+    Args:
+        pid (int): Process ID.
+
+    Returns:
+        Optional[ProcessMemory]: Memory use or None if it could not be measured.
+    """
+    if (smaps := _read_smaps_rollup(pid)) is None:
+        return None
+    return ProcessMemory(
+        pid=pid,
+        rss=smaps.get("Rss", 0),
+        pss=smaps.get("Pss", 0),
+        shared=smaps.get("Shared_Clean", 0) + smaps.get("Shared_Dirty", 0),
+        private=smaps.get("Private_Clean", 0) + smaps.get("Private_Dirty", 0),
+    )
+
+
+def _gb(n_bytes: int) -> str:
+    return f"{n_bytes / 1024**3:.2f} GB"
+
+
+def format_memory_report(pids: list[int]) -> str:
+    """Format a report of the memory use of some processes.
+
+    Args:
+        pids (list[int]): Process IDs.
+
+    Returns:
+        str: Table of RSS, shared, and private memory per process and in total.
+    """
+    usages = [m for pid in pids if (m := process_memory(pid)) is not None]
+    if len(usages) == 0:
+        return "(memory use is not available on this platform)"
+    lines = [f"{'pid':>8} {'RSS':>10} {'shared':>10} {'private':>10} {'PSS':>10}"]
+    for m in usages:
+        lines.append(
+            f"{m.pid:>8} {_gb(m.rss):>10} {_gb(m.shared):>10} "
+            f"{_gb(m.private):>10} {_gb(m.pss):>10}"
+        )
+    total_rss = sum(m.rss for m in usages)
+    total_pss = sum(m.pss for m in usages)
+    lines.append(
+        f"sum of RSS: {_gb(total_rss)}; actual use (sum of PSS): {_gb(total_pss)}"
+    )
+    return "\n".join(lines)
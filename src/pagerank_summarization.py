@@ -1,10 +1,15 @@
 """Summarize text using the PageRank method."""
 
+from importlib.metadata import PackageNotFoundError, version
 from typing import Any
 
 from pydantic import BaseModel
 from summa import summarizer
 
+from src.preprocessing import preprocessed
+
+scored_sentences = list[tuple[str, float]]
+
 
 class PageRankSummarizationConfiguration(BaseModel):
     """PageRank configuration parameters."""
@@ -12,6 +17,43 @@ class PageRankSummarizationConfiguration(BaseModel):
     ratio: float = 0.2
 
 
+def _summa_version() -> str:
+    try:
+        return version("summa")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def score_sentences(text: str) -> scored_sentences:
+    """Score every sentence of a text with TextRank.
+
+    Args:
+        text (str): Text to score.
+
+    Returns:
+        scored_sentences: Sentences and their scores in their original order (empty if
+        the text is too short for TextRank).
+    """
+    scored = summarizer.summarize(text, ratio=1.0, scores=True)
+    return list(scored) if isinstance(scored, list) else []
+
+
+def select_sentences(scored: scored_sentences, ratio: float) -> str:
+    """Select the highest scoring sentences (as summa does).
+
+    Args:
+        scored (scored_sentences): Sentences and scores in their original order.
+        ratio (float): Fraction of the sentences to keep.
+
+    Returns:
+        str: The selected sentences in their original order, one per line.
+    """
+    # A stable sort, so ties are broken by position as in `summarizer.summarize()`.
+    ranked = sorted(range(len(scored)), key=lambda i: scored[i][1], reverse=True)
+    keep = sorted(ranked[: int(len(scored) * ratio)])
+    return "\n".join(scored[i][0] for i in keep)
+
+
 def summarize(text: str, config_kwargs: dict[str, Any]) -> str:
     """Summarize text using the PageRank method.
 
@@ -24,6 +66,9 @@ def summarize(text: str, config_kwargs: dict[str, Any]) -> str:
         str: Summary of the input text.
     """
     config = PageRankSummarizationConfiguration(**config_kwargs)
-    text_sum = summarizer.summarize(text, ratio=config.ratio)
-    assert isinstance(text_sum, str), "Unexpected return type from summa library."
-    return text_sum
+    # Scoring the sentences is the expensive part and does not depend on the ratio,
+    # so the scores are shared by all configurations.
+    scored = preprocessed(
+        "textrank-sentences", _summa_version(), text=text, compute=score_sentences
+    )
+    return select_sentences(scored, ratio=config.ratio)
@@ -1,9 +1,14 @@
 """Get and parse an online scientific article."""
+import hashlib
+import os
 import pickle
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional, Union
+from typing import Final, Iterable, Optional, Union
 
+import bs4
 import requests
 from bs4 import BeautifulSoup, element
 
@@ -109,7 +114,20 @@ def parse_article(res: requests.Response, url: str) -> ScientificArticle:
     Returns:
         ScientificArticle: Parsed article.
     """
-    soup = BeautifulSoup(res.content, "html.parser")
+    return parse_article_html(res.content, url=url)
+
+
+def parse_article_html(content: Union[str, bytes], url: str) -> ScientificArticle:
+    """Parse the HTML of an article's webpage into its major components.
+
+    Args:
+        content (Union[str, bytes]): HTML of the article webpage.
+        url (str): URL of the article.
+
+    Returns:
+        ScientificArticle: Parsed article.
+    """
+    soup = BeautifulSoup(content, "html.parser")
     _remove_figures(soup)
     _remove_citations(soup)
     article_title = _extract_article_title(soup)
@@ -125,6 +143,72 @@ def parse_article(res: requests.Response, url: str) -> ScientificArticle:
     return ScientificArticle(title=article_title, url=url, text=article_text)
 
 
+# Increase when a change to the parser changes the parsed articles.
+PARSER_VERSION: Final[str] = "1"
+
+PARSED_ARTICLE_CACHE_DIR: Final[Path] = Path("cache") / "parsed-articles"
+
+# Cached articles are pickled, so they can only be loaded with the same data model.
+_ARTICLE_SCHEMA_HASH: Final[str] = hashlib.sha1(
+    ScientificArticle.schema_json(sort_keys=True).encode()
+).hexdigest()[:8]
+
+
+def _parsed_article_cache_path(content: bytes) -> Path:
+    # The parsed article depends on the HTML, the parser, BeautifulSoup, and the
+    # article data model.
+    content_hash = hashlib.sha1(content).hexdigest()
+    version = f"{PARSER_VERSION}-bs4-{bs4.__version__}-{_ARTICLE_SCHEMA_HASH}"
+    return PARSED_ARTICLE_CACHE_DIR / f"{content_hash}-{version}.pkl"
+
+
+def _check_parsed_article_cache(
+    content: bytes, url: str
+) -> Optional[ScientificArticle]:
+    cache_path = _parsed_article_cache_path(content)
+    if not cache_path.exists():
+        return None
+    with open(cache_path, "rb") as file:
+        article = pickle.load(file)
+    if not isinstance(article, ScientificArticle):
+        return None
+    if article.url != url:
+        # The same webpage was downloaded from another URL.
+        article = article.copy(update={"url": url})
+    return article
+
+
+def _write_parsed_article_cache(content: bytes, article: ScientificArticle) -> None:
+    PARSED_ARTICLE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache_path = _parsed_article_cache_path(content)
+    # Articles are parsed in several threads and processes at once.
+    writer_id = f"{os.getpid()}-{threading.get_ident()}"
+    tmp_path = cache_path.with_name(f".{cache_path.name}.{writer_id}.tmp")
+    with open(tmp_path, "wb") as file:
+        pickle.dump(article, file=file, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path.replace(cache_path)
+    return None
+
+
+def parse_article_cached(content: bytes, url: str) -> ScientificArticle:
+    """Parse the HTML of an article's webpage, reusing a previously parsed article.
+
+    Parsed articles are cached by the hash of the HTML and the version of the parser.
+
+    Args:
+        content (bytes): HTML of the article webpage.
+        url (str): URL of the article.
+
+    Returns:
+        ScientificArticle: Parsed article.
+    """
+    if (article := _check_parsed_article_cache(content, url=url)) is not None:
+        return article
+    article = parse_article_html(content, url=url)
+    _write_parsed_article_cache(content, article)
+    return article
+
+
 def get_and_parse_article(url: str) -> ScientificArticle:
     """Get and parse a scientific article from the web.
 
@@ -135,4 +219,44 @@ def get_and_parse_article(url: str) -> ScientificArticle:
         ScientificArticle: The data and text from the scientific article.
     """
     response = get_webpage(url=url)
-    return parse_article(response, url=url)
+    return parse_article_cached(response.content, url=url)
+
+
+def get_and_parse_articles(
+    urls: Iterable[str], max_workers: Optional[int] = None
+) -> list[ScientificArticle]:
+    """Get and parse several scientific articles from the web.
+
+    Articles that are not in the parsed article cache are parsed in parallel on a pool
+    of processes.
+
+    Args:
+        urls (Iterable[str]): URLs of the articles.
+        max_workers (Optional[int], optional): Maximum number of processes. Defaults to
+        None (the number of CPUs).
+
+    Returns:
+        list[ScientificArticle]: The parsed articles in the same order as the URLs.
+    """
+    urls = list(urls)
+    contents = [get_webpage(url=url).content for url in urls]
+    articles: list[Optional[ScientificArticle]] = [
+        _check_parsed_article_cache(content, url=url)
+        for content, url in zip(contents, urls)
+    ]
+    misses = [i for i, article in enumerate(articles) if article is None]
+    if len(misses) == 1:
+        i = misses[0]
+        articles[i] = parse_article_cached(contents[i], url=urls[i])
+    elif len(misses) > 1:
+        n_workers = min(len(misses), max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            parsed = executor.map(
+                parse_article_html,
+                [contents[i] for i in misses],
+                [urls[i] for i in misses],
+            )
+            for i, article in zip(misses, parsed):
+                _write_parsed_article_cache(contents[i], article)
+                articles[i] = article
+    return [a for a in articles if a is not None]
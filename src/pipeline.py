@@ -1,8 +1,18 @@
 """Functions for the pipeline of summarizations."""
 
+from itertools import product
+from pathlib import Path
+from typing import Final, Union
+
+import yaml
+from pydantic import BaseModel, validator
 
 from src.summarize_utils import SummarizationConfiguration, SummarizationMethod
 
+SWEEPS_CONFIG_PATH: Final[Path] = Path("pipeline-sweeps.yaml")
+
+config_value = Union[float, str, bool]
+
 
 def get_urls() -> set[str]:
     """Get the URLs for the articles to summarize.
@@ -18,35 +28,70 @@ def get_urls() -> set[str]:
     }
 
 
-def _textrank_pipeline_configs() -> list[SummarizationConfiguration]:
-    _ratios = [0.01, 0.05, 0.1, 0.2]
-    return [
-        SummarizationConfiguration(
-            method=SummarizationMethod.TEXTRANK, config_kwargs={"ratio": ratio}
-        )
-        for ratio in _ratios
-    ]
+class ConfigurationSweep(BaseModel):
+    """A sweep over the parameters of a summarization method."""
+
+    method: SummarizationMethod
+    grid: dict[str, list[config_value]] = {}
+    zip: dict[str, list[config_value]] = {}
+
+    @validator("zip")
+    def _zipped_lists_have_same_length(
+        cls, value: dict[str, list[config_value]]
+    ) -> dict[str, list[config_value]]:
+        if len(set(len(v) for v in value.values())) > 1:
+            raise ValueError("All parameters under `zip` must have the same length.")
+        return value
+
+    def configurations(self) -> list[SummarizationConfiguration]:
+        """Expand the sweep into its summarization configurations.
+
+        Returns:
+            list[SummarizationConfiguration]: Summarization configurations.
+        """
+        zipped: list[dict[str, config_value]] = [{}]
+        if len(self.zip) > 0:
+            zipped = [dict(zip(self.zip.keys(), v)) for v in zip(*self.zip.values())]
+        gridded = [dict(zip(self.grid.keys(), v)) for v in product(*self.grid.values())]
+        return [
+            SummarizationConfiguration(method=self.method, config_kwargs={**g, **z})
+            for g, z in product(gridded, zipped)
+        ]
+
 
+class SweepsConfiguration(BaseModel):
+    """All of the configuration sweeps for the pipeline."""
 
-def _bart_pipeline_configs() -> list[SummarizationConfiguration]:
-    _min_ratios = [0.05, 0.1, 0.2]
-    _max_ratios = [0.1, 0.2, 0.3]
-    return [
-        SummarizationConfiguration(
-            method=SummarizationMethod.BART,
-            config_kwargs={"min_ratio": min_ratio, "max_ratio": max_ratio},
-        )
-        for min_ratio, max_ratio in zip(_min_ratios, _max_ratios)
-    ]
+    sweeps: list[ConfigurationSweep]
 
 
-def generate_configurations() -> list[SummarizationConfiguration]:
+def load_sweeps(path: Path = SWEEPS_CONFIG_PATH) -> SweepsConfiguration:
+    """Load the configuration sweeps from a YAML file.
+
+    Args:
+        path (Path, optional): Path to the YAML file. Defaults to
+        "pipeline-sweeps.yaml".
+
+    Returns:
+        SweepsConfiguration: Configuration sweeps.
+    """
+    with open(path, "r") as file:
+        return SweepsConfiguration(**yaml.safe_load(file))
+
+
+def generate_configurations(
+    path: Path = SWEEPS_CONFIG_PATH,
+) -> list[SummarizationConfiguration]:
     """Get configurations to use for the summarizations.
 
+    Args:
+        path (Path, optional): Path to the YAML file of configuration sweeps. Defaults
+        to "pipeline-sweeps.yaml".
+
     Returns:
         list[SummarizationConfiguration]: List of summarization configurations.
     """
     configs: list[SummarizationConfiguration] = []
-    configs += _textrank_pipeline_configs()
-    configs += _bart_pipeline_configs()
+    for sweep in load_sweeps(path).sweeps:
+        configs += sweep.configurations()
     return configs
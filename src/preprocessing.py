@@ -0,0 +1,161 @@
+"""Per-article preprocessing results shared by every summarization configuration.
+
+Preprocessing that only depends on a piece of text (e.g. TextRank's sentence scores or
+a tokenizer's token counts) is stored in an artifact for the article being summarized,
+so it is computed once and reused by all of the configurations the article is
+summarized with. Artifacts are kept next to the webpage cache and are invalidated by
+the article's content hash and the version of each kind of preprocessing.
+"""
+
+import hashlib
+import pickle
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Final, Iterator, Optional, TypeVar
+
+from pydantic import BaseModel
+
+from src.classes_and_types import ScientificArticle
+
+PREPROCESSING_CACHE_DIR: Final[Path] = Path("cache") / "preprocessing"
+
+T = TypeVar("T")
+
+
+class ArticlePreprocessing(BaseModel):
+    """Preprocessing results for an article.
+
+    `entries` maps each kind of preprocessing to its results keyed by the hash of the
+    text they were computed from; `versions` is the version each kind was computed
+    with.
+    """
+
+    content_hash: str
+    versions: dict[str, str] = {}
+    entries: dict[str, dict[str, Any]] = {}
+
+    def n_entries(self) -> int:
+        """Count the stored results.
+
+        Returns:
+            int: Number of results across all kinds of preprocessing.
+        """
+        return sum(len(e) for e in self.entries.values())
+
+
+# Guards artifacts against being written while another thread adds to them.
+_ARTIFACT_LOCK: Final[threading.Lock] = threading.Lock()
+
+_ACTIVE_PREPROCESSING: ContextVar[Optional[ArticlePreprocessing]] = ContextVar(
+    "active_preprocessing", default=None
+)
+
+
+def article_content_hash(article: ScientificArticle) -> str:
+    """Hash the text of an article.
+
+    Args:
+        article (ScientificArticle): Article.
+
+    Returns:
+        str: Hex digest of the article's text.
+    """
+    return hashlib.sha1(article.text.json().encode()).hexdigest()
+
+
+def _artifact_path(content_hash: str) -> Path:
+    return PREPROCESSING_CACHE_DIR / f"{content_hash}.pkl"
+
+
+def read_preprocessing(article: ScientificArticle) -> ArticlePreprocessing:
+    """Read the preprocessing artifact for an article.
+
+    Args:
+        article (ScientificArticle): Article.
+
+    Returns:
+        ArticlePreprocessing: The stored artifact or a new, empty one.
+    """
+    content_hash = article_content_hash(article)
+    path = _artifact_path(content_hash)
+    if path.exists():
+        with open(path, "rb") as file:
+            artifact = pickle.load(file)
+        if isinstance(artifact, ArticlePreprocessing):
+            return artifact
+    return ArticlePreprocessing(content_hash=content_hash)
+
+
+def write_preprocessing(artifact: ArticlePreprocessing) -> None:
+    """Write a preprocessing artifact.
+
+    Args:
+        artifact (ArticlePreprocessing): Preprocessing artifact.
+    """
+    PREPROCESSING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _artifact_path(artifact.content_hash)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with _ARTIFACT_LOCK:
+        data = pickle.dumps(artifact)
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    tmp_path.replace(path)
+    return None
+
+
+@contextmanager
+def article_preprocessing(
+    article: ScientificArticle,
+) -> Iterator[ArticlePreprocessing]:
+    """Use an article's preprocessing artifact while summarizing it.
+
+    Inside the context, `preprocessed()` reads from and adds to the article's artifact.
+    The artifact is written back on exit if anything was added.
+
+    Args:
+        article (ScientificArticle): Article being summarized.
+
+    Yields:
+        Iterator[ArticlePreprocessing]: The article's preprocessing artifact.
+    """
+    artifact = read_preprocessing(article)
+    versions, n_entries = dict(artifact.versions), artifact.n_entries()
+    token = _ACTIVE_PREPROCESSING.set(artifact)
+    try:
+        yield artifact
+    finally:
+        _ACTIVE_PREPROCESSING.reset(token)
+        if artifact.versions != versions or artifact.n_entries() != n_entries:
+            write_preprocessing(artifact)
+
+
+def preprocessed(kind: str, version: str, text: str, compute: Callable[[str], T]) -> T:
+    """Get a preprocessing result for some text, computing it if it is not stored.
+
+    Outside of `article_preprocessing()`, the result is always computed.
+
+    Args:
+        kind (str): Kind of preprocessing (e.g. "textrank-sentences").
+        version (str): Version of the preprocessing (e.g. of the library or tokenizer);
+        stored results from another version are discarded.
+        text (str): Input text.
+        compute (Callable[[str], T]): Function computing the result from the text.
+
+    Returns:
+        T: Preprocessing result.
+    """
+    if (artifact := _ACTIVE_PREPROCESSING.get()) is None:
+        return compute(text)
+    key = hashlib.sha1(text.encode()).hexdigest()
+    with _ARTIFACT_LOCK:
+        if artifact.versions.get(kind) != version:
+            artifact.versions[kind] = version
+            artifact.entries[kind] = {}
+        if key in (results := artifact.entries.setdefault(kind, {})):
+            return results[key]
+    result = compute(text)
+    with _ARTIFACT_LOCK:
+        results[key] = result
+    return result
@@ -0,0 +1,225 @@
+"""Pack pipeline results into a single compressed archive with a built-in index.
+
+Layout of an archive file:
+
+    magic | result frame | result frame | ... | index frame | footer
+
+Each result (the JSON of a summarized article) is a separate zstd frame so that any
+one of them can be read without decompressing the others. The index frame is the
+zstd-compressed JSON list of entries (name, title, configuration, offset, length) and
+the fixed-size footer gives the location of the index. Appending writes the new
+results and a new index after the old footer, so results that were not changed are
+never rewritten.
+"""
+
+import hashlib
+import mmap
+import struct
+from pathlib import Path
+from types import TracebackType
+from typing import Final, Optional, Type
+
+import zstandard
+from pydantic import BaseModel
+
+from src.classes_and_types import (
+    SummarizationConfiguration,
+    SummarizedScientificArticle,
+)
+
+RESULTS_ARCHIVE_PATH: Final[Path] = Path("pipeline-results.sumarc")
+
+ARCHIVE_MAGIC: Final[bytes] = b"SUMARC01"
+# Magic, offset of the index frame, and length of the index frame.
+_FOOTER: Final[struct.Struct] = struct.Struct("<8sQQ")
+ZSTD_LEVEL: Final[int] = 10
+
+
+class ArchiveEntry(BaseModel):
+    """Location of a result in an archive."""
+
+    name: str  # File name of the result in the results directory.
+    title: str
+    config: SummarizationConfiguration
+    sha1: str  # Hash of the uncompressed result.
+    offset: int
+    length: int
+
+
+class ArchiveIndex(BaseModel):
+    """Index of the results in an archive."""
+
+    entries: list[ArchiveEntry] = []
+
+
+def _read_footer(buffer: mmap.mmap) -> tuple[int, int]:
+    if len(buffer) < len(ARCHIVE_MAGIC) + _FOOTER.size:
+        raise ValueError("Not a results archive (file is too short).")
+    magic, index_offset, index_length = _FOOTER.unpack(buffer[-_FOOTER.size :])
+    if magic != ARCHIVE_MAGIC or buffer[: len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+        raise ValueError("Not a results archive (bad magic number).")
+    return index_offset, index_length
+
+
+def _read_index(buffer: mmap.mmap) -> ArchiveIndex:
+    index_offset, index_length = _read_footer(buffer)
+    frame = buffer[index_offset : index_offset + index_length]
+    return ArchiveIndex.parse_raw(zstandard.ZstdDecompressor().decompress(frame))
+
+
+class ResultsArchive:
+    """Read-only, memory-mapped access to the results in an archive."""
+
+    def __init__(self, path: Path) -> None:
+        """Open a results archive.
+
+        Args:
+            path (Path): Path to the archive.
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self.index = _read_index(self._mmap)
+
+    def read_bytes(self, entry: ArchiveEntry) -> bytes:
+        """Read the uncompressed JSON of a result.
+
+        Args:
+            entry (ArchiveEntry): Index entry of the result.
+
+        Returns:
+            bytes: JSON of the summarized article.
+        """
+        frame = memoryview(self._mmap)[entry.offset : entry.offset + entry.length]
+        try:
+            return self._decompressor.decompress(frame)
+        finally:
+            frame.release()
+
+    def read(self, entry: ArchiveEntry) -> SummarizedScientificArticle:
+        """Read a result.
+
+        Args:
+            entry (ArchiveEntry): Index entry of the result.
+
+        Returns:
+            SummarizedScientificArticle: The summarized article.
+        """
+        return SummarizedScientificArticle.parse_raw(self.read_bytes(entry))
+
+    def close(self) -> None:
+        """Close the archive."""
+        self._mmap.close()
+        self._file.close()
+        return None
+
+    def __enter__(self) -> "ResultsArchive":
+        """Use the archive as a context manager."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Close the archive on leaving the context."""
+        self.close()
+        return None
+
+
+def append_results(results_dir: Path, archive: Path) -> int:
+    """Add the results in a directory that are new or changed to an archive.
+
+    The archive is created if it does not exist. A result replaces any result with the
+    same file name already in the archive.
+
+    Args:
+        results_dir (Path): Directory of summarized article JSON files.
+        archive (Path): Path to the archive.
+
+    Returns:
+        int: Number of results added.
+    """
+    created = not archive.exists()
+    if created:
+        index = ArchiveIndex()
+    else:
+        with open(archive, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                index = _read_index(buffer)
+    entries = {e.name: e for e in index.entries}
+
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    n_added = 0
+    try:
+        with open(archive, "w+b" if created else "r+b") as file:
+            original_size = file.seek(0, 2)
+            try:
+                if created:
+                    file.write(ARCHIVE_MAGIC)
+                for fpath in sorted(results_dir.iterdir()):
+                    if fpath.suffix != ".json":
+                        continue
+                    data = fpath.read_bytes()
+                    sha1 = hashlib.sha1(data).hexdigest()
+                    old = entries.get(fpath.name)
+                    if old is not None and old.sha1 == sha1:
+                        continue
+                    article = SummarizedScientificArticle.parse_raw(data)
+                    frame = compressor.compress(data)
+                    entries[fpath.name] = ArchiveEntry(
+                        name=fpath.name,
+                        title=article.title,
+                        config=article.config,
+                        sha1=sha1,
+                        offset=file.tell(),
+                        length=len(frame),
+                    )
+                    file.write(frame)
+                    n_added += 1
+                if n_added == 0 and not created:
+                    return 0
+                # A new archive gets an index even if it is empty.
+                index = ArchiveIndex(
+                    entries=sorted(entries.values(), key=lambda e: e.name)
+                )
+                index_frame = compressor.compress(index.json().encode())
+                index_offset = file.tell()
+                file.write(index_frame)
+                file.write(_FOOTER.pack(ARCHIVE_MAGIC, index_offset, len(index_frame)))
+            except BaseException:
+                # Leave the archive as it was.
+                file.truncate(original_size)
+                raise
+    except BaseException:
+        if created:
+            archive.unlink(missing_ok=True)
+        raise
+    return n_added
+
+
+def extract_results(archive: Path, results_dir: Path) -> int:
+    """Write the results in an archive to a directory of JSON files.
+
+    Files that already have the same contents are left untouched.
+
+    Args:
+        archive (Path): Path to the archive.
+        results_dir (Path): Directory of summarized article JSON files.
+
+    Returns:
+        int: Number of files written.
+    """
+    results_dir.mkdir(parents=True, exist_ok=True)
+    n_written = 0
+    with ResultsArchive(archive) as results:
+        for entry in results.index.entries:
+            fpath = results_dir / entry.name
+            if fpath.exists():
+                if hashlib.sha1(fpath.read_bytes()).hexdigest() == entry.sha1:
+                    continue
+            fpath.write_bytes(results.read_bytes(entry))
+            n_written += 1
+    return n_written
@@ -0,0 +1,258 @@
+"""Cost model and scheduling of the summarization pipeline's jobs."""
+
+import heapq
+from pathlib import Path
+from typing import Final, Optional
+
+from pydantic import BaseModel
+
+from src.classes_and_types import (
+    ScientificArticle,
+    SummarizationConfiguration,
+    SummarizationMethod,
+)
+from src.text_utils import total_word_count
+
+TIMINGS_PATH: Final[Path] = Path("cache") / "timings.jsonl"
+
+# Rough seconds per word used for a method before any of its runs have been timed.
+DEFAULT_SECONDS_PER_WORD: Final[dict[SummarizationMethod, float]] = {
+    SummarizationMethod.TEXTRANK: 0.0002,
+    SummarizationMethod.BART: 0.03,
+    SummarizationMethod.GPT3: 0.005,
+    SummarizationMethod.HYBRID: 0.01,
+}
+
+# OpenAI prices (USD) per 1,000 tokens (prompt and completion).
+GPT3_PRICE_PER_1K_TOKENS: Final[dict[str, float]] = {
+    "davinci": 0.06,
+    "curie": 0.006,
+    "babbage": 0.0012,
+    "ada": 0.0008,
+}
+TOKENS_PER_WORD: Final[float] = 4 / 3
+
+
+class SummarizationTiming(BaseModel):
+    """How long a summarization took."""
+
+    config: SummarizationConfiguration
+    n_words: int
+    seconds: float
+
+
+class LinearCostModel(BaseModel):
+    """Run time as a linear function of the number of words summarized."""
+
+    intercept: float = 0.0
+    seconds_per_word: float
+
+    def predict(self, n_words: int, intercept: bool = True) -> float:
+        """Predict the run time for summarizing some number of words.
+
+        Args:
+            n_words (int): Number of words.
+            intercept (bool, optional): Include the fixed cost of a summarization
+            (e.g. warming up the model). Defaults to True.
+
+        Returns:
+            float: Predicted number of seconds.
+        """
+        fixed = self.intercept if intercept else 0.0
+        return max(fixed + self.seconds_per_word * n_words, 0.0)
+
+
+class CostModel(BaseModel):
+    """Cost model for each summarization method (and configuration)."""
+
+    methods: dict[SummarizationMethod, LinearCostModel] = {}
+    configs: dict[str, LinearCostModel] = {}
+
+    def predict_seconds(
+        self, config: SummarizationConfiguration, n_words: int, intercept: bool = True
+    ) -> float:
+        """Predict how long a summarization will take.
+
+        The model fit to the configuration is used if there is one, then the model for
+        the method, and lastly a default rate per word.
+
+        Args:
+            config (SummarizationConfiguration): Summarization configuration.
+            n_words (int): Number of words in the article.
+            intercept (bool, optional): Include the fixed cost of summarizing an
+            article; leave it out to predict the rest of an article that is already
+            being summarized. Defaults to True.
+
+        Returns:
+            float: Predicted number of seconds.
+        """
+        if (model := self.configs.get(config.json())) is not None:
+            return model.predict(n_words, intercept=intercept)
+        if (model := self.methods.get(config.method)) is not None:
+            return model.predict(n_words, intercept=intercept)
+        return DEFAULT_SECONDS_PER_WORD.get(config.method, 0.0) * n_words
+
+    def predict_dollars(
+        self, config: SummarizationConfiguration, n_words: int
+    ) -> float:
+        """Predict how much a summarization will cost in API fees.
+
+        Args:
+            config (SummarizationConfiguration): Summarization configuration.
+            n_words (int): Number of words in the article.
+
+        Returns:
+            float: Predicted cost in US dollars.
+        """
+        kwargs = config.config_kwargs if config.config_kwargs is not None else {}
+        if config.method is SummarizationMethod.HYBRID:
+            if kwargs.get("abstractive_method") != SummarizationMethod.GPT3.value:
+                return 0.0
+            n_words = int(n_words * float(kwargs.get("extractive_ratio", 0.3)))
+        elif config.method is not SummarizationMethod.GPT3:
+            return 0.0
+        engine = str(kwargs.get("engine", "davinci"))
+        max_ratio = float(kwargs.get("max_ratio", 0.3))
+        n_tokens = n_words * TOKENS_PER_WORD * (1 + max_ratio)
+        return n_tokens / 1000 * GPT3_PRICE_PER_1K_TOKENS[engine]
+
+
+def record_timing(timing: SummarizationTiming, path: Path = TIMINGS_PATH) -> None:
+    """Append the timing of a summarization to the timings file.
+
+    Args:
+        timing (SummarizationTiming): Summarization timing.
+        path (Path, optional): Timings file. Defaults to TIMINGS_PATH.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as file:
+        file.write(timing.json() + "\n")
+    return None
+
+
+def read_timings(path: Path = TIMINGS_PATH) -> list[SummarizationTiming]:
+    """Read the timings of previous summarizations.
+
+    Args:
+        path (Path, optional): Timings file. Defaults to TIMINGS_PATH.
+
+    Returns:
+        list[SummarizationTiming]: Previous summarization timings.
+    """
+    if not path.exists():
+        return []
+    with open(path, "r") as file:
+        return [SummarizationTiming.parse_raw(line) for line in file if line.strip()]
+
+
+def _fit_linear(timings: list[SummarizationTiming]) -> Optional[LinearCostModel]:
+    if len(timings) == 0:
+        return None
+    xs = [float(t.n_words) for t in timings]
+    ys = [t.seconds for t in timings]
+    x_mean, y_mean = sum(xs) / len(xs), sum(ys) / len(ys)
+    ss_xx = sum((x - x_mean) ** 2 for x in xs)
+    if ss_xx == 0:
+        # Not enough spread in the article sizes to fit an intercept.
+        return LinearCostModel(seconds_per_word=y_mean / max(x_mean, 1.0))
+    slope = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / ss_xx
+    if slope <= 0:
+        return LinearCostModel(seconds_per_word=y_mean / max(x_mean, 1.0))
+    return LinearCostModel(intercept=y_mean - slope * x_mean, seconds_per_word=slope)
+
+
+def fit_cost_model(timings: list[SummarizationTiming]) -> CostModel:
+    """Fit a cost model to the timings of previous summarizations.
+
+    Args:
+        timings (list[SummarizationTiming]): Previous summarization timings.
+
+    Returns:
+        CostModel: Fit cost model.
+    """
+    cost_model = CostModel()
+    for method in SummarizationMethod:
+        method_timings = [t for t in timings if t.config.method is method]
+        if (model := _fit_linear(method_timings)) is not None:
+            cost_model.methods[method] = model
+    for config_key in set(t.config.json() for t in timings):
+        config_timings = [t for t in timings if t.config.json() == config_key]
+        if len(config_timings) < 2:
+            continue
+        if (model := _fit_linear(config_timings)) is not None:
+            cost_model.configs[config_key] = model
+    return cost_model
+
+
+def article_word_count(article: ScientificArticle) -> int:
+    """Count the words in the parts of an article that are summarized.
+
+    Args:
+        article (ScientificArticle): Article.
+
+    Returns:
+        int: Number of words.
+    """
+    text = article.text
+    return total_word_count(
+        [text.Introduction, text.Discussion, *text.Results.values()]
+    )
+
+
+class ScheduledJob(BaseModel):
+    """A summarization with its predicted cost."""
+
+    article: ScientificArticle
+    config: SummarizationConfiguration
+    seconds: float
+    dollars: float
+
+
+def schedule_jobs(
+    articles: list[ScientificArticle],
+    configs: list[SummarizationConfiguration],
+    cost_model: CostModel,
+) -> list[ScheduledJob]:
+    """Order summarizations longest first.
+
+    Starting the longest jobs first avoids ending a run with one long job running
+    alone while the other workers sit idle.
+
+    Args:
+        articles (list[ScientificArticle]): Articles.
+        configs (list[SummarizationConfiguration]): Summarization configurations.
+        cost_model (CostModel): Cost model.
+
+    Returns:
+        list[ScheduledJob]: Jobs in the order in which to run them.
+    """
+    jobs: list[ScheduledJob] = []
+    for article in articles:
+        n_words = article_word_count(article)
+        for config in configs:
+            jobs.append(
+                ScheduledJob(
+                    article=article,
+                    config=config,
+                    seconds=cost_model.predict_seconds(config, n_words),
+                    dollars=cost_model.predict_dollars(config, n_words),
+                )
+            )
+    jobs.sort(key=lambda j: j.seconds, reverse=True)
+    return jobs
+
+
+def estimate_wall_time(jobs: list[ScheduledJob], n_workers: int = 1) -> float:
+    """Estimate the wall time to run jobs, in order, on a number of workers.
+
+    Args:
+        jobs (list[ScheduledJob]): Jobs in the order they will be started.
+        n_workers (int, optional): Number of workers. Defaults to 1.
+
+    Returns:
+        float: Estimated number of seconds until the last job finishes.
+    """
+    finish_times = [0.0] * max(n_workers, 1)
+    for job in jobs:
+        heapq.heappush(finish_times, heapq.heappop(finish_times) + job.seconds)
+    return max(finish_times)
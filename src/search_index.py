@@ -0,0 +1,290 @@
+"""Full-text search over the parsed articles and their summaries."""
+
+import json
+import sqlite3
+from functools import partial
+from pathlib import Path
+from typing import Callable, Final, Iterator, Optional
+
+from pydantic import BaseModel
+
+from src.classes_and_types import (
+    ScientificArticleText,
+    SummarizedScientificArticle,
+    format_config,
+)
+from src.preprocessing import article_content_hash
+from src.results_archive import ResultsArchive
+
+SEARCH_INDEX_PATH: Final[Path] = Path("pipeline-results") / "search-index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS indexed_articles (
+    url TEXT PRIMARY KEY,
+    text_hash TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    title,
+    section,
+    subsection,
+    body,
+    method UNINDEXED,
+    config_str UNINDEXED,
+    source UNINDEXED,
+    url UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+"""
+
+# Increase when `_SCHEMA` changes; older indexes are rebuilt from scratch.
+_SCHEMA_VERSION = 2
+
+# Column weights for `bm25()`: title, section, subsection, body.
+_BM25_WEIGHTS = "10.0, 4.0, 4.0, 1.0"
+
+ORIGINAL_TEXT = "ORIGINAL"
+
+
+class SearchResult(BaseModel):
+    """A single ranked hit from the search index."""
+
+    title: str
+    section: str
+    subsection: str
+    method: str
+    config_str: str
+    snippet: str
+    score: float
+
+
+def _quote_terms(query: str) -> str:
+    return " ".join('"' + t.replace('"', '""') + '"' for t in query.split())
+
+
+def _connect(index_path: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(index_path)
+    if con.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+        con.executescript(
+            "DROP TABLE IF EXISTS indexed_files;"
+            "DROP TABLE IF EXISTS indexed_articles;"
+            "DROP TABLE IF EXISTS documents;"
+            f"PRAGMA user_version = {_SCHEMA_VERSION};"
+        )
+    con.executescript(_SCHEMA)
+    return con
+
+
+def _iter_text_rows(
+    text: ScientificArticleText,
+) -> Iterator[tuple[str, str, str]]:
+    for section, paragraphs in text.dict().items():
+        if isinstance(paragraphs, list):
+            if len(body := "\n".join(paragraphs).strip()) > 0:
+                yield section, "", body
+        elif isinstance(paragraphs, dict):
+            for subsection, sub_paragraphs in paragraphs.items():
+                if len(body := "\n".join(sub_paragraphs).strip()) > 0:
+                    yield section, subsection, body
+        else:
+            raise BaseException("Unexpected type of paragraph in article.")
+
+
+def _index_summary(
+    con: sqlite3.Connection, article: SummarizedScientificArticle, source: str
+) -> None:
+    rows: list[tuple[str, str, str, str, str, str, str, str]] = []
+    method = article.config.method.value
+    config_str = format_config(article.config)
+    for section, subsection, body in _iter_text_rows(article.summary):
+        rows.append(
+            (
+                article.title,
+                section,
+                subsection,
+                body,
+                method,
+                config_str,
+                source,
+                article.url,
+            )
+        )
+
+    # The original text is shared by every summary of an article; index it once (and
+    # again when the article is revised).
+    text_hash = article_content_hash(article)
+    indexed = con.execute(
+        "SELECT text_hash FROM indexed_articles WHERE url = ?", (article.url,)
+    ).fetchone()
+    if indexed is None or indexed[0] != text_hash:
+        con.execute(
+            "DELETE FROM documents WHERE url = ? AND method = ?",
+            (article.url, ORIGINAL_TEXT),
+        )
+        con.execute(
+            "INSERT OR REPLACE INTO indexed_articles (url, text_hash) VALUES (?, ?)",
+            (article.url, text_hash),
+        )
+        for section, subsection, body in _iter_text_rows(article.text):
+            rows.append(
+                (
+                    article.title,
+                    section,
+                    subsection,
+                    body,
+                    ORIGINAL_TEXT,
+                    "",
+                    "",
+                    article.url,
+                )
+            )
+
+    con.executemany(
+        "INSERT INTO documents "
+        "(title, section, subsection, body, method, config_str, source, url) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    return None
+
+
+def _remove_orphaned_articles(con: sqlite3.Connection) -> None:
+    # Remove the text of articles that no longer have any summaries.
+    con.execute(
+        "DELETE FROM documents WHERE method = ? AND url NOT IN "
+        "(SELECT url FROM documents WHERE method != ?)",
+        (ORIGINAL_TEXT, ORIGINAL_TEXT),
+    )
+    con.execute(
+        "DELETE FROM indexed_articles WHERE url NOT IN (SELECT url FROM documents)"
+    )
+    return None
+
+
+def _read_result_file(fpath: Path) -> Callable[[], SummarizedScientificArticle]:
+    def _read() -> SummarizedScientificArticle:
+        with open(fpath, "r") as file:
+            return SummarizedScientificArticle(**json.load(file))
+
+    return _read
+
+
+def _iter_results(
+    results_dir: Path, archive: Optional[Path]
+) -> Iterator[tuple[str, float, Callable[[], SummarizedScientificArticle]]]:
+    # Yields the name, version stamp, and reader of each result. A result in the
+    # archive is versioned by its offset as appending never reuses an offset.
+    names: set[str] = set()
+    if results_dir.exists():
+        for fpath in sorted(results_dir.iterdir()):
+            if fpath.suffix == ".json":
+                names.add(fpath.name)
+                yield fpath.name, fpath.stat().st_mtime, _read_result_file(fpath)
+    if archive is None or not archive.exists():
+        return
+    with ResultsArchive(archive) as results:
+        for entry in results.index.entries:
+            if entry.name not in names:
+                yield entry.name, entry.offset, partial(results.read, entry)
+    return
+
+
+def build_search_index(
+    results_dir: Path, index_path: Path, archive: Optional[Path] = None
+) -> int:
+    """Incrementally add summarized articles to the search index.
+
+    Only result files that are new or have been modified since they were last indexed
+    are (re-)read. Result files that no longer exist are removed from the index, as is
+    the text of articles that no longer have any summaries.
+
+    Args:
+        results_dir (Path): Directory of summarized article JSON files.
+        index_path (Path): Path to the SQLite search index.
+        archive (Optional[Path], optional): Results archive to also index (results in
+        the directory take precedence). Defaults to None.
+
+    Returns:
+        int: Number of result files that were (re-)indexed.
+    """
+    con = _connect(index_path)
+    known: dict[str, float] = dict(
+        con.execute("SELECT path, mtime FROM indexed_files").fetchall()
+    )
+    n_indexed = 0
+    current: set[str] = set()
+    with con:
+        for name, mtime, read_result in _iter_results(results_dir, archive=archive):
+            current.add(name)
+            if known.get(name) == mtime:
+                continue
+            article = read_result()
+            con.execute("DELETE FROM documents WHERE source = ?", (name,))
+            _index_summary(con, article, source=name)
+            con.execute(
+                "INSERT OR REPLACE INTO indexed_files (path, mtime) VALUES (?, ?)",
+                (name, mtime),
+            )
+            n_indexed += 1
+        removed = known.keys() - current
+        for name in removed:
+            con.execute("DELETE FROM documents WHERE source = ?", (name,))
+            con.execute("DELETE FROM indexed_files WHERE path = ?", (name,))
+        if n_indexed > 0 or len(removed) > 0:
+            _remove_orphaned_articles(con)
+    con.close()
+    return n_indexed
+
+
+def search(
+    index_path: Path, query: str, limit: int = 20, method: Optional[str] = None
+) -> list[SearchResult]:
+    """Run a ranked full-text query against the search index.
+
+    Args:
+        index_path (Path): Path to the SQLite search index.
+        query (str): FTS5 query (e.g. `KRAS G12D` or `"KRAS G12D"` for a phrase).
+        limit (int, optional): Maximum number of results. Defaults to 20.
+        method (Optional[str], optional): Only return hits for this summarization
+        method (or "ORIGINAL" for the article text). Defaults to None.
+
+    Returns:
+        list[SearchResult]: Results, best match first.
+    """
+    sql = (
+        "SELECT title, section, subsection, method, config_str, "
+        "snippet(documents, 3, '**', '**', ' … ', 16), "
+        f"bm25(documents, {_BM25_WEIGHTS}) AS score "
+        "FROM documents WHERE documents MATCH ?"
+    )
+    params: list[object] = [query]
+    if method is not None:
+        sql += " AND method = ?"
+        params.append(method)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+
+    con = _connect(index_path)
+    try:
+        rows = con.execute(sql, params).fetchall()
+    except sqlite3.OperationalError:
+        # Not valid FTS5 syntax (e.g. "allele-specific"): search the plain terms.
+        params[0] = _quote_terms(query)
+        rows = con.execute(sql, params).fetchall()
+    finally:
+        con.close()
+    return [
+        SearchResult(
+            title=r[0],
+            section=r[1],
+            subsection=r[2],
+            method=r[3],
+            config_str=r[4],
+            snippet=r[5],
+            score=r[6],
+        )
+        for r in rows
+    ]
@@ -1,23 +1,41 @@
 """Utilities for the main summarization script."""
 
-from typing import Any, Callable, Final, Optional
+from collections import defaultdict
+from time import monotonic
+from typing import Any, Callable, Final, Optional, Sequence, Union
 
+from src.article_buffer import ArticleBuffer, TextChunkView, chunk_anchors
+from src.bart_summarization import beam_cap as bart_beam_cap
+from src.bart_summarization import decoding_profile_name as bart_decoding_profile_name
 from src.bart_summarization import summarize as bart_summarize
+from src.bart_summarization import summarize_batch as bart_summarize_batch
 from src.classes_and_types import (
     ScientificArticle,
     ScientificArticleText,
     SummarizationConfiguration,
     SummarizationMethod,
     SummarizedScientificArticle,
-    multisection_text,
+    SummarizedTextChunk,
+    TextChunk,
     section_text,
 )
+from src.gpt3_summarization import Gpt3SummarizationConfiguration
+from src.gpt3_summarization import plan_requests as gpt3_plan_requests
 from src.gpt3_summarization import summarize as gpt3_summarize
+from src.gpt3_summarization import summarize_batch as gpt3_summarize_batch
+from src.hybrid_summarization import (
+    HybridSummarizationConfiguration,
+    prefilter_article_text,
+)
 from src.pagerank_summarization import summarize as pagerange_summarize
+from src.preprocessing import article_preprocessing
+from src.scheduler import CostModel, fit_cost_model, read_timings
 from src.text_utils import word_count
 
 article_type = dict[str, list[str]]
+text_chunk = Union[TextChunk, TextChunkView]
 summarization_callable = Callable[[str, dict[str, Any]], str]
+batch_summarization_callable = Callable[[list[str], dict[str, Any]], list[str]]
 
 
 SUMMARIZATION_CALLABLES: dict[SummarizationMethod, summarization_callable] = {
@@ -26,6 +44,14 @@ SUMMARIZATION_CALLABLES: dict[SummarizationMethod, summarization_callable] = {
     SummarizationMethod.GPT3: gpt3_summarize,
 }
 
+# Methods that can summarize all of an article's chunks in a single call.
+BATCH_SUMMARIZATION_CALLABLES: dict[
+    SummarizationMethod, batch_summarization_callable
+] = {
+    SummarizationMethod.BART: bart_summarize_batch,
+    SummarizationMethod.GPT3: gpt3_summarize_batch,
+}
+
 KEEP_SECTIONS = ["Introduction", "Results", "Discussion", "Results and discussion"]
 
 SUMMARIZATION_METHOD_MAX_LENGTHS: Final[dict[SummarizationMethod, int]] = {
@@ -34,6 +60,12 @@ SUMMARIZATION_METHOD_MAX_LENGTHS: Final[dict[SummarizationMethod, int]] = {
 }
 
 
+# Used for the sections that cannot be summarized within a time budget.
+FALLBACK_CONFIG: Final[SummarizationConfiguration] = SummarizationConfiguration(
+    method=SummarizationMethod.TEXTRANK, config_kwargs={"ratio": 0.2}
+)
+
+
 def _summarize(
     text: str, method: SummarizationMethod, kwargs: Optional[dict[str, Any]]
 ) -> str:
@@ -45,48 +77,262 @@ def _summarize(
     return fxn(text, kwargs)
 
 
-def _compress_paragraphs(paragraphs: section_text, max_len: int) -> section_text:
-    merged_p = ""
-    new_ps: list[str] = []
-    for p in paragraphs:
-        if max_len < 0 or word_count(merged_p + " " + p) < max_len:
-            merged_p += " " + p
-        else:
-            new_ps.append(merged_p)
-            merged_p = p
-    if len(merged_p) > 0:
-        new_ps.append(merged_p)
-    return new_ps
-
-
-def _summarize_paragraphs(
-    text: section_text,
+def _summarize_chunks(
+    chunks: Sequence[text_chunk],
     method: SummarizationMethod,
-    max_len: int,
     kwargs: Optional[dict[str, Any]] = None,
-) -> section_text:
-    merged_text = _compress_paragraphs(text, max_len=max_len)
-    summaries = [_summarize(t, method=method, kwargs=kwargs) for t in merged_text]
-    return [" ".join(summaries)]
+) -> list[str]:
+    texts = [c.text for c in chunks]
+    if (batch_fxn := BATCH_SUMMARIZATION_CALLABLES.get(method)) is not None:
+        return batch_fxn(texts, kwargs if kwargs is not None else {})
+    return [_summarize(t, method=method, kwargs=kwargs) for t in texts]
 
 
-def _summarize_multisection_paragraphs(
-    text: multisection_text,
-    method: SummarizationMethod,
-    max_len: int,
-    kwargs: Optional[dict[str, Any]] = None,
-) -> multisection_text:
-    summaries: multisection_text = {}
-    for title, paragraphs in text.items():
-        summaries[title] = _summarize_paragraphs(
-            paragraphs, method=method, max_len=max_len, kwargs=kwargs
+def _assemble_summary(
+    text: ScientificArticleText, chunks: Sequence[text_chunk], summaries: list[str]
+) -> ScientificArticleText:
+    joined: dict[tuple[str, Optional[str]], list[str]] = defaultdict(list)
+    for chunk, summary in zip(chunks, summaries):
+        joined[(chunk.section, chunk.subsection)].append(summary)
+
+    def _join(section: str, subsection: Optional[str] = None) -> section_text:
+        return [" ".join(joined[(section, subsection)])]
+
+    return ScientificArticleText(
+        Abstract=[],
+        Introduction=_join("Introduction"),
+        Methods={},
+        Results={title: _join("Results", title) for title in text.Results},
+        Discussion=_join("Discussion"),
+    )
+
+
+def abstractive_config(
+    config: SummarizationConfiguration,
+) -> SummarizationConfiguration:
+    """Get the configuration of the method that actually summarizes each chunk.
+
+    This is the configuration itself except for hybrid summarization, where it is the
+    configuration of the abstractive method.
+
+    Args:
+        config (SummarizationConfiguration): Summarization configuration.
+
+    Returns:
+        SummarizationConfiguration: Configuration of the chunk summarization method.
+    """
+    if config.method is not SummarizationMethod.HYBRID:
+        return config
+    hybrid = HybridSummarizationConfiguration(**(config.config_kwargs or {}))
+    return SummarizationConfiguration(
+        method=SummarizationMethod(hybrid.abstractive_method),
+        config_kwargs=hybrid.abstractive_kwargs(),
+    )
+
+
+def max_chunk_length(config: SummarizationConfiguration) -> int:
+    """Get the maximum number of words per chunk for a configuration.
+
+    Args:
+        config (SummarizationConfiguration): Summarization configuration.
+
+    Returns:
+        int: Maximum number of words per chunk (-1 if sections are not split).
+    """
+    if config.max_chunk_words is not None:
+        return config.max_chunk_words
+    method = abstractive_config(config).method
+    return SUMMARIZATION_METHOD_MAX_LENGTHS.get(method, -1)
+
+
+def with_max_chunk_length(
+    config: SummarizationConfiguration, method: SummarizationMethod, n_words: int
+) -> SummarizationConfiguration:
+    """Change the maximum number of words per chunk of a configuration for a method.
+
+    Smaller chunks need less memory to summarize but change the summaries, so the
+    chunk length is kept in the configuration (and so in the results).
+
+    Args:
+        config (SummarizationConfiguration): Summarization configuration.
+        method (SummarizationMethod): Method whose chunks to change (configurations
+        that summarize chunks with another method are returned as they are).
+        n_words (int): Maximum number of words per chunk.
+
+    Returns:
+        SummarizationConfiguration: Configuration with the chunk length.
+    """
+    if abstractive_config(config).method is not method:
+        return config
+    return config.copy(update={"max_chunk_words": n_words})
+
+
+def chunk_article(
+    article: ScientificArticle,
+    config: SummarizationConfiguration,
+    anchors: Optional[chunk_anchors] = None,
+) -> list[TextChunkView]:
+    """Split an article into the chunks that are each summarized in one call.
+
+    For hybrid summarization, each section is first reduced with TextRank. The chunks
+    are views into a compact buffer of the article's text.
+
+    Args:
+        article (ScientificArticle): The parsed article.
+        config (SummarizationConfiguration): Summarization configuration.
+        anchors (Optional[chunk_anchors], optional): Paragraphs of the chunks of a
+        previous version of the article to keep together. Defaults to None.
+
+    Returns:
+        list[TextChunkView]: Chunks of the article, in reading order.
+    """
+    text = article.text
+    if config.method is SummarizationMethod.HYBRID:
+        hybrid = HybridSummarizationConfiguration(**(config.config_kwargs or {}))
+        text = prefilter_article_text(text, ratio=hybrid.extractive_ratio)
+    max_len = max_chunk_length(config)
+    return ArticleBuffer(text).chunks(max_len=max_len, anchors=anchors)
+
+
+def summarize_chunks(
+    chunks: Sequence[text_chunk], config: SummarizationConfiguration
+) -> list[str]:
+    """Summarize chunks of an article.
+
+    Args:
+        chunks (Sequence[text_chunk]): Chunks to summarize.
+        config (SummarizationConfiguration): Summarization configuration.
+
+    Returns:
+        list[str]: One summary per chunk.
+    """
+    config = abstractive_config(config)
+    return _summarize_chunks(chunks, method=config.method, kwargs=config.config_kwargs)
+
+
+def assemble_summarized_article(
+    article: ScientificArticle,
+    config: SummarizationConfiguration,
+    chunks: Sequence[text_chunk],
+    summaries: list[str],
+    fallback: Optional[list[bool]] = None,
+) -> SummarizedScientificArticle:
+    """Combine the summaries of an article's chunks into a summarized article.
+
+    Args:
+        article (ScientificArticle): The parsed article.
+        config (SummarizationConfiguration): Summarization configuration.
+        chunks (Sequence[text_chunk]): Chunks of the article.
+        summaries (list[str]): Summary of each chunk.
+        fallback (Optional[list[bool]], optional): Whether each chunk was summarized
+        with the fallback method. Defaults to None (none were).
+
+    Returns:
+        SummarizedScientificArticle: The summarized article.
+    """
+    summarized_text = _assemble_summary(article.text, chunks, summaries)
+    if fallback is None:
+        fallback = [False] * len(chunks)
+    summarized_chunks = [
+        SummarizedTextChunk(
+            section=c.section,
+            subsection=c.subsection,
+            text_hash=c.text_hash(),
+            summary=summary,
+            fallback=fell_back,
+            paragraph_hashes=c.paragraph_hashes,
         )
-    return summaries
+        for c, summary, fell_back in zip(chunks, summaries, fallback)
+    ]
+    decoding_profile: Optional[str] = None
+    max_beams: Optional[int] = None
+    if (backend := abstractive_config(config)).method is SummarizationMethod.BART:
+        decoding_profile = bart_decoding_profile_name(backend.config_kwargs or {})
+        max_beams = bart_beam_cap(backend.config_kwargs or {})
+    return SummarizedScientificArticle(
+        config=config,
+        summary=summarized_text,
+        chunks=summarized_chunks,
+        decoding_profile=decoding_profile,
+        max_beams=max_beams,
+        title=article.title,
+        url=article.url,
+        text=article.text,
+    )
+
+
+progress_callback = Callable[[SummarizedScientificArticle, int, int], None]
+
+
+def _summarize_fallback(chunks: Sequence[text_chunk]) -> list[str]:
+    summaries = summarize_chunks(chunks, FALLBACK_CONFIG)
+    # TextRank extracts nothing from very short chunks, so they are kept whole.
+    return [s if len(s.strip()) > 0 else c.text for c, s in zip(chunks, summaries)]
+
+
+# Configuration parameter that bounds how long a call of each method may take.
+TIME_LIMIT_KWARGS: Final[dict[SummarizationMethod, str]] = {
+    SummarizationMethod.BART: "max_time",
+    SummarizationMethod.GPT3: "request_timeout",
+}
+
+
+class _Deadline:
+    """Summarizes chunks with the configured method while there is time left."""
+
+    def __init__(self, at: float, cost_model: CostModel) -> None:
+        self.at = at
+        self.cost_model = cost_model
+        # The fixed cost of a summarization (the cost model's intercept) is only paid
+        # by the first chunk of an article.
+        self.started = False
+
+    def _summarize_within(
+        self, chunk: text_chunk, config: SummarizationConfiguration, seconds: float
+    ) -> Optional[str]:
+        # Returns None if the method did not finish in time.
+        kwargs = dict(config.config_kwargs or {})
+        if (time_limit_kwarg := TIME_LIMIT_KWARGS.get(config.method)) is not None:
+            kwargs[time_limit_kwarg] = seconds
+        try:
+            summary = _summarize_chunks([chunk], method=config.method, kwargs=kwargs)
+        except TimeoutError:
+            return None
+        # BART stops generating at its time limit and returns a cut-off summary.
+        if monotonic() >= self.at:
+            return None
+        return summary[0]
+
+    def summarize(
+        self, chunks: Sequence[text_chunk], config: SummarizationConfiguration
+    ) -> tuple[list[str], list[bool]]:
+        # Returns the summaries and whether each chunk fell back to TextRank.
+        backend = abstractive_config(config)
+        if backend.method is SummarizationMethod.TEXTRANK:
+            return summarize_chunks(chunks, config), [False] * len(chunks)
+        summaries: list[str] = []
+        fallback: list[bool] = []
+        for chunk in chunks:
+            summary: Optional[str] = None
+            remaining = self.at - monotonic()
+            predicted = self.cost_model.predict_seconds(
+                backend, word_count(chunk.text), intercept=not self.started
+            )
+            if remaining > 0 and predicted <= remaining:
+                self.started = True
+                summary = self._summarize_within(chunk, backend, seconds=remaining)
+            fallback.append(summary is None)
+            if summary is None:
+                summary = _summarize_fallback([chunk])[0]
+            summaries.append(summary)
+        return summaries, fallback
 
 
 def summarize_article(
     article: ScientificArticle,
     config: SummarizationConfiguration,
+    progress: Optional[progress_callback] = None,
+    time_budget: Optional[float] = None,
 ) -> SummarizedScientificArticle:
     """Summarized an article.
 
@@ -95,39 +341,185 @@ def summarize_article(
         article (parsed_article): The parsed article.
         config (SummarizationConfiguration): A configuration for the summarization
         method.
+        progress (Optional[progress_callback], optional): If given, the article is
+        summarized one (sub)section at a time (or, for GPT-3, one request's worth of
+        (sub)sections) and this is called after each with the partial summary, the
+        number of (sub)sections done, and the total number of (sub)sections. Defaults
+        to None.
+        time_budget (Optional[float], optional): Seconds the summarization may take.
+        BART and GPT-3 are only used for a chunk if it is predicted to finish (from
+        previous timings) and does finish within the budget (each call is limited to
+        the time left); otherwise the chunk is summarized with TextRank and recorded
+        as a fallback. Defaults to None (no limit).
 
     Returns:
         SummarizedScientificArticle: The summarized article.
     """
-    method = config.method
-    max_len = SUMMARIZATION_METHOD_MAX_LENGTHS.get(config.method, -1)
-
-    introduction_summary = _summarize_paragraphs(
-        article.text.Introduction,
-        method=method,
-        max_len=max_len,
-        kwargs=config.config_kwargs,
-    )
-    results_summary = _summarize_multisection_paragraphs(
-        article.text.Results,
-        method=method,
-        max_len=max_len,
-        kwargs=config.config_kwargs,
-    )
-    discussion_summary = _summarize_paragraphs(
-        article.text.Discussion,
-        method=method,
-        max_len=max_len,
-        kwargs=config.config_kwargs,
-    )
+    with article_preprocessing(article):
+        return _summarize_article(article, config, progress, time_budget)
 
-    summarized_text = ScientificArticleText(
-        Abstract=[],
-        Introduction=introduction_summary,
-        Methods=[],
-        Results=results_summary,
-        Discussion=discussion_summary,
+
+def _group_sections(
+    sections: list[list[TextChunkView]], config: SummarizationConfiguration
+) -> list[list[list[TextChunkView]]]:
+    # Group consecutive (sub)sections that are summarized together. GPT-3 packs the
+    # chunks of several (sub)sections into one request; the (sub)sections of requests
+    # are grouped until a group ends on a (sub)section boundary so that reporting
+    # progress does not split requests. Otherwise each (sub)section is a group.
+    method_config = abstractive_config(config)
+    if method_config.method is not SummarizationMethod.GPT3:
+        return [[section_chunks] for section_chunks in sections]
+    gpt3_config = Gpt3SummarizationConfiguration(**(method_config.config_kwargs or {}))
+    requests = gpt3_plan_requests(
+        [c.text for section_chunks in sections for c in section_chunks], gpt3_config
     )
-    return SummarizedScientificArticle(
-        config=config, summary=summarized_text, **article.dict()
+    request_ends = {max(r.indices) + 1 for r in requests}
+    groups: list[list[list[TextChunkView]]] = []
+    group: list[list[TextChunkView]] = []
+    n_chunks = 0
+    for section_chunks in sections:
+        group.append(section_chunks)
+        n_chunks += len(section_chunks)
+        if n_chunks in request_ends:
+            groups.append(group)
+            group = []
+    if len(group) > 0:
+        groups.append(group)
+    return groups
+
+
+def _summarize_article(
+    article: ScientificArticle,
+    config: SummarizationConfiguration,
+    progress: Optional[progress_callback],
+    time_budget: Optional[float],
+) -> SummarizedScientificArticle:
+    chunks = chunk_article(article, config)
+    if progress is None and time_budget is None:
+        summaries = summarize_chunks(chunks, config)
+        return assemble_summarized_article(article, config, chunks, summaries)
+
+    deadline: Optional[_Deadline] = None
+    if time_budget is not None:
+        deadline = _Deadline(monotonic() + time_budget, fit_cost_model(read_timings()))
+
+    sections: dict[tuple[str, Optional[str]], list[TextChunkView]] = defaultdict(list)
+    for chunk in chunks:
+        sections[(chunk.section, chunk.subsection)].append(chunk)
+    if deadline is None:
+        steps = _group_sections(list(sections.values()), config)
+    else:
+        steps = [[section_chunks] for section_chunks in sections.values()]
+    done_chunks: list[TextChunkView] = []
+    summaries = []
+    fallback: list[bool] = []
+    n_done = 0
+    for step in steps:
+        step_chunks = [c for section_chunks in step for c in section_chunks]
+        if deadline is None:
+            summaries += summarize_chunks(step_chunks, config)
+            fallback += [False] * len(step_chunks)
+        else:
+            step_summaries, step_fallback = deadline.summarize(step_chunks, config)
+            summaries += step_summaries
+            fallback += step_fallback
+        done_chunks += step_chunks
+        n_done += len(step)
+        if progress is not None:
+            partial = assemble_summarized_article(
+                article, config, done_chunks, summaries, fallback=fallback
+            )
+            progress(partial, n_done, len(sections))
+    return assemble_summarized_article(
+        article, config, done_chunks, summaries, fallback=fallback
     )
+
+
+chunk_key = tuple[str, Optional[str], str]
+
+
+def _paragraphs_key(paragraph_hashes: list[str]) -> str:
+    return "paragraphs:" + ",".join(paragraph_hashes)
+
+
+def _previous_chunk_summaries(
+    previous: SummarizedScientificArticle,
+) -> dict[chunk_key, str]:
+    if len(previous.chunks) > 0:
+        # Fallback summaries are replaced by summaries with the configured method.
+        known: dict[chunk_key, str] = {}
+        for chunk in previous.chunks:
+            if chunk.fallback:
+                continue
+            known[(chunk.section, chunk.subsection, chunk.text_hash)] = chunk.summary
+            if len(chunk.paragraph_hashes) > 0:
+                key = _paragraphs_key(chunk.paragraph_hashes)
+                known[(chunk.section, chunk.subsection, key)] = chunk.summary
+        return known
+
+    # Results written before chunk summaries were recorded only have the joined
+    # summary of each (sub)section. It is the chunk's summary when the (sub)section
+    # was summarized as a single chunk.
+    old_chunks = chunk_article(previous, previous.config)
+    n_chunks: dict[tuple[str, Optional[str]], int] = defaultdict(int)
+    for c in old_chunks:
+        n_chunks[(c.section, c.subsection)] += 1
+    summaries: dict[chunk_key, str] = {}
+    for c in old_chunks:
+        if n_chunks[(c.section, c.subsection)] != 1:
+            continue
+        section = getattr(previous.summary, c.section)
+        joined = section[c.subsection] if c.subsection is not None else section
+        summaries[(c.section, c.subsection, c.text_hash())] = joined[0]
+    return summaries
+
+
+def resummarize_article(
+    article: ScientificArticle,
+    previous: SummarizedScientificArticle,
+    config: Optional[SummarizationConfiguration] = None,
+) -> tuple[SummarizedScientificArticle, int]:
+    """Update a summary for a new version of an article.
+
+    The article is chunked along the chunks of the previous version, so a changed
+    paragraph only changes the chunk it is in. Only chunks whose text is not in the
+    previous version of the article (or that were summarized with the fallback method)
+    are summarized again; the summaries of the unchanged chunks are reused.
+
+    Args:
+        article (ScientificArticle): The newly parsed article.
+        previous (SummarizedScientificArticle): The summary of the previous version of
+        the article.
+        config (Optional[SummarizationConfiguration], optional): Configuration to
+        chunk and summarize the article with (e.g. with a tuned chunk length).
+        Defaults to the configuration of the previous summary.
+
+    Returns:
+        tuple[SummarizedScientificArticle, int]: The updated summary and the number of
+        chunks that were summarized.
+    """
+    if config is None:
+        config = previous.config
+    known = _previous_chunk_summaries(previous)
+    anchors: chunk_anchors = defaultdict(set)
+    for chunk in previous.chunks:
+        anchors[(chunk.section, chunk.subsection)].add(tuple(chunk.paragraph_hashes))
+    with article_preprocessing(article):
+        chunks = chunk_article(article, config, anchors=anchors)
+        # A chunk's text depends on where it starts in its (sub)section, so chunks are
+        # matched by their paragraphs (results written before paragraph hashes were
+        # recorded are matched by text).
+        keys: list[chunk_key] = []
+        for c in chunks:
+            key = (c.section, c.subsection, _paragraphs_key(c.paragraph_hashes))
+            keys.append(
+                key if key in known else (c.section, c.subsection, c.text_hash())
+            )
+        changed = [i for i, key in enumerate(keys) if key not in known]
+        new_summaries: dict[int, str] = {}
+        if len(changed) > 0:
+            changed_summaries = summarize_chunks([chunks[i] for i in changed], config)
+            new_summaries = dict(zip(changed, changed_summaries))
+    summaries = [new_summaries.get(i, known.get(key, "")) for i, key in enumerate(keys)]
+    summarized_article = assemble_summarized_article(article, config, chunks, summaries)
+    return summarized_article, len(changed)
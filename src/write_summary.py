@@ -1,10 +1,14 @@
 """Writing summarized articles to file."""
 
+import json
+import os
 from pathlib import Path
-from typing import Optional
+from typing import Final, Optional
 
 from colorama import Fore, Style, init
+from pydantic import BaseModel
 
+from src.preprocessing import article_content_hash
 from src.summarize_utils import (
     ScientificArticle,
     SummarizationConfiguration,
@@ -14,6 +18,65 @@ from src.summarize_utils import (
 
 init(autoreset=True)
 
+RESULT_STAMPS_PATH: Final[Path] = Path("cache") / "result-stamps.json"
+
+
+class ResultStamp(BaseModel):
+    """What a result file was written from, to check it without reading it."""
+
+    mtime: float  # Modification time of the result file.
+    text_hash: str  # Hash of the article's text.
+    fallback: bool  # Some (sub)sections were summarized with the fallback method.
+
+
+def make_result_stamp(article: SummarizedScientificArticle, path: Path) -> ResultStamp:
+    """Stamp a result file.
+
+    Args:
+        article (SummarizedScientificArticle): The summarized article in the file.
+        path (Path): Path to the result file.
+
+    Returns:
+        ResultStamp: Stamp of the result file.
+    """
+    return ResultStamp(
+        mtime=path.stat().st_mtime,
+        text_hash=article_content_hash(article),
+        fallback=len(article.fallback_sections()) > 0,
+    )
+
+
+def read_result_stamps(path: Path = RESULT_STAMPS_PATH) -> dict[str, ResultStamp]:
+    """Read the stamps of the result files.
+
+    Args:
+        path (Path, optional): Path to the stamps. Defaults to RESULT_STAMPS_PATH.
+
+    Returns:
+        dict[str, ResultStamp]: Stamps keyed by the name of the result file.
+    """
+    if not path.exists():
+        return {}
+    with open(path, "r") as file:
+        return {name: ResultStamp(**s) for name, s in json.load(file).items()}
+
+
+def write_result_stamps(
+    stamps: dict[str, ResultStamp], path: Path = RESULT_STAMPS_PATH
+) -> None:
+    """Write the stamps of the result files.
+
+    Args:
+        stamps (dict[str, ResultStamp]): Stamps keyed by the name of the result file.
+        path (Path, optional): Path to the stamps. Defaults to RESULT_STAMPS_PATH.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as file:
+        json.dump({name: s.dict() for name, s in stamps.items()}, file)
+    os.replace(tmp_path, path)
+    return None
+
 
 def make_summary_file_name(
     article: ScientificArticle,
@@ -24,6 +87,7 @@ def make_summary_file_name(
 
     Args:
         article (SummarizedScientificArticle): Summarized article.
+        config (SummarizationConfiguration): Summarization configuration.
         suffix (Optional[str], optional): File suffix. Defaults to ".md".
 
     Returns:
@@ -32,6 +96,8 @@ def make_summary_file_name(
     fname: str = article.title.replace(" ", "-") + "_" + config.method.value
     if (kwargs := config.config_kwargs) is not None and len(kwargs) > 0:
         fname += "_" + "_".join([f"{k}-{v}" for k, v in kwargs.items()])
+    if config.max_chunk_words is not None:
+        fname += f"_max_chunk_words-{config.max_chunk_words}"
     if suffix is not None:
         fname += suffix
     return fname
@@ -65,6 +131,23 @@ def write_summary(article: SummarizedScientificArticle, to: Path) -> None:
     return None
 
 
+def write_summary_json(article: SummarizedScientificArticle, to: Path) -> None:
+    """Write a summarized article to a JSON file.
+
+    The file is written to a temporary path first and then moved into place so that
+    readers never see a partially written summary.
+
+    Args:
+        article (SummarizedScientificArticle): Summarized article.
+        to (Path): File path.
+    """
+    tmp_path = to.with_name(f".{to.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as file:
+        file.write(article.json())
+    os.replace(tmp_path, to)
+    return None
+
+
 def _pre_summary_message(name: str, method: SummarizationMethod) -> None:
     name_msg = Fore.BLUE + Style.BRIGHT + f"'{name}'"
     method_msg = "  summarization method: " + method.value
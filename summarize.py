@@ -2,66 +2,420 @@
 
 """Entrypoint to summarization functions."""
 
-from itertools import product
+import os
+import sys
+from datetime import timedelta
 from pathlib import Path
+from time import time
 from typing import Final, Optional, Union
 
 from dotenv import load_dotenv
 from tqdm import tqdm
 from typer import Typer
 
+from src.autotune import (
+    HostProfile,
+    apply_host_profile,
+)
+from src.autotune import autotune as autotune_host
+from src.autotune import (
+    host_profile_path,
+    read_host_profile,
+    tuned_configuration,
+    write_host_profile,
+)
+from src.bart_summarization import (
+    BART_DECODING_PROFILES,
+    BART_WEIGHTS_ENV_VAR,
+)
+from src.bart_summarization import decoding_profile_name as bart_decoding_profile_name
+from src.bart_summarization import export_shared_weights
+from src.bart_summarization import measure_memory as measure_bart_memory
+from src.bart_summarization import start_worker_pool as start_bart_worker_pool
+from src.bart_summarization import stop_worker_pool as stop_bart_worker_pool
+from src.bart_summarization import worker_pids as bart_worker_pids
+from src.batch_summarize import read_batch_items, summarize_batch_items
+from src.bulk_ingest import IngestError, ingest_archive
 from src.classes_and_types import (
     ScientificArticle,
     SummarizationConfiguration,
     SummarizationMethod,
     SummarizedScientificArticle,
 )
-from src.parse_scientific_article import get_and_parse_article
-from src.pipeline import generate_configurations, get_urls
-from src.summarize_utils import summarize_article
-from src.write_summary import make_summary_file_name, print_summary, write_summary
+from src.evaluation import flatten_text, rouge_n
+from src.feed_watcher import FEED_STATE_PATH
+from src.feed_watcher import watch as watch_feeds
+from src.hybrid_summarization import AbstractiveMethod
+from src.job_queue import enqueue_summarizations, run_worker
+from src.job_queue_client import JOB_QUEUE_PATH, JobQueue
+from src.memory_budget import (
+    format_memory_size,
+    memory_in_use,
+    parse_memory_size,
+    plan_memory,
+    start_memory_guard,
+    stop_memory_guard,
+)
+from src.memory_report import format_memory_report
+from src.parse_scientific_article import get_and_parse_article, get_and_parse_articles
+from src.pipeline import SWEEPS_CONFIG_PATH, generate_configurations, get_urls
+from src.preprocessing import article_content_hash
+from src.results_archive import RESULTS_ARCHIVE_PATH, append_results, extract_results
+from src.scheduler import (
+    ScheduledJob,
+    SummarizationTiming,
+    article_word_count,
+    estimate_wall_time,
+    fit_cost_model,
+    read_timings,
+    record_timing,
+    schedule_jobs,
+)
+from src.search_index import SEARCH_INDEX_PATH, build_search_index
+from src.search_index import search as search_index
+from src.summarize_utils import (
+    abstractive_config,
+    chunk_article,
+    max_chunk_length,
+    resummarize_article,
+    summarize_article,
+    with_max_chunk_length,
+)
+from src.write_summary import (
+    ResultStamp,
+    make_result_stamp,
+    make_summary_file_name,
+    print_summary,
+    read_result_stamps,
+    write_result_stamps,
+    write_summary,
+    write_summary_json,
+)
 
 load_dotenv()
 
 app = Typer()
 
 
-def _write_summarized_article_to_json(
-    article: SummarizedScientificArticle, path: Path
+def _summarize_to_outdir(
+    article: ScientificArticle,
+    config: SummarizationConfiguration,
+    outdir: Path,
+    force: bool = False,
+    stamps: Optional[dict[str, ResultStamp]] = None,
 ) -> None:
-    with open(path, "w") as file:
-        file.write(article.json())
+    # `stamps` records what each result file was written from (and is updated) so
+    # that unchanged results are skipped without reading them.
+    if stamps is None:
+        stamps = {}
+    json_path = outdir / make_summary_file_name(article, config, suffix=".json")
+    if force or not json_path.exists():
+        start = time()
+        summarized_article = summarize_article(article, config=config)
+        timing = SummarizationTiming(
+            config=config, n_words=article_word_count(article), seconds=time() - start
+        )
+        record_timing(timing)
+        write_summary_json(summarized_article, json_path)
+        stamps[json_path.name] = make_result_stamp(summarized_article, json_path)
+        return None
+    stamp = stamps.get(json_path.name)
+    if (
+        stamp is not None
+        and not stamp.fallback
+        and stamp.mtime == json_path.stat().st_mtime
+        and stamp.text_hash == article_content_hash(article)
+    ):
+        return None
+    previous = SummarizedScientificArticle.parse_file(json_path)
+    if previous.text != article.text or len(previous.fallback_sections()) > 0:
+        # The article was revised (or parts were summarized under a time budget): only
+        # re-summarize the chunks that changed.
+        previous, n_changed = resummarize_article(article, previous, config=config)
+        write_summary_json(previous, json_path)
+        tqdm.write(f"re-summarized {n_changed} chunk(s) of '{article.title}'")
+    stamps[json_path.name] = make_result_stamp(previous, json_path)
     return None
 
 
+def _schedule_jobs(
+    articles: list[ScientificArticle],
+    configs: list[SummarizationConfiguration],
+    outdir: Path,
+    force: bool,
+    n_workers: int = 1,
+) -> list[ScheduledJob]:
+    cost_model = fit_cost_model(read_timings())
+    jobs = schedule_jobs(articles, configs, cost_model=cost_model)
+    todo = [
+        j
+        for j in jobs
+        if force
+        or not (
+            outdir / make_summary_file_name(j.article, j.config, suffix=".json")
+        ).exists()
+    ]
+    wall_time = estimate_wall_time(todo, n_workers=n_workers)
+    print(f"summarizations to run: {len(todo)}")
+    print(f"estimated wall time: {timedelta(seconds=round(wall_time))}")
+    print(f"estimated GPT-3 cost: ${sum(j.dollars for j in todo):.2f}")
+    return jobs
+
+
+def _use_host_profile() -> Optional[HostProfile]:
+    # Use the throughput settings tuned for this host by `autotune` (if any) and
+    # return its profile.
+    if (profile := read_host_profile()) is None:
+        return None
+    apply_host_profile(profile)
+    print(
+        f"using the tuned settings for this host ({host_profile_path()}): "
+        f"{profile.bart_workers} BART worker(s), chunks of up to "
+        f"{profile.max_chunk_words} words, batch size {profile.bart.batch_size}, "
+        f"max beams {profile.max_beams or 'unlimited'}",
+        file=sys.stderr,
+    )
+    return profile
+
+
+def _tuned_configurations(
+    configs: list[SummarizationConfiguration], profile: Optional[HostProfile]
+) -> list[SummarizationConfiguration]:
+    # Use the host profile's chunk length and beam cap (if any) in the configurations.
+    if profile is None:
+        return configs
+    return [tuned_configuration(c, profile) for c in configs]
+
+
+def _plan_memory_budget(
+    budget: int, configs: list[SummarizationConfiguration], max_workers: int
+) -> tuple[int, list[SummarizationConfiguration]]:
+    # Measure BART's memory use, pick a number of workers and a chunk length that fit
+    # the budget, and return the number of workers and the configurations with the
+    # chunk length.
+    bart_chunked = [
+        c for c in configs if abstractive_config(c).method is SummarizationMethod.BART
+    ]
+    if len(bart_chunked) == 0:
+        return 0, configs
+    bart_configs = [abstractive_config(c) for c in bart_chunked]
+    baseline = memory_in_use([os.getpid()])
+    # Measure with the configuration that uses the most beams (and so memory).
+    largest = max(
+        bart_configs,
+        key=lambda c: BART_DECODING_PROFILES[
+            bart_decoding_profile_name(c.config_kwargs or {})
+        ].num_beams,
+    )
+    profile = measure_bart_memory(largest.config_kwargs or {})
+    plan = plan_memory(
+        budget,
+        baseline=baseline,
+        profile=profile,
+        chunk_words=max(max_chunk_length(c) for c in bart_chunked),
+        max_workers=max_workers,
+    )
+    print(
+        f"BART weights: {format_memory_size(profile.model_bytes)}; activations: "
+        f"{profile.bytes_per_word / 1024:.0f} KB per word"
+    )
+    print(
+        f"memory plan: {plan.n_workers} BART worker(s), chunks of up to "
+        f"{plan.max_chunk_words} words, predicted peak "
+        f"{format_memory_size(plan.predicted_peak)}"
+    )
+    configs = [
+        (
+            with_max_chunk_length(c, SummarizationMethod.BART, plan.max_chunk_words)
+            if max_chunk_length(c) > plan.max_chunk_words
+            else c
+        )
+        for c in configs
+    ]
+    return plan.n_workers, configs
+
+
 @app.command()
-def summarize_all(force: bool = False) -> None:
+def summarize_all(
+    force: bool = False,
+    sweeps: Path = SWEEPS_CONFIG_PATH,
+    bart_workers: Optional[int] = None,
+    max_memory: Optional[str] = None,
+) -> None:
     """Run the summarization pipeline to summarize a series of articles.
 
     Run the summarization pipeline to summarize a series of articles using different
-    methods and configurations.
+    methods and configurations. With `--bart-workers`, BART summarizes the chunks of
+    an article in parallel on a pool of processes that share the model's weights.
+
+    With `--max-memory` (e.g. "8G"), BART's memory use is measured first and the number
+    of workers (at most `--bart-workers`, if given) and the chunk length are chosen to
+    fit the budget. Fewer chunks are summarized at once under memory pressure, chunks
+    that run out of memory are split, and the peak memory use is reported at the end.
+
+    If the host was tuned with `autotune`, its settings are used (including the number
+    of BART workers unless `--bart-workers` is given).
     """
     outdir = Path("pipeline-results")
     if not outdir.exists():
         outdir.mkdir()
+    profile = _use_host_profile()
+    if bart_workers is None:
+        bart_workers = profile.bart_workers if profile is not None else 0
 
-    articles: list[ScientificArticle] = [
-        get_and_parse_article(url) for url in get_urls()
-    ]
-    configurations = generate_configurations()
+    articles = get_and_parse_articles(get_urls())
+    configurations = _tuned_configurations(generate_configurations(sweeps), profile)
     print(f"number of articles: {len(articles)}")
     print(f"number of configurations: {len(configurations)}")
-    n_iters = len(articles) * len(configurations)
-    for summ_config, article in tqdm(product(configurations, articles), total=n_iters):
-        json_path = outdir / make_summary_file_name(
-            article, summ_config, suffix=".json"
+    budget: Optional[int] = None
+    if max_memory is not None:
+        budget = parse_memory_size(max_memory)
+        max_workers = bart_workers if bart_workers > 0 else (os.cpu_count() or 1)
+        bart_workers, configurations = _plan_memory_budget(
+            budget, configurations, max_workers
         )
-        if force or not json_path.exists():
-            summarized_article = summarize_article(article, config=summ_config)
-            _write_summarized_article_to_json(summarized_article, json_path)
+    jobs = _schedule_jobs(articles, configurations, outdir=outdir, force=force)
+    if bart_workers > 0:
+        start_bart_worker_pool(bart_workers)
+        print(format_memory_report([os.getpid(), *bart_worker_pids()]))
+    if budget is not None:
+        start_memory_guard(budget, pids=lambda: [os.getpid(), *bart_worker_pids()])
+    stamps = read_result_stamps()
+    try:
+        for job in tqdm(jobs):
+            _summarize_to_outdir(
+                job.article, job.config, outdir=outdir, force=force, stamps=stamps
+            )
+    finally:
+        write_result_stamps(stamps)
+        if (peak := stop_memory_guard()) is not None and budget is not None:
+            print(
+                f"peak memory use: {format_memory_size(peak)} "
+                f"(budget: {format_memory_size(budget)})"
+            )
+        if bart_workers > 0:
+            print(format_memory_report([os.getpid(), *bart_worker_pids()]))
+            stop_bart_worker_pool()
     return None
 
 
+@app.command()
+def autotune(
+    n_articles: int = 2,
+    n_words: int = 3000,
+    tolerance: float = 0.1,
+    max_workers: Optional[int] = None,
+    decoding_profile: str = "quality",
+) -> None:
+    """Tune BART's throughput settings for this host and save them as its profile.
+
+    A short benchmark on the saved articles tries different numbers of worker
+    processes, PyTorch threads, batch sizes, chunk lengths, and beams, and keeps the
+    fastest settings whose summaries have a similarity (ROUGE-1 F1) of at least
+    `1 - tolerance` to those with the default settings. The pipeline commands load the
+    profile automatically on hosts with the same hardware.
+    """
+    articles = get_and_parse_articles(sorted(get_urls())[:n_articles])
+    config = _make_summarization_config(
+        SummarizationMethod.BART, decoding_profile=decoding_profile
+    )
+    profile = autotune_host(
+        articles,
+        config=config,
+        n_words=n_words,
+        tolerance=tolerance,
+        max_workers=max_workers,
+    )
+    path = write_host_profile(profile)
+    print(
+        f"tuned: {profile.words_per_second:.1f} words/s "
+        f"(default settings: {profile.baseline_words_per_second:.1f} words/s), "
+        f"similarity {profile.quality:.3f}"
+    )
+    print(f"saved the profile for '{profile.host}' to '{path}'")
+    return None
+
+
+@app.command()
+def export_bart_weights(index: Path = Path("cache") / "bart-large-cnn.json") -> None:
+    """Export BART's weights to files that worker processes can memory-map.
+
+    Set `BART_WEIGHTS_PATH` (e.g. in ".env") to the exported index file so that all
+    processes on a machine share one read-only copy of the weights.
+    """
+    export_shared_weights(index)
+    print(f"Set {BART_WEIGHTS_ENV_VAR}={index} to use the exported weights.")
+    return None
+
+
+@app.command()
+def enqueue(
+    force: bool = False,
+    queue: Path = JOB_QUEUE_PATH,
+    sweeps: Path = SWEEPS_CONFIG_PATH,
+    n_workers: int = 1,
+) -> None:
+    """Add the summarization pipeline's jobs to a shared job queue.
+
+    Workers on any machine that can see the queue file and the output directory can
+    then process the jobs with the `worker` command.
+    """
+    outdir = Path("pipeline-results")
+    if not outdir.exists():
+        outdir.mkdir()
+    articles = get_and_parse_articles(get_urls())
+    configurations = generate_configurations(sweeps)
+    jobs = _schedule_jobs(
+        articles, configurations, outdir=outdir, force=force, n_workers=n_workers
+    )
+    job_queue = JobQueue(queue)
+    n_added = enqueue_summarizations(
+        job_queue, [(j.article, j.config) for j in jobs], outdir=outdir, force=force
+    )
+    print(f"queued {n_added} article-configuration pair(s)")
+    print(job_queue.counts())
+    job_queue.close()
+    return None
+
+
+@app.command()
+def worker(
+    queue: Path = JOB_QUEUE_PATH,
+    lease_seconds: float = 300.0,
+    poll_interval: float = 10.0,
+    exit_when_empty: bool = True,
+    max_jobs: Optional[int] = None,
+) -> None:
+    """Process jobs from a shared job queue.
+
+    Run with `--no-exit-when-empty` as the background worker for summaries requested
+    from the Streamlit app. The models stay loaded between jobs. The host profile's
+    throughput settings are used, but articles are split and summarized with the chunk
+    length and beam cap in each job's configuration.
+    """
+    outdir = Path("pipeline-results")
+    _use_host_profile()
+    job_queue = JobQueue(queue, lease_seconds=lease_seconds)
+    n_done = run_worker(
+        job_queue,
+        outdir=outdir,
+        poll_interval=poll_interval,
+        exit_when_empty=exit_when_empty,
+        max_jobs=max_jobs,
+    )
+    print(f"completed {n_done} job(s)")
+    print(job_queue.counts())
+    job_queue.close()
+    return None
+
+
+def _make_summarization_config(
+    method: SummarizationMethod, **kwargs: Optional[Union[float, str]]
+) -> SummarizationConfiguration:
+    config_kwargs = {k: v for k, v in kwargs.items() if v is not None}
+    return SummarizationConfiguration(method=method, config_kwargs=config_kwargs)
+
+
 @app.command()
 def summarize(
     url: str,
@@ -73,26 +427,37 @@ def summarize(
     temperature: Optional[float] = None,
     frequency_penalty: Optional[float] = None,
     presence_penalty: Optional[float] = None,
+    decoding_profile: Optional[str] = None,
+    time_budget: Optional[float] = None,
 ) -> None:
     """Summarize an online scientific article.
 
+    With `--time-budget`, (sub)sections that BART or GPT-3 cannot summarize in time
+    are summarized with TextRank instead.
+
     Args:
         url (str): URL of the webpage.
     """
+    profile = _use_host_profile()
     article = get_and_parse_article(url=url)
-    kwargs = {
-        "ratio": ratio,
-        "min_ratio": min_ratio,
-        "max_ratio": max_ratio,
-        "temperature": temperature,
-        "frequency_penalty": frequency_penalty,
-        "presence_penalty": presence_penalty,
-    }
-    kwargs = {k: v for k, v in kwargs.items() if v is not None}  # remove `None`s
+    config = _make_summarization_config(
+        method,
+        ratio=ratio,
+        min_ratio=min_ratio,
+        max_ratio=max_ratio,
+        temperature=temperature,
+        frequency_penalty=frequency_penalty,
+        presence_penalty=presence_penalty,
+        decoding_profile=decoding_profile,
+    )
+    if profile is not None:
+        config = tuned_configuration(config, profile)
     summarized_article = summarize_article(
-        article,
-        config=SummarizationConfiguration(method=method, config_kwargs=kwargs),
+        article, config=config, time_budget=time_budget
     )
+    for section, subsection in summarized_article.fallback_sections():
+        name = section if subsection is None else f"{section} / {subsection}"
+        print(f"(time budget exceeded: '{name}' was summarized with TextRank)")
 
     if output is not None:
         write_summary(summarized_article, output)
@@ -101,6 +466,69 @@ def summarize(
     return None
 
 
+@app.command()
+def summarize_batch(
+    method: SummarizationMethod,
+    input: Path = Path("-"),
+    output: Optional[Path] = None,
+    ratio: Optional[float] = None,
+    min_ratio: Optional[float] = None,
+    max_ratio: Optional[float] = None,
+    temperature: Optional[float] = None,
+    frequency_penalty: Optional[float] = None,
+    presence_penalty: Optional[float] = None,
+    decoding_profile: Optional[str] = None,
+    time_budget: Optional[float] = None,
+) -> None:
+    """Summarize a batch of articles, writing one line of JSON per article.
+
+    The input has one URL or file path (saved webpage, JATS XML, or parsed article
+    JSON) per line and is read from stdin by default. Results are written to stdout
+    (or `--output`) as each article is finished; failed articles get a line with the
+    error instead of the summary.
+
+    Args:
+        method (SummarizationMethod): Summarization method.
+    """
+    profile = _use_host_profile()
+    config = _make_summarization_config(
+        method,
+        ratio=ratio,
+        min_ratio=min_ratio,
+        max_ratio=max_ratio,
+        temperature=temperature,
+        frequency_penalty=frequency_penalty,
+        presence_penalty=presence_penalty,
+        decoding_profile=decoding_profile,
+    )
+    if profile is not None:
+        config = tuned_configuration(config, profile)
+    in_file = sys.stdin if input == Path("-") else open(input, "r")
+    out_file = sys.stdout if output is None else open(output, "w")
+    n_done, n_errors = 0, 0
+    try:
+        items = read_batch_items(in_file)
+        for res in summarize_batch_items(items, config=config, time_budget=time_budget):
+            out_file.write(res.json(exclude_none=True) + "\n")
+            out_file.flush()
+            n_done += 1
+            if res.error is not None:
+                n_errors += 1
+                print(
+                    f"failed to summarize '{res.input}': {res.error}", file=sys.stderr
+                )
+    finally:
+        if in_file is not sys.stdin:
+            in_file.close()
+        if out_file is not sys.stdout:
+            out_file.close()
+    print(
+        f"summarized {n_done - n_errors} article(s), {n_errors} failure(s)",
+        file=sys.stderr,
+    )
+    return None
+
+
 KRAS_ALLELES_URL: Final[str] = "https://www.nature.com/articles/s41467-021-22125-z"
 
 
@@ -134,6 +562,131 @@ def make_examples() -> None:
     return None
 
 
+@app.command()
+def ingest(
+    archive: Path,
+    processes: int = 1,
+    summarize: bool = True,
+    force: bool = False,
+) -> None:
+    """Stream articles out of a tar/zip archive of JATS XML or saved HTML files.
+
+    Each parsed article is fed straight into the summarization pipeline.
+
+    Args:
+        archive (Path): Path to the archive.
+    """
+    outdir = Path("pipeline-results")
+    if not outdir.exists():
+        outdir.mkdir()
+    configurations = generate_configurations()
+    n_articles, n_errors = 0, 0
+    stamps = read_result_stamps()
+    try:
+        for res in tqdm(ingest_archive(archive, processes=processes)):
+            if isinstance(res, IngestError):
+                tqdm.write(f"failed to parse '{res.name}': {res.error}")
+                n_errors += 1
+                continue
+            n_articles += 1
+            if summarize:
+                for summ_config in configurations:
+                    _summarize_to_outdir(
+                        res, summ_config, outdir=outdir, force=force, stamps=stamps
+                    )
+    finally:
+        write_result_stamps(stamps)
+    print(f"parsed {n_articles} article(s), {n_errors} failure(s)")
+    return None
+
+
+@app.command()
+def watch(
+    sources: list[str],
+    interval: float = 900.0,
+    max_fetches: int = 4,
+    once: bool = False,
+    state: Path = FEED_STATE_PATH,
+    force: bool = False,
+) -> None:
+    """Watch RSS/Atom feeds or URL-list files and summarize new articles.
+
+    Each source is a URL or file path of an RSS/Atom feed or of a plain-text list of
+    article URLs (one per line).
+
+    Args:
+        sources (list[str]): Feeds or URL lists to watch.
+    """
+    outdir = Path("pipeline-results")
+    if not outdir.exists():
+        outdir.mkdir()
+    configurations = _tuned_configurations(
+        generate_configurations(), profile=_use_host_profile()
+    )
+
+    stamps = read_result_stamps()
+
+    def _summarize_new_article(article: ScientificArticle) -> None:
+        try:
+            for summ_config in configurations:
+                _summarize_to_outdir(
+                    article, summ_config, outdir=outdir, force=force, stamps=stamps
+                )
+        finally:
+            write_result_stamps(stamps)
+        print(f"summarized '{article.title}'")
+        return None
+
+    watch_feeds(
+        sources,
+        process=_summarize_new_article,
+        interval=interval,
+        state_path=state,
+        max_fetches=max_fetches,
+        once=once,
+    )
+    return None
+
+
+@app.command()
+def compare_hybrid(
+    abstractive_method: AbstractiveMethod = AbstractiveMethod.BART,
+    extractive_ratio: float = 0.3,
+) -> None:
+    """Compare hybrid summarization against the abstractive method alone.
+
+    Each sample article is summarized with the abstractive method alone and with a
+    TextRank prefilter. The number of chunks, run time, and ROUGE scores against the
+    article's abstract are reported.
+    """
+    pure_config = SummarizationConfiguration(
+        method=SummarizationMethod(abstractive_method.value), config_kwargs={}
+    )
+    hybrid_config = SummarizationConfiguration(
+        method=SummarizationMethod.HYBRID,
+        config_kwargs={
+            "abstractive_method": abstractive_method.value,
+            "extractive_ratio": extractive_ratio,
+        },
+    )
+    print(f"{'article':<40} {'method':<8} {'chunks':>6} {'seconds':>8} R-1   R-2")
+    for url in sorted(get_urls()):
+        article = get_and_parse_article(url)
+        reference = " ".join(article.text.Abstract)
+        for config in [pure_config, hybrid_config]:
+            n_chunks = len(chunk_article(article, config))
+            start = time()
+            summarized_article = summarize_article(article, config=config)
+            seconds = time() - start
+            summary = flatten_text(summarized_article.summary)
+            print(
+                f"{article.title[:40]:<40} {config.method.value:<8} {n_chunks:>6} "
+                f"{seconds:>8.1f} {rouge_n(summary, reference, n=1):.3f} "
+                f"{rouge_n(summary, reference, n=2):.3f}"
+            )
+    return None
+
+
 @app.command()
 def parse_article(url: str) -> None:
     """CLI entrypoint to parse an article's webpage.
@@ -146,5 +699,56 @@ def parse_article(url: str) -> None:
     return None
 
 
+@app.command()
+def index_results(
+    results_dir: Path = Path("pipeline-results"),
+    index: Path = SEARCH_INDEX_PATH,
+    archive: Optional[Path] = None,
+) -> None:
+    """Add new or modified pipeline results to the full-text search index."""
+    n_indexed = build_search_index(results_dir, index_path=index, archive=archive)
+    print(f"indexed {n_indexed} result file(s)")
+    return None
+
+
+@app.command()
+def export_results(
+    results_dir: Path = Path("pipeline-results"), archive: Path = RESULTS_ARCHIVE_PATH
+) -> None:
+    """Add new or modified pipeline results to a compressed results archive."""
+    n_added = append_results(results_dir, archive=archive)
+    print(f"added {n_added} result file(s) to '{archive}'")
+    return None
+
+
+@app.command()
+def import_results(
+    archive: Path = RESULTS_ARCHIVE_PATH, results_dir: Path = Path("pipeline-results")
+) -> None:
+    """Unpack a results archive into the results directory."""
+    n_written = extract_results(archive, results_dir=results_dir)
+    print(f"wrote {n_written} result file(s) to '{results_dir}'")
+    return None
+
+
+@app.command()
+def search(
+    query: str,
+    limit: int = 20,
+    method: Optional[str] = None,
+    index: Path = SEARCH_INDEX_PATH,
+) -> None:
+    """Search the articles and summaries in the full-text search index.
+
+    Args:
+        query (str): Search query.
+    """
+    for res in search_index(index, query=query, limit=limit, method=method):
+        location = res.section + (f" / {res.subsection}" if res.subsection else "")
+        print(f"{res.title}\n  {res.method} ({res.config_str}) - {location}")
+        print(f"  {res.snippet}\n")
+    return None
+
+
 if __name__ == "__main__":
     app()
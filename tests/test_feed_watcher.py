@@ -0,0 +1,130 @@
+"""Tests for the feed watcher against a local feed served from a fixture directory."""
+
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from src import feed_watcher
+from src.classes_and_types import (
+    ScientificArticle,
+    ScientificArticleText,
+    SummarizationConfiguration,
+    SummarizationMethod,
+    SummarizedScientificArticle,
+)
+from src.comparison_webapp import get_summarized_articles
+from src.feed_watcher import FeedWatcherState, check_sources, watch
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "feed"
+BAD_URL = "https://www.nature.com/articles/s41467-021-00003-3"
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format: str, *args: object) -> None:
+        return None
+
+
+@pytest.fixture
+def feed_url() -> Iterator[str]:
+    """Serve the fixture directory over HTTP and yield the URL of the feed."""
+    handler = partial(_QuietHandler, directory=str(FIXTURES_DIR))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/feed.xml"
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture
+def parsed_urls(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """Parse articles without downloading them; `BAD_URL` fails to parse."""
+    urls: list[str] = []
+
+    def _parse(url: str) -> ScientificArticle:
+        urls.append(url)
+        if url == BAD_URL:
+            raise ValueError("not an article")
+        text = ScientificArticleText(
+            Abstract=[], Introduction=[], Methods={}, Results={}, Discussion=[]
+        )
+        return ScientificArticle(title=url, url=url, text=text)
+
+    monkeypatch.setattr(feed_watcher, "get_and_parse_article", _parse)
+    return urls
+
+
+def test_new_articles_are_processed_once(feed_url: str, parsed_urls: list[str]) -> None:
+    state = FeedWatcherState()
+    processed: list[str] = []
+
+    def _process(article: ScientificArticle) -> None:
+        processed.append(article.url)
+
+    assert check_sources([feed_url], state, process=_process) == 2
+    assert processed == [
+        "https://www.nature.com/articles/s41467-021-00001-1",
+        "https://www.nature.com/articles/s41467-021-00002-2",
+    ]
+    assert state.pending == [BAD_URL]
+    assert state.sources[feed_url].last_modified is not None
+
+    # The feed is unchanged (304) and the failed article is not due for a retry yet.
+    n_parsed = len(parsed_urls)
+    assert check_sources([feed_url], state, process=_process) == 0
+    assert len(parsed_urls) == n_parsed
+    assert len(processed) == 2
+
+
+def test_failing_article_is_given_up_on(feed_url: str, parsed_urls: list[str]) -> None:
+    state = FeedWatcherState()
+
+    def _process(article: ScientificArticle) -> None:
+        return None
+
+    for _ in range(3):
+        check_sources(
+            [feed_url], state, process=_process, max_attempts=3, retry_delay=0
+        )
+    assert parsed_urls.count(BAD_URL) == 3
+    assert state.pending == []
+    assert state.retries == {}
+    assert state.failed == {BAD_URL}
+
+    # Given-up articles are not retried or added again when the feed changes.
+    state.sources.clear()
+    check_sources([feed_url], state, process=_process, max_attempts=3, retry_delay=0)
+    assert parsed_urls.count(BAD_URL) == 3
+    assert state.pending == []
+
+
+def test_watcher_state_is_not_read_as_a_result(
+    feed_url: str,
+    parsed_urls: list[str],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    results_dir = Path("pipeline-results")
+    results_dir.mkdir()
+    config = SummarizationConfiguration(method=SummarizationMethod.TEXTRANK)
+
+    def _process(article: ScientificArticle) -> None:
+        summary = SummarizedScientificArticle(
+            **article.dict(), config=config, summary=article.text
+        )
+        path = results_dir / f"{len(list(results_dir.iterdir()))}.json"
+        path.write_text(summary.json())
+
+    watch([feed_url], process=_process, once=True)
+    assert feed_watcher.FEED_STATE_PATH.exists()
+    summarized = get_summarized_articles(results_dir)
+    assert sorted(a.url for a in summarized.values()) == [
+        "https://www.nature.com/articles/s41467-021-00001-1",
+        "https://www.nature.com/articles/s41467-021-00002-2",
+    ]
@@ -0,0 +1,71 @@
+"""Tests for GPT-3 summarization against a local stand-in for the completions API."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+
+import openai
+import pytest
+
+from src import gpt3_summarization
+from src.gpt3_summarization import summarize_batch
+
+
+class _CompletionsHandler(BaseHTTPRequestHandler):
+    # Answers each completion request with the first words of its prompt's text, or
+    # after `delay` seconds.
+    requests: list[dict[str, Any]] = []
+    delay = 0.0
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append({"path": self.path, **body})
+        time.sleep(self.delay)
+        text = body["prompt"].split('"""\n')[1].split()[:3]
+        response = json.dumps({"choices": [{"text": " ".join(text)}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format: str, *args: object) -> None:
+        return None
+
+
+class _WordTokenizer:
+    def encode(self, text: str) -> list[str]:
+        return text.split()
+
+
+@pytest.fixture
+def completions_api(monkeypatch: pytest.MonkeyPatch) -> Iterator[type]:
+    """Serve a stand-in for the completions API and point the client at it."""
+    _CompletionsHandler.requests = []
+    _CompletionsHandler.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CompletionsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(openai, "api_base", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(gpt3_summarization, "_get_tokenizer", _WordTokenizer)
+    yield _CompletionsHandler
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_each_section_is_summarized_in_its_own_request(completions_api: type) -> None:
+    texts = ["KRAS mutations drive tumour growth.", "Inhibitors slowed it down."]
+    summaries = summarize_batch(texts, {"engine": "curie"})
+    assert summaries == ["KRAS mutations drive", "Inhibitors slowed it"]
+    assert [r["path"] for r in completions_api.requests] == ["/completions"] * 2
+    assert all(r["model"] == "curie" for r in completions_api.requests)
+
+
+def test_slow_response_times_out(completions_api: type) -> None:
+    completions_api.delay = 2.0
+    with pytest.raises(TimeoutError):
+        summarize_batch(["Some text to summarize."], {"request_timeout": 0.5})